@@ -2,3 +2,7 @@
 Pacote principal da aplicação
 """
 
+from dotenv import load_dotenv
+
+# Os módulos internos leem o .env na importação (inclusive via python -m)
+load_dotenv()
@@ -1,36 +1,57 @@
 import json
-from typing import Dict, List
-from email.utils import parsedate_to_datetime
-import datetime
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import os
 
-# --- Configuração de Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+from app.models.EmailRecord import EmailRecord, iso_utc, parse_email_date
+from app.utils.serialization import dumps, JSON_CONTENT_TYPE
+
 logger = logging.getLogger(__name__)
 
 API_URL = os.getenv("INBOXSTREAM_API_URL", "http://localhost:8000/api/v1/emails/")
 
+# Rota de lote: recebe um array de payloads (ver send_batch_to_api)
+BATCH_API_URL = os.getenv("INBOXSTREAM_BATCH_API_URL") or API_URL.rstrip("/") + "/batch"
+
 TIMEOUT_SECONDS = 15
 
+# Conexões keep-alive mantidas no pool HTTP
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+# Emails por requisição na rota de lote
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "50"))
+# Depois de a rota de lote responder 404/405/501, tenta de novo após este intervalo
+# (a rota pode ter sumido só durante um deploy ou reinício da API)
+BATCH_REPROBE_SECONDS = float(os.getenv("INBOXSTREAM_BATCH_REPROBE_SECONDS", "300"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# None = ainda não testado; False = a API não tinha a rota de lote em _batch_checked_at
+_batch_supported: Optional[bool] = None
+_batch_checked_at = 0.0
+
+
+def get_session() -> requests.Session:
+    """Sessão HTTP compartilhada, com pool de conexões keep-alive"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
 
 def _to_iso_utc(date_str: str) -> str:
     """Converte header Date para ISO UTC; se falhar, usa agora UTC"""
-    try:
-        dt = parsedate_to_datetime(date_str)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=datetime.timezone.utc)
-        return dt.astimezone(datetime.timezone.utc).isoformat()
-    except Exception:
-        return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
+    return iso_utc(parse_email_date(date_str))
 
 
 def build_payload(email: Dict) -> Dict:
@@ -43,7 +64,10 @@ def build_payload(email: Dict) -> Dict:
       "category": "Geral",
       "date": "2025-11-16T13:30:39.557Z"
     }
+    Um EmailRecord já traz a data convertida (interpretada uma vez, na criação).
     """
+    if isinstance(email, EmailRecord):
+        return email.to_payload()
     return {
         "id": str(email.get("id") or email.get("message_id") or ""),
         "subject": email.get("subject", ""),
@@ -53,27 +77,119 @@ def build_payload(email: Dict) -> Dict:
     }
 
 
+def _post_json(url: str, payload) -> requests.Response:
+    """POST com o corpo já codificado (orjson, se instalado) em vez do json= do requests"""
+    return get_session().post(
+        url, data=dumps(payload), headers={"Content-Type": JSON_CONTENT_TYPE}, timeout=TIMEOUT_SECONDS
+    )
+
+
 def send_email_to_api(email: Dict) -> bool:
     """Envia um email (um objeto) para a API. Retorna True se 2xx."""
     payload = build_payload(email)
     try:
-        resp = requests.post(API_URL, json=payload, timeout=TIMEOUT_SECONDS)
+        resp = _post_json(API_URL, payload)
         if 200 <= resp.status_code < 300:
             return True
         else:
-            # opcional: log curto em stderr/console
-            print(f"⚠️  API retornou {resp.status_code}: {resp.text}")
+            logger.warning(f"⚠️  API retornou {resp.status_code}: {resp.text}")
             return False
     except requests.RequestException as e:
-        print(f"❌ Erro ao enviar para API: {e}")
+        logger.error(f"❌ Erro ao enviar para API: {e}")
         raise e
 
 
-def send_batch_to_api(emails: List[Dict]) -> Dict[str, bool]:
-    """Envia vários emails; retorna mapa id->sucesso"""
-    results = {}
-    for e in emails:
-        eid = str(e.get("id", "")) or "<no-id>"
-        ok = send_email_to_api(e)
-        results[eid] = ok
+def _email_id(email: Dict) -> str:
+    return str(email.get("id", "")) or "<no-id>"
+
+
+def _item_ok(item) -> bool:
+    """Interpreta o resultado de um item da resposta de lote"""
+    if isinstance(item, bool):
+        return item
+    if isinstance(item, dict):
+        status = item.get("status", item.get("status_code", 200))
+        try:
+            status_ok = 200 <= int(status) < 300
+        except (TypeError, ValueError):
+            status_ok = str(status).lower() in ("ok", "created", "success")
+        return bool(item.get("ok", True)) and status_ok
+    return item is not None
+
+
+def _post_batch(emails: List[Dict]) -> Optional[Dict[str, bool]]:
+    """
+    Envia um array de payloads para a rota de lote
+
+    A resposta pode ser um array alinhado à requisição (ou {"results": [...]}),
+    com booleanos ou objetos {"status": 201} por item; sem corpo, 2xx vale
+    para todos. Retorna None se a API não tem a rota de lote.
+    """
+    global _batch_supported, _batch_checked_at
+    payloads = [build_payload(e) for e in emails]
+    try:
+        resp = _post_json(BATCH_API_URL, payloads)
+    except requests.RequestException as e:
+        logger.error(f"❌ Erro ao enviar lote para API: {e}")
+        return {_email_id(e): False for e in emails}
+
+    if resp.status_code in (404, 405, 501):
+        logger.warning(f"⚠️  API sem rota de lote ({resp.status_code}), usando envios individuais")
+        _batch_supported = False
+        _batch_checked_at = time.monotonic()
+        return None
+    _batch_supported = True
+
+    if not 200 <= resp.status_code < 300:
+        logger.warning(f"⚠️  API retornou {resp.status_code} para o lote: {resp.text}")
+        return {_email_id(e): False for e in emails}
+
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+    if isinstance(body, dict):
+        body = body.get("results")
+    if isinstance(body, list) and len(body) == len(emails):
+        return {_email_id(e): _item_ok(item) for e, item in zip(emails, body)}
+    return {_email_id(e): True for e in emails}
+
+
+def _batch_route_enabled() -> bool:
+    """Usa a rota de lote, exceto logo depois de ela responder como inexistente"""
+    if _batch_supported is not False:
+        return True
+    return time.monotonic() - _batch_checked_at >= BATCH_REPROBE_SECONDS
+
+
+def _send_concurrently(emails: List[Dict]) -> Dict[str, bool]:
+    """Envios individuais em paralelo, reaproveitando o pool de conexões"""
+    def send(email: Dict) -> bool:
+        try:
+            return send_email_to_api(email)
+        except requests.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(HTTP_POOL_SIZE, len(emails)))) as pool:
+        oks = list(pool.map(send, emails))
+    return {_email_id(e): ok for e, ok in zip(emails, oks)}
+
+
+def send_batch_to_api(emails: List[Dict], chunk_size: int = BATCH_CHUNK_SIZE) -> Dict[str, bool]:
+    """
+    Envia vários emails em lotes de chunk_size; retorna mapa id->sucesso
+
+    Usa a rota de lote (INBOXSTREAM_BATCH_API_URL); se a API não a tiver,
+    faz envios individuais concorrentes e volta a testar a rota a cada
+    BATCH_REPROBE_SECONDS.
+    """
+    results: Dict[str, bool] = {}
+    for start in range(0, len(emails), max(1, chunk_size)):
+        chunk = emails[start:start + chunk_size]
+        chunk_results = None
+        if _batch_route_enabled():
+            chunk_results = _post_batch(chunk)
+        if chunk_results is None:
+            chunk_results = _send_concurrently(chunk)
+        results.update(chunk_results)
     return results
\ No newline at end of file
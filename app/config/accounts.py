@@ -0,0 +1,101 @@
+"""
+Contas de email monitoradas e distribuição entre processos (sharding)
+
+Sem ACCOUNTS_FILE, há uma única conta vinda do .env (GMAIL_RECIPIENT,
+GMAIL_PASSWORD e GMAIL_SENDER, que aceita vários remetentes separados por
+vírgula). Com ACCOUNTS_FILE, as contas vêm de um JSON:
+
+    [
+      {"name": "ecomp", "email": "caixa@gmail.com", "password_env": "ECOMP_PASSWORD",
+       "senders": ["ccecomp@ecomp.uefs.br", "secretaria@ecomp.uefs.br"]}
+    ]
+
+A senha pode vir direto em "password" ou, de preferência, de uma variável
+de ambiente indicada em "password_env".
+
+Com SHARD_COUNT > 1, cada processo (SHARD_INDEX = 0..SHARD_COUNT-1) cuida
+apenas das contas cujo hash estável cai no seu shard.
+"""
+
+# Importações padrão do Python
+import os
+import json
+import hashlib
+from typing import List, Optional
+
+# Importações de arquivos internos
+from app.models.AccountConfig import AccountConfig
+
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE", "")
+SHARD_COUNT = max(1, int(os.getenv("SHARD_COUNT", "1")))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+
+DEFAULT_SENDER = "ccecomp@ecomp.uefs.br"
+
+
+def _split_senders(value: str) -> List[str]:
+    return [s.strip() for s in value.split(",") if s.strip()]
+
+
+def default_account() -> AccountConfig:
+    """Conta única configurada no .env"""
+    return {
+        "name": "",
+        "email": os.getenv("GMAIL_RECIPIENT") or "",
+        "password": os.getenv("GMAIL_PASSWORD") or "",
+        "senders": _split_senders(os.getenv("GMAIL_SENDER") or DEFAULT_SENDER),
+    }
+
+
+def load_accounts(path: Optional[str] = None) -> List[AccountConfig]:
+    """
+    Lê as contas de ACCOUNTS_FILE (ou da conta única do .env)
+
+    Raises:
+        ValueError: se o arquivo tem contas sem nome/email ou com nomes repetidos
+    """
+    path = path if path is not None else ACCOUNTS_FILE
+    if not path:
+        return [default_account()]
+
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    accounts: List[AccountConfig] = []
+    for entry in entries:
+        senders = entry.get("senders") or DEFAULT_SENDER
+        if isinstance(senders, str):
+            senders = _split_senders(senders)
+        password = entry.get("password") or os.getenv(entry.get("password_env", ""), "")
+        account: AccountConfig = {
+            "name": str(entry.get("name", "")).strip(),
+            "email": str(entry.get("email", "")).strip(),
+            "password": password,
+            "senders": list(senders),
+        }
+        if not account["name"] or not account["email"]:
+            raise ValueError(f"Conta sem name/email em {path}: {entry.get('name') or entry.get('email')}")
+        accounts.append(account)
+
+    names = [a["name"] for a in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Nomes de conta repetidos em {path}")
+    return accounts
+
+
+def account_key(account: AccountConfig) -> str:
+    """Identificador da conta (sessões IMAP, workers e estatísticas)"""
+    return account["name"] or account["email"]
+
+
+def shard_of(account: AccountConfig, shard_count: int = SHARD_COUNT) -> int:
+    """Shard da conta: hash estável do email (igual em todos os processos e execuções)"""
+    digest = hashlib.blake2b(account["email"].strip().lower().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def accounts_for_shard(
+    accounts: List[AccountConfig], shard_index: int = SHARD_INDEX, shard_count: int = SHARD_COUNT
+) -> List[AccountConfig]:
+    """Contas atribuídas a este processo"""
+    return [a for a in accounts if shard_of(a, shard_count) == shard_index]
@@ -0,0 +1,131 @@
+"""
+Configuração única de logging
+Os loggers só colocam o registro em uma fila (QueueHandler); uma thread
+(QueueListener) formata e grava no arquivo e no terminal. Assim a escrita
+em disco e no console sai das threads de ingestão e entrega.
+
+O arquivo é rotacionado por tamanho (LOG_MAX_BYTES, LOG_BACKUP_COUNT) e,
+com LOG_FORMAT=json, cada linha é um objeto JSON (para coletores de log).
+"""
+
+# Importações padrão do Python
+import os
+import sys
+import copy
+import queue
+import atexit
+import logging
+import datetime
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+# Importações de arquivos internos
+from app.utils.serialization import dumps_str
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+# Arquivo de log (vazio = só terminal)
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# "text" ou "json" (uma linha JSON por registro)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").strip().lower() in ("1", "true", "yes")
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos padrão de LogRecord: o que sobrar veio de extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha: horário, nível, logger, mensagem e campos de extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return dumps_str(entry)
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Prepara o registro para a fila só com o mínimo (mensagem com os args
+    aplicados e traceback em texto); a formatação completa fica no listener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def _build_handlers() -> List[logging.Handler]:
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers: List[logging.Handler] = []
+    if LOG_FILE:
+        handlers.append(RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        ))
+    if LOG_CONSOLE:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def setup_logging(level: str = LOG_LEVEL) -> QueueListener:
+    """
+    Liga o logging da aplicação (chamadas repetidas não duplicam handlers)
+
+    O logger raiz recebe apenas um QueueHandler; a gravação acontece na
+    thread do QueueListener, encerrada por stop_logging (ou no atexit).
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_QueueHandler(log_queue))
+        root.setLevel(level)
+
+        _listener = QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Grava o que ainda está na fila e fecha os arquivos"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,162 @@
+"""
+Regras de classificação (palavras-chave e prioridade das categorias)
+
+As regras ficam em um JSON (CLASSIFIER_RULES_FILE, padrão
+app/config/classification_rules.json) e são recarregadas quando o arquivo
+muda, sem reiniciar o serviço:
+
+    {
+      "version": 3,
+      "category_order": ["Achados e Perdidos", ..., "Outros"],
+      "categories": {"Achados e Perdidos": ["achado", "objeto perdido", ...], ...}
+    }
+
+category_order define a prioridade no desempate (mais importante primeiro);
+toda categoria de "categories" precisa aparecer nela. As palavras-chave podem
+ter acentos e maiúsculas: são normalizadas como o texto dos emails.
+"""
+
+# Importações padrão do Python
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+# Importações de arquivos internos
+from app.models.ClassificationRules import ClassificationRules
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_RULES_FILE = os.getenv("CLASSIFIER_RULES_FILE") or os.path.join(
+    os.path.dirname(__file__), "classification_rules.json"
+)
+# Intervalo mínimo entre verificações do arquivo (mtime); 0 = a cada classificação
+CLASSIFIER_RULES_CHECK_SECONDS = float(os.getenv("CLASSIFIER_RULES_CHECK_SECONDS", "5"))
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9\s]')
+_SPACES_RE = re.compile(r'\s+')
+
+# Por arquivo: (mtime, última verificação, regras)
+_loaded: Dict[str, Tuple[float, float, ClassificationRules]] = {}
+# Todas as versões carregadas neste processo (diferença entre versões na reclassificação)
+_history: Dict[str, ClassificationRules] = {}
+_lock = threading.Lock()
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Mesma normalização do texto dos emails (EmailClassifier.normalize_text)"""
+    keyword = unicodedata.normalize('NFKD', keyword.lower()).encode('ascii', 'ignore').decode('utf-8')
+    return _SPACES_RE.sub(" ", _NON_ALNUM_RE.sub(" ", keyword)).strip()
+
+
+def parse_rules(data: Dict, source: str = "<regras>") -> ClassificationRules:
+    """
+    Valida e normaliza o conteúdo do arquivo de regras
+
+    Raises:
+        ValueError: se faltar category_order/categories ou se uma categoria
+            com palavras-chave não estiver em category_order
+    """
+    order = data.get("category_order")
+    categories = data.get("categories")
+    if not isinstance(order, list) or not order or not isinstance(categories, dict):
+        raise ValueError(f"{source}: 'category_order' (lista) e 'categories' (objeto) são obrigatórios")
+
+    category_order = [str(c) for c in order]
+    if len(set(category_order)) != len(category_order):
+        raise ValueError(f"{source}: categorias repetidas em 'category_order'")
+    unknown = [c for c in categories if c not in category_order]
+    if unknown:
+        raise ValueError(f"{source}: categorias fora de 'category_order': {', '.join(unknown)}")
+
+    normalized: Dict[str, List[str]] = {}
+    for category, keywords in categories.items():
+        if not isinstance(keywords, list):
+            raise ValueError(f"{source}: palavras-chave de '{category}' devem ser uma lista")
+        normalized[category] = [kw for kw in map(normalize_keyword, map(str, keywords)) if kw]
+
+    canonical = json.dumps([category_order, normalized], ensure_ascii=False, sort_keys=True)
+    digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=4).hexdigest()
+    return {
+        "version": f"{data.get('version', 0)}-{digest}",
+        "category_order": category_order,
+        "categories": normalized,
+    }
+
+
+def load_rules(path: Optional[str] = None) -> ClassificationRules:
+    """
+    Regras do arquivo, relidas só quando o mtime muda (verificado no máximo
+    a cada CLASSIFIER_RULES_CHECK_SECONDS)
+
+    Um arquivo inválido depois de já ter carregado regras é ignorado (com
+    log de erro) e as regras anteriores continuam valendo.
+
+    Raises:
+        OSError, ValueError: se a primeira leitura do arquivo falhar
+    """
+    path = path or CLASSIFIER_RULES_FILE
+    now = time.monotonic()
+    with _lock:
+        cached = _loaded.get(path)
+        if cached is not None and now - cached[1] < CLASSIFIER_RULES_CHECK_SECONDS:
+            return cached[2]
+
+        try:
+            mtime = os.path.getmtime(path)
+            if cached is not None and cached[0] == mtime:
+                _loaded[path] = (mtime, now, cached[2])
+                return cached[2]
+            with open(path, "r", encoding="utf-8") as f:
+                rules = parse_rules(json.load(f), path)
+        except (OSError, ValueError) as ex:
+            if cached is None:
+                raise
+            logger.error(f"❌ Regras de classificação inválidas em {path}, mantendo {cached[2]['version']}: {ex}")
+            _loaded[path] = (cached[0], now, cached[2])
+            return cached[2]
+
+        if cached is not None and cached[2]["version"] != rules["version"]:
+            logger.info(f"📜 Regras de classificação atualizadas: {cached[2]['version']} → {rules['version']}")
+        _loaded[path] = (mtime, now, rules)
+        _history[rules["version"]] = rules
+        return rules
+
+
+def known_rules() -> Dict[str, ClassificationRules]:
+    """Versões de regras já carregadas neste processo, por versão"""
+    with _lock:
+        return dict(_history)
+
+
+def changed_keywords(old: ClassificationRules, new: ClassificationRules) -> Set[str]:
+    """
+    Palavras-chave cuja presença pode mudar a categoria de um email ao
+    passar de old para new: as adicionadas, as removidas, as que mudaram de
+    categoria e todas as das categorias que mudaram de prioridade
+
+    Um email sem nenhuma delas tem exatamente as mesmas correspondências
+    (e o mesmo desempate) nas duas versões.
+    """
+    def by_keyword(rules: ClassificationRules) -> Dict[str, List[str]]:
+        index: Dict[str, List[str]] = {}
+        for category, keywords in rules["categories"].items():
+            for kw in keywords:
+                index.setdefault(kw, []).append(category)
+        return {kw: sorted(categories) for kw, categories in index.items()}
+
+    old_index, new_index = by_keyword(old), by_keyword(new)
+    changed = {kw for kw in old_index.keys() | new_index.keys() if old_index.get(kw) != new_index.get(kw)}
+
+    old_rank = {c: i for i, c in enumerate(old["category_order"])}
+    new_rank = {c: i for i, c in enumerate(new["category_order"])}
+    for category in old_rank.keys() | new_rank.keys():
+        if old_rank.get(category) != new_rank.get(category):
+            changed.update(old["categories"].get(category, ()))
+            changed.update(new["categories"].get(category, ()))
+    return changed
@@ -0,0 +1,14 @@
+from typing import List, TypedDict
+
+class AccountConfig(TypedDict):
+    """
+    Caixa de correio monitorada
+
+    name identifica a conta nos ids dos emails ("<name>:<id>"), no estado de
+    sincronização e no sharding; a conta padrão (.env) tem name vazio e
+    mantém os ids originais.
+    """
+    name: str
+    email: str
+    password: str
+    senders: List[str]
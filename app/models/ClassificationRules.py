@@ -0,0 +1,14 @@
+from typing import Dict, List, TypedDict
+
+class ClassificationRules(TypedDict):
+    """
+    Regras de classificação por palavras-chave (app/config/classification_rules.json)
+
+    version combina a versão declarada no arquivo com um hash do conteúdo
+    (ex.: "3-9f1c2ab0"): uma edição sem mudar a versão declarada também gera
+    uma versão nova. As palavras-chave já vêm normalizadas (minúsculas, sem
+    acentos nem pontuação), como o texto com que são comparadas.
+    """
+    version: str
+    category_order: List[str]
+    categories: Dict[str, List[str]]
@@ -7,4 +7,5 @@ class EmailData(TypedDict):
     sender: str
     date: str
     labels: List[str]
-    snippet: str
\ No newline at end of file
+    snippet: str
+    message_id: str
\ No newline at end of file
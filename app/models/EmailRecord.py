@@ -0,0 +1,181 @@
+import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def parse_email_date(value: str) -> Optional[float]:
+    """Timestamp (UTC) do header Date, ou None se inválido"""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def iso_utc(timestamp: Optional[float]) -> str:
+    """Data ISO 8601 em UTC; sem data válida, usa agora"""
+    if timestamp is None:
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+class EmailRecord:
+    """
+    Email decodificado, compacto (__slots__) e compatível com EmailData
+
+    Aceita o acesso de dicionário usado no resto do código (email["id"],
+    email.get(...), email["categoria"] = ..., copy(), update()); chaves fora
+    do schema vão para um dicionário extra, criado só quando necessário.
+    Os campos do schema estão sempre presentes, exceto "categoria" (ausente
+    enquanto None); só ela e as chaves extras podem ser removidas com pop.
+
+    O header Date é interpretado uma única vez, na criação: date_ts e
+    date_iso ficam guardados para o armazenamento local e para a API.
+    """
+
+    FIELDS: Tuple[str, ...] = (
+        "id", "subject", "sender", "date", "labels", "snippet", "message_id", "categoria",
+    )
+
+    __slots__ = FIELDS + ("date_ts", "date_iso", "_extra")
+
+    def __init__(
+        self,
+        id: str = "",
+        subject: str = "",
+        sender: str = "",
+        date: str = "",
+        labels: Optional[List[str]] = None,
+        snippet: str = "",
+        message_id: str = "",
+        categoria: Optional[str] = None,
+        **extra: Any,
+    ):
+        self.id = id
+        self.subject = subject
+        self.sender = sender
+        self.labels = labels if labels is not None else []
+        self.snippet = snippet
+        self.message_id = message_id
+        self.categoria = categoria
+        self._extra: Optional[Dict[str, Any]] = extra or None
+        self._set_date(date)
+
+    def _set_date(self, date: str):
+        self.date = date
+        self.date_ts = parse_email_date(date) if date else None
+        self.date_iso = iso_utc(self.date_ts)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EmailRecord":
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
+
+    # --- Compatibilidade com dicionários (EmailData) ---
+
+    def keys(self) -> List[str]:
+        keys = [f for f in self.FIELDS if f != "categoria" or self.categoria is not None]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self) -> List[Any]:
+        return [self[k] for k in self.keys()]
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.FIELDS:
+            return key != "categoria" or self.categoria is not None
+        return bool(self._extra) and key in self._extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None or key != "categoria":
+                return value
+        elif self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key: str, value: Any):
+        if key == "date":
+            self._set_date(value)
+        elif key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def update(self, other: Any = (), **kwargs: Any):
+        items = other.items() if hasattr(other, "items") else other
+        for key, value in items:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self.FIELDS and key != "categoria":
+            raise TypeError(f"Campo obrigatório do EmailRecord não pode ser removido: {key}")
+        if key in self:
+            value = self[key]
+            if key == "categoria":
+                self.categoria = None
+            else:
+                del self._extra[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def copy(self) -> "EmailRecord":
+        clone = EmailRecord.__new__(EmailRecord)
+        for slot in self.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.labels = list(self.labels)
+        clone._extra = dict(self._extra) if self._extra else None
+        return clone
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (EmailRecord, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EmailRecord(id={self.id!r}, subject={self.subject!r}, categoria={self.categoria!r})"
+
+    # --- Serialização ---
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dicionário EmailData (outbox, feed ao vivo)"""
+        return dict(self.items())
+
+    def to_payload(self) -> Dict[str, str]:
+        """Schema da API (ver app.api.inbox_stream.build_payload), sem reinterpretar a data"""
+        body = self._extra.get("body") if self._extra else None
+        return {
+            "id": str(self.id or self.message_id or ""),
+            "subject": self.subject,
+            "body": body or self.snippet or "",
+            "category": self.categoria or "Geral",
+            "date": self.date_iso,
+        }
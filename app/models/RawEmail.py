@@ -0,0 +1,25 @@
+from typing import List, TypedDict
+
+class RawEmail(TypedDict, total=False):
+    """
+    Email baixado via IMAP e ainda não decodificado
+
+    Vem em uma de duas formas: o início da mensagem ('rfc822', até
+    PARSE_MAX_BYTES) ou, no FETCH em lote, os headers e a parte de texto já
+    recortada ('headers' + 'body', com o subtipo: 'plain' ou 'html')
+
+    uid e uidvalidity identificam a mensagem na caixa (chave do cache local);
+    reprocess marca mensagens lidas do cache, que não passam pela deduplicação
+    """
+    id: str
+    account: str
+    uid: int
+    uidvalidity: int
+    rfc822: bytes
+    headers: bytes
+    body: bytes
+    encoding: str
+    charset: str
+    subtype: str
+    labels: List[str]
+    reprocess: bool
@@ -1,93 +1,208 @@
 # importações padrão do Python
+import os
 import re
+import hashlib
+import itertools
+import logging
 import unicodedata
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Importações de arquivos internos
 from app.models.EmailData import EmailData
+from app.models.ClassificationRules import ClassificationRules
+from app.config.rules import CLASSIFIER_RULES_FILE, load_rules
+from app.utils.cache import LRUCache
+from app.services import linear_classifier
+
+logger = logging.getLogger(__name__)
+
+# Motor de classificação: "keywords" (palavras-chave) ou "linear" (modelo
+# treinado, ver app/services/train_classifier.py); o linear usa as
+# palavras-chave para emails sem nenhuma feature conhecida
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "keywords").strip().lower()
+CLASSIFIER_MODEL_DIR = os.getenv("CLASSIFIER_MODEL_DIR", "models/classifier")
+
+# Classificação em lote: os primeiros N emails são classificados no processo; o restante vai para um pool de processos
+CLASSIFY_PARALLEL_THRESHOLD = int(os.getenv("CLASSIFY_PARALLEL_THRESHOLD", "2000"))
+CLASSIFY_CHUNK_SIZE = int(os.getenv("CLASSIFY_CHUNK_SIZE", "500"))
+# 0 = um processo por núcleo
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", "0"))
+
+# Cache de texto normalizado (assuntos repetidos, rodapés, respostas citadas)
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "4096"))
+NORMALIZE_CACHE_TTL_SECONDS = float(os.getenv("NORMALIZE_CACHE_TTL_SECONDS", "3600"))
+# Normaliza apenas os primeiros N KB (N * 1024 caracteres) do texto; 0 = sem limite
+NORMALIZE_MAX_KB = int(os.getenv("NORMALIZE_MAX_KB", "0"))
+
+# Compartilhado entre instâncias: get_emails cria um classificador por ciclo
+normalize_cache = LRUCache(NORMALIZE_CACHE_SIZE, NORMALIZE_CACHE_TTL_SECONDS)
+
+# Matchers compilados, por versão das regras (compartilhados entre instâncias)
+_matchers: Dict[str, tuple] = {}
+
+# Modelos já abertos, por diretório: (mtime do meta.json, modelo)
+_models: Dict[str, Tuple[float, Optional["linear_classifier.LinearModel"]]] = {}
+
+
+def load_linear_model(model_dir: str = CLASSIFIER_MODEL_DIR) -> Optional["linear_classifier.LinearModel"]:
+    """
+    Modelo linear do diretório, reaberto só quando o meta.json muda
+    (um novo treino); None se não houver modelo utilizável
+    """
+    try:
+        mtime = os.path.getmtime(os.path.join(model_dir, "meta.json"))
+    except OSError:
+        mtime = -1.0
+    cached = _models.get(model_dir)
+    if cached is None or cached[0] != mtime:
+        cached = _models[model_dir] = (mtime, linear_classifier.load_model(model_dir))
+    return cached[1]
 
 
 class EmailClassifier:
     """
     Classificador simples de emails baseado em palavras-chave,
     com priorização inteligente e correspondência por palavras inteiras.
+
+    Com backend="linear", usa o modelo treinado em model_dir e recorre às
+    palavras-chave se o modelo não existir ou não reconhecer o email.
+
+    As regras vêm do arquivo CLASSIFIER_RULES_FILE e são recarregadas quando
+    ele muda; rule_version identifica as regras usadas na última classificação.
     """
 
-    def __init__(self):
-        # Ordem de prioridade — categorias mais importantes primeiro
-        self.category_order: List[str] = [
-            "Achados e Perdidos",
-            "Prováveis Concluintes / Formandos",
-            "Avisos da Coordenação / Secretaria",
-            "Estágio / Trainee / Oportunidades",
-            "TCC / Projeto Final",
-            "Pesquisa / Iniciação Científica / Pós-Graduação",
-            "Monitoria / Tutoria / Bolsas Acadêmicas",
-            "Eventos / Palestras / Workshops",
-            "Disciplinas / Professores / Aulas",
-            "Matrícula / Ajuste de Disciplina / SEI",
-            "Assistência Estudantil / Benefícios",
-            "Outros"
-        ]
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        model_dir: Optional[str] = None,
+        model: Optional["linear_classifier.LinearModel"] = None,
+        rules: Optional[ClassificationRules] = None,
+        rules_path: Optional[str] = None,
+        hot_reload: Optional[bool] = None,
+    ):
+        self.backend = "linear" if model is not None else (backend or CLASSIFIER_BACKEND)
+        self.model_dir = model_dir or CLASSIFIER_MODEL_DIR
+        if model is None and self.backend == "linear":
+            model = load_linear_model(self.model_dir)
+        self.model = model
+
+        # Palavras-chave e prioridade das categorias (app/config/classification_rules.json);
+        # regras passadas explicitamente não são recarregadas do arquivo
+        self.rules_path = rules_path or CLASSIFIER_RULES_FILE
+        self.hot_reload = rules is None if hot_reload is None else hot_reload
+        self._apply_rules(rules or load_rules(self.rules_path))
 
+    def _apply_rules(self, rules: ClassificationRules):
+        """Troca as regras, reaproveitando o matcher já compilado para a versão"""
+        self.rules = rules
+        self.rule_version: str = rules["version"]
+        # Ordem de prioridade — categorias mais importantes primeiro
+        self.category_order: List[str] = list(rules["category_order"])
         # Palavras-chave por categoria
-        self.categories: Dict[str, List[str]] = {
-            "Avisos da Coordenação / Secretaria": [
-                "coordenacao", "ccecomp", "secretaria", "comunicado", "aviso",
-                "documento", "prazo", "formulario", "calendario", "cancelamento",
-                "solicitacao", "publicacao", "eleicao", "colegiado", "coordenador",
-                "vice coordenador", "gestao", "convocacao", "comissao"
-            ],
-            "TCC / Projeto Final": [
-                "tcc", "trabalho de conclusao", "banca", "orientador",
-                "projeto final", "defesa", "monografia", "resumo", "correcao",
-                "apresentacao"
-            ],
-            "Prováveis Concluintes / Formandos": [
-                "provaveis concluintes", "formando", "formandos", "colacao de grau",
-                "banco de talentos", "egresso", "egressos", "finalista",
-                "ultimo semestre", "conclusao do curso"
-            ],
-            "Estágio / Trainee / Oportunidades": [
-                "estagio", "trainee", "vaga", "emprego", "oportunidade",
-                "recrutamento", "bolsa", "curriculo", "contratacao",
-                "processo seletivo", "empresa"
-            ],
-            "Pesquisa / Iniciação Científica / Pós-Graduação": [
-                "pesquisa", "pibic", "ic", "iniciacao cientifica", "laboratorio",
-                "submissao", "artigo", "paper", "publicacao", "pos graduacao",
-                "mestrado", "doutorado"
-            ],
-            "Disciplinas / Professores / Aulas": [
-                "aula", "professor", "disciplina", "nota", "atividade", "prova",
-                "trabalho", "avaliacao", "materiais", "cancelada", "reposicao",
-                "horario"
-            ],
-            "Eventos / Palestras / Workshops": [
-                "palestra", "seminario", "evento", "oficina", "workshop", "encontro",
-                "congresso", "simposio", "mesa redonda", "live", "webinar", "feira"
-            ],
-            "Monitoria / Tutoria / Bolsas Acadêmicas": [
-                "monitoria", "tutoria", "bolsa", "inscricao", "edital", "resultado",
-                "aprovado", "selecionado", "auxilio", "substituto"
-            ],
-            "Assistência Estudantil / Benefícios": [
-                "assistencia", "bolsa", "auxilio", "moradia", "alimentacao",
-                "transporte", "beneficio", "proae", "cadastro", "socioeconomico"
-            ],
-            "Matrícula / Ajuste de Disciplina / SEI": [
-                "matricula", "ajuste", "cancelamento", "sei", "inscricao", "reajuste",
-                "trancamento", "historico", "periodo", "disciplina", "cadastro"
-            ],
-            "Achados e Perdidos": [
-                "achado", "achados", "perdido", "perdidos", "achados e perdidos",
-                "objeto encontrado", "objeto perdido", "encontrado", "perdi"
-            ],
-            "Outros": []
+        self.categories: Dict[str, List[str]] = {c: list(kws) for c, kws in rules["categories"].items()}
+
+        compiled = _matchers.get(self.rule_version)
+        if compiled is None:
+            self._build_matcher()
+            _matchers[self.rule_version] = (
+                self._category_rank, self._keyword_categories, self._keyword_prefixes, self._matcher
+            )
+        else:
+            self._category_rank, self._keyword_categories, self._keyword_prefixes, self._matcher = compiled
+
+    def reload_rules(self) -> bool:
+        """
+        Aplica as regras do arquivo se mudaram (o arquivo é verificado no
+        máximo a cada CLASSIFIER_RULES_CHECK_SECONDS)
+
+        Returns:
+            True se a versão das regras mudou
+        """
+        if not self.hot_reload:
+            return False
+        rules = load_rules(self.rules_path)
+        if rules["version"] == self.rule_version:
+            return False
+        self._apply_rules(rules)
+        return True
+
+    def _build_matcher(self):
+        """
+        Compila as palavras-chave em uma única regex, usada em uma só
+        passada pelo texto (em vez de uma busca por palavra-chave)
+
+        A regex testa, em cada posição, a palavra-chave mais longa que casa
+        como palavra inteira; as palavras-chave que são prefixo dela (ex.:
+        "achados" em "achados e perdidos") também casam na mesma posição e
+        são somadas via _keyword_prefixes. O resultado é idêntico ao de
+        contains_keyword aplicado a cada palavra-chave.
+        """
+        self._category_rank: Dict[str, int] = {c: i for i, c in enumerate(self.category_order)}
+
+        # Palavra-chave -> categorias em que aparece (repetições contam em dobro,
+        # como na soma original)
+        self._keyword_categories: Dict[str, List[str]] = {}
+        for category, keywords in self.categories.items():
+            for kw in keywords:
+                self._keyword_categories.setdefault(kw, []).append(category)
+
+        keywords = sorted(self._keyword_categories, key=len, reverse=True)
+        self._keyword_prefixes: Dict[str, List[str]] = {
+            kw: [
+                other for other in keywords
+                if other != kw and re.match(r'\b' + re.escape(other) + r'\b', kw)
+            ]
+            for kw in keywords
         }
 
+        if keywords:
+            alternation = "|".join(re.escape(kw) for kw in keywords)
+            self._matcher = re.compile(r'(?=\b(' + alternation + r')\b)')
+        else:
+            self._matcher = None
+
+    def keyword_hits(self, text: str) -> Dict[str, int]:
+        """
+        Conta, em uma passada pelo texto normalizado, quantas palavras-chave
+        de cada categoria aparecem (cada palavra-chave conta uma vez)
+        """
+        if self._matcher is None:
+            return {}
+
+        found = set()
+        for match in self._matcher.finditer(text):
+            keyword = match.group(1)
+            if keyword not in found:
+                found.add(keyword)
+                found.update(self._keyword_prefixes[keyword])
+
+        hits: Dict[str, int] = {}
+        for keyword in found:
+            for category in self._keyword_categories[keyword]:
+                hits[category] = hits.get(category, 0) + 1
+        return hits
+
     def normalize_text(self, text: str) -> str:
-        """Remove acentos e pontuação, e converte para minúsculas"""
+        """
+        Remove acentos e pontuação, e converte para minúsculas
+
+        O resultado fica em cache, indexado pelo hash do conteúdo.
+        Com NORMALIZE_MAX_KB, textos enormes são cortados antes de normalizar.
+        """
+        if NORMALIZE_MAX_KB and len(text) > NORMALIZE_MAX_KB * 1024:
+            text = text[:NORMALIZE_MAX_KB * 1024]
+
+        key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        normalized = normalize_cache.get(key)
+        if normalized is None:
+            normalized = self._normalize(text)
+            normalize_cache.put(key, normalized)
+        return normalized
+
+    @staticmethod
+    def _normalize(text: str) -> str:
         text = text.lower()
         text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
         text = re.sub(r'[^a-z0-9\s]', ' ', text)
@@ -100,16 +215,30 @@ class EmailClassifier:
 
     def classify_email(self, email: EmailData) -> str:
         """Classifica um único email com base no assunto e snippet"""
-        subject = self.normalize_text(email.get("subject", ""))
-        snippet = self.normalize_text(email.get("snippet", ""))
-        full_text = subject + " " + snippet
+        return self.classify_batch([(email.get("subject", ""), email.get("snippet", ""))])[0]
 
-        matches: Dict[str, int] = {}
+    def classify_batch(self, texts: List[Tuple[str, str]]) -> List[str]:
+        """
+        Classifica um lote de (assunto, corpo)
 
-        for category, keywords in self.categories.items():
-            count = sum(1 for kw in keywords if self.contains_keyword(full_text, kw))
-            if count > 0:
-                matches[category] = count
+        No backend linear o lote inteiro é pontuado de uma vez (uma
+        multiplicação de matrizes); emails sem features conhecidas pelo
+        modelo caem nas palavras-chave. As regras são recarregadas antes do
+        lote se o arquivo mudou (a versão usada fica em rule_version).
+        """
+        self.reload_rules()
+        docs = [(self.normalize_text(subject), self.normalize_text(snippet)) for subject, snippet in texts]
+        if self.model is None:
+            return [self.classify_keywords(subject + " " + snippet) for subject, snippet in docs]
+        predicted = self.model.predict(docs)
+        return [
+            categoria or self.classify_keywords(subject + " " + snippet)
+            for categoria, (subject, snippet) in zip(predicted, docs)
+        ]
+
+    def classify_keywords(self, full_text: str) -> str:
+        """Categoria pelas palavras-chave de um texto já normalizado"""
+        matches: Dict[str, int] = self.keyword_hits(full_text)
 
         if not matches:
             return "Outros"
@@ -117,16 +246,130 @@ class EmailClassifier:
         # Critério: mais correspondências, depois prioridade
         best_category = max(
             matches,
-            key=lambda c: (matches[c], -self.category_order.index(c))
+            key=lambda c: (matches[c], -self._category_rank[c])
         )
         return best_category
 
     def classify_all(self, emails: List[EmailData]) -> List[EmailData]:
         """Classifica uma lista de emails e adiciona o campo 'categoria'"""
-        classified: List[EmailData] = []
-        for email in emails:
-            categoria = self.classify_email(email)
-            email_with_cat = email.copy()
-            email_with_cat["categoria"] = categoria  # adiciona a categoria dinamicamente
-            classified.append(email_with_cat)
-        return classified
+        return list(self.classify_iter(emails))
+
+    def classify_iter(
+        self,
+        emails: Iterable[EmailData],
+        in_place: bool = False,
+        workers: Optional[int] = None,
+        chunk_size: int = CLASSIFY_CHUNK_SIZE,
+        threshold: int = CLASSIFY_PARALLEL_THRESHOLD,
+    ) -> Iterator[EmailData]:
+        """
+        Classifica emails sob demanda, preservando a ordem de entrada
+
+        Os primeiros `threshold` emails são classificados no próprio processo,
+        em blocos de `chunk_size`, e entregues assim que cada bloco fica
+        pronto; se o iterável continuar depois disso, o restante é
+        distribuído em blocos por um pool de processos (apenas assunto e
+        corpo são enviados aos workers).
+
+        Args:
+            emails: qualquer iterável de EmailData (pode ser um gerador)
+            in_place: se True, grava 'categoria' no próprio dicionário em vez
+                de devolver uma cópia
+            workers: processos do pool (padrão: CLASSIFY_WORKERS ou nº de núcleos)
+            chunk_size: emails por bloco (e por tarefa enviada ao pool)
+            threshold: emails classificados no processo antes de usar o pool
+
+        Yields:
+            Emails com o campo 'categoria'
+        """
+        iterator = iter(emails)
+        chunk_size = max(1, chunk_size)
+
+        sequential = 0
+        while sequential < threshold:
+            chunk = list(itertools.islice(iterator, min(chunk_size, threshold - sequential)))
+            if not chunk:
+                return
+            sequential += len(chunk)
+            categorias = self.classify_batch([(e.get("subject", ""), e.get("snippet", "")) for e in chunk])
+            for email, categoria in zip(chunk, categorias):
+                yield self._with_category(email, categoria, self.rule_version, in_place)
+
+        # Só abre o pool se ainda houver emails depois do limite
+        first = next(iterator, None)
+        if first is None:
+            return
+        yield from self._classify_parallel(
+            itertools.chain((first,), iterator), in_place, workers, chunk_size
+        )
+
+    def _classify_parallel(
+        self,
+        emails: Iterator[EmailData],
+        in_place: bool,
+        workers: Optional[int],
+        chunk_size: int,
+    ) -> Iterator[EmailData]:
+        workers = workers or CLASSIFY_WORKERS or os.cpu_count() or 1
+        max_in_flight = workers * 2
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_classifier_worker,
+            initargs=self.worker_args(),
+        ) as pool:
+            pending = deque()
+            while True:
+                chunk = list(itertools.islice(emails, chunk_size))
+                if chunk:
+                    texts = [(e.get("subject", ""), e.get("snippet", "")) for e in chunk]
+                    pending.append((pool.submit(classify_texts, texts), chunk))
+                # Limita os blocos em voo: consumo lento não acumula resultados
+                while pending and (len(pending) >= max_in_flight or not chunk):
+                    future, done_chunk = pending.popleft()
+                    rule_version, categorias = future.result()
+                    for email, categoria in zip(done_chunk, categorias):
+                        yield self._with_category(email, categoria, rule_version, in_place)
+                if not chunk:
+                    break
+
+    def worker_args(self) -> tuple:
+        """Argumentos de init_classifier_worker para reproduzir este classificador"""
+        return (self.rules, self.backend, self.model_dir, self.rules_path if self.hot_reload else None)
+
+    @staticmethod
+    def _with_category(email: EmailData, categoria: str, rule_version: str, in_place: bool) -> EmailData:
+        if not in_place:
+            email = email.copy()
+        email["categoria"] = categoria  # adiciona a categoria dinamicamente
+        email["rule_version"] = rule_version
+        return email
+
+
+# --- Workers do pool de processos ---
+_worker_classifier: Optional[EmailClassifier] = None
+
+
+def init_classifier_worker(
+    rules: ClassificationRules,
+    backend: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    rules_path: Optional[str] = None,
+):
+    """
+    Compila o classificador uma vez por processo, com as mesmas regras do pai
+    (o modelo linear é aberto com mmap: os workers compartilham as páginas)
+
+    Com rules_path, o worker acompanha as mudanças do arquivo de regras
+    sozinho, sem reiniciar o pool.
+    """
+    global _worker_classifier
+    _worker_classifier = EmailClassifier(
+        backend, model_dir, rules=rules, rules_path=rules_path, hot_reload=rules_path is not None
+    )
+
+
+def classify_texts(texts: List[Tuple[str, str]]) -> Tuple[str, List[str]]:
+    """Classifica um bloco de (assunto, corpo) no processo worker; devolve (versão das regras, categorias)"""
+    categorias = _worker_classifier.classify_batch(texts)
+    return _worker_classifier.rule_version, categorias
@@ -0,0 +1,320 @@
+"""
+Importação histórica (backfill) da caixa de correio
+Percorre todos os emails do remetente em blocos de UIDs, buscando os
+blocos em paralelo (uma conexão IMAP por worker), classificando e
+entregando à medida que chegam. O progresso é salvo em checkpoint, então
+uma execução interrompida continua de onde parou.
+
+Uso: python -m app.services.backfill
+"""
+
+# Importações padrão do Python
+import os
+import json
+import time
+import bisect
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.models.AccountConfig import AccountConfig
+from app.services.gmail_imap import FetchError, GmailIMAPReader, session_pool
+from app.services.EmailClassifer import EmailClassifier
+from app.services.dedup import DedupFilter
+from app.services.raw_cache import RawMessageCache, RAW_CACHE_ENABLED
+from app.utils.helpers import write_json_atomic
+from app.utils.imap import from_criteria
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "200"))
+# O Gmail aceita até 15 conexões IMAP simultâneas por conta
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "3"))
+BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", "backfill_checkpoint.json")
+
+
+class BackfillCheckpoint:
+    """
+    Faixas de UIDs já importadas, persistidas em JSON
+
+    As faixas ficam ordenadas e sem sobreposição (faixas vizinhas são
+    fundidas), então is_done é uma busca binária e o arquivo não cresce
+    com o número de blocos.
+    """
+
+    def __init__(self, path: str = BACKFILL_CHECKPOINT_FILE):
+        self.path = path
+        self.uidvalidity: Optional[int] = None
+        self.done: List[List[int]] = []
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.uidvalidity = data.get("uidvalidity")
+            # Checkpoints antigos guardavam uma faixa por bloco, sem fundir
+            self.done = self._merged(data.get("done", []))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Checkpoint ilegível ({path}), recomeçando: {e}")
+
+    def reset(self, uidvalidity: int):
+        """Descarta o progresso (UIDVALIDITY mudou: os UIDs antigos não valem mais)"""
+        with self._lock:
+            self.uidvalidity = uidvalidity
+            self.done = []
+            write_json_atomic(self.path, {"uidvalidity": uidvalidity, "done": self.done})
+
+    @staticmethod
+    def _merged(ranges: List[List[int]]) -> List[List[int]]:
+        """Ordena e funde faixas sobrepostas ou adjacentes"""
+        merged: List[List[int]] = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        return merged
+
+    def is_done(self, uid: int) -> bool:
+        # Última faixa que começa em até uid
+        i = bisect.bisect_right(self.done, [uid, float("inf")]) - 1
+        return i >= 0 and uid <= self.done[i][1]
+
+    def mark_done(self, first: int, last: int):
+        """Registra uma faixa concluída (fundindo com as vizinhas) e persiste"""
+        with self._lock:
+            i = bisect.bisect_left(self.done, [first, last])
+            self.done.insert(i, [first, last])
+            # Funde com a faixa anterior e com as seguintes que ela alcança
+            lo = i - 1 if i > 0 and self.done[i - 1][1] + 1 >= first else i
+            hi = i + 1
+            while hi < len(self.done) and self.done[hi][0] <= last + 1:
+                hi += 1
+            self.done[lo:hi] = self._merged(self.done[lo:hi])
+            write_json_atomic(self.path, {"uidvalidity": self.uidvalidity, "done": self.done})
+
+
+class MailboxBackfill:
+    """
+    Importa o histórico completo dos remetentes de uma conta
+
+    Args:
+        deliver: função que entrega um email classificado (ex.: Outbox.put)
+        chunk_size: UIDs por bloco (um FETCH em lote por bloco)
+        concurrency: conexões IMAP em paralelo
+        checkpoint_path: arquivo de checkpoint (por padrão, um por conta)
+        dedup: descarta emails já processados (ex.: já vistos pelo pipeline)
+        account: conta a importar (a do .env se None)
+        raw_cache: guarda as mensagens brutas baixadas (reprocessamento sem IMAP)
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[EmailData], bool],
+        chunk_size: int = BACKFILL_CHUNK_SIZE,
+        concurrency: int = BACKFILL_CONCURRENCY,
+        checkpoint_path: Optional[str] = None,
+        dedup: Optional[DedupFilter] = None,
+        account: Optional[AccountConfig] = None,
+        raw_cache: Optional[RawMessageCache] = None,
+    ):
+        self.deliver = deliver
+        self.raw_cache = raw_cache
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = max(1, concurrency)
+        self.account = account
+        if checkpoint_path is None:
+            checkpoint_path = BACKFILL_CHECKPOINT_FILE
+            if account and account["name"]:
+                base, ext = os.path.splitext(BACKFILL_CHECKPOINT_FILE)
+                checkpoint_path = f"{base}.{account['name']}{ext}"
+        self.checkpoint = BackfillCheckpoint(checkpoint_path)
+        self.classifier = EmailClassifier()
+        self.dedup = dedup
+
+        self._local = threading.local()
+        self._readers: List[GmailIMAPReader] = []
+        self._readers_lock = threading.Lock()
+
+        self.running = False
+        self.total = 0
+        self.processed = 0
+        self.delivered = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _reader(self) -> GmailIMAPReader:
+        """Conexão própria de cada worker (imaplib não é thread-safe)"""
+        reader = getattr(self._local, "reader", None)
+        if reader is None or not reader.is_alive():
+            if reader is not None:
+                reader.disconnect()
+                reader.connect()
+            else:
+                reader = GmailIMAPReader(self.account)
+                with self._readers_lock:
+                    self._readers.append(reader)
+            if not reader.imap:
+                raise ConnectionError("Falha na conexão IMAP do worker")
+            reader.select_inbox()
+            self._local.reader = reader
+        return reader
+
+    def _fetch_chunk(self, uids: List[int]) -> Tuple[List[EmailData], List[int]]:
+        """Baixa um bloco; retorna os emails baixados e os UIDs que falharam"""
+        failed: List[int] = []
+        try:
+            raws = self._reader().fetch_raw_batch(uids)
+        except FetchError as ex:
+            logger.error(f"❌ Falha ao buscar parte do bloco {uids[0]}-{uids[-1]}: {ex}")
+            raws, failed = ex.raws, ex.failed
+        if self.raw_cache:
+            try:
+                self.raw_cache.put_many(raws)
+            except Exception as ex:
+                logger.error(f"❌ Falha ao gravar no cache de mensagens: {ex}")
+        return [e for e in map(GmailIMAPReader.parse_raw, raws) if e], failed
+
+    def _list_uids(self) -> List[int]:
+        """Lista todos os UIDs do remetente, do mais antigo ao mais recente"""
+        with session_pool.session(self.account) as gmail:
+            if gmail is None:
+                raise ConnectionError("Falha na conexão. Configure o .env corretamente.")
+            gmail.select_inbox()
+            status, messages = gmail.imap.uid('SEARCH', None, from_criteria(gmail.senders))
+            if status != 'OK':
+                raise RuntimeError("Erro ao buscar emails")
+            if self.checkpoint.uidvalidity != gmail.uidvalidity:
+                self.checkpoint.reset(gmail.uidvalidity)
+            return sorted(int(u) for u in messages[0].split())
+
+    def throughput(self) -> float:
+        """Emails processados por segundo"""
+        if not self.started_at:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def status(self) -> Dict:
+        """Progresso atual do backfill"""
+        return {
+            "running": self.running,
+            "total": self.total,
+            "processed": self.processed,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "emails_per_second": round(self.throughput(), 2),
+        }
+
+    def _handle_chunk(self, chunk: List[int], emails: List[EmailData], failed: List[int]):
+        """
+        Classifica e entrega um bloco; só marca no checkpoint se o bloco foi
+        baixado inteiro e tudo foi entregue (senão ele volta na próxima execução)
+        """
+        ok = not failed
+        self.failed += len(failed)
+        if self.dedup:
+            emails = self.dedup.filter_new(emails)
+        for e in self.classifier.classify_all(emails):
+            try:
+                if self.deliver(e):
+                    self.delivered += 1
+                    delivered = True
+                else:
+                    ok = delivered = False
+                    self.failed += 1
+            except Exception as ex:
+                logger.error(f"❌ Falha ao enviar email ID {e['id']} para API: {ex}")
+                ok = delivered = False
+                self.failed += 1
+            if self.dedup:
+                (self.dedup.remember if delivered else self.dedup.release)([e])
+        self.processed += len(chunk)
+        if ok:
+            self.checkpoint.mark_done(chunk[0], chunk[-1])
+        logger.info(
+            f"📦 Backfill {self.processed}/{self.total} "
+            f"({self.throughput():.1f} emails/s)"
+        )
+
+    def run(self) -> Dict:
+        """Executa o backfill até o fim e retorna o status final"""
+        self.running = True
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        try:
+            uids = [u for u in self._list_uids() if not self.checkpoint.is_done(u)]
+            chunks = [uids[i:i + self.chunk_size] for i in range(0, len(uids), self.chunk_size)]
+            self.total = len(uids)
+            logger.info(
+                f"📥 Backfill: {self.total} emails pendentes em {len(chunks)} blocos, "
+                f"{self.concurrency} conexões"
+            )
+
+            # Mantém no máximo 2 blocos por worker em voo: entrega em fluxo,
+            # sem carregar a caixa inteira em memória
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                pending = {}
+                next_chunk = 0
+                while next_chunk < len(chunks) or pending:
+                    while next_chunk < len(chunks) and len(pending) < self.concurrency * 2:
+                        chunk = chunks[next_chunk]
+                        pending[pool.submit(self._fetch_chunk, chunk)] = chunk
+                        next_chunk += 1
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        chunk = pending.pop(future)
+                        try:
+                            emails, failed = future.result()
+                        except Exception as ex:
+                            logger.error(f"❌ Falha ao buscar bloco {chunk[0]}-{chunk[-1]}: {ex}")
+                            self.failed += len(chunk)
+                            self.processed += len(chunk)
+                            continue
+                        self._handle_chunk(chunk, emails, failed)
+        finally:
+            self.finished_at = time.monotonic()
+            self.running = False
+            with self._readers_lock:
+                for reader in self._readers:
+                    reader.disconnect()
+                self._readers.clear()
+
+        logger.info(f"🏁 Backfill concluído: {self.status()}")
+        return self.status()
+
+
+if __name__ == "__main__":
+    from app.config.logging_config import setup_logging
+    setup_logging()
+
+    from app.services.outbox import Outbox, OutboxWorker
+    from app.services.email_store import EmailStore
+
+    # Grava no armazenamento local e na outbox, que é drenada em paralelo;
+    # pendências ficam para o app
+    outbox = Outbox()
+    store = EmailStore()
+    dedup = DedupFilter()
+    raw_cache = RawMessageCache() if RAW_CACHE_ENABLED else None
+    worker = OutboxWorker(outbox)
+    worker.start()
+
+    def deliver(email: EmailData) -> bool:
+        store.add(email)
+        return outbox.put(email)
+
+    try:
+        MailboxBackfill(deliver=deliver, dedup=dedup, raw_cache=raw_cache).run()
+        store.optimize()
+    finally:
+        worker.stop()
+        store.close()
+        dedup.close()
+        if raw_cache:
+            raw_cache.close()
@@ -0,0 +1,170 @@
+"""
+Deduplicação de emails antes da classificação e da entrega
+Cada email é identificado pelo Message-ID; sem ele, por um hash do conteúdo
+normalizado (assunto sem "Re:"/"Fwd:" + corpo). Com DEDUP_BY_CONTENT=true o
+hash vale também para emails com Message-ID, o que pega avisos reenviados
+com o mesmo texto (e descarta avisos legítimos repetidos). As chaves já
+vistas ficam em SQLite, com limite de entradas (as mais antigas são
+descartadas).
+"""
+
+# Importações padrão do Python
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Dict, List, Set
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.services.EmailClassifer import EmailClassifier
+
+logger = logging.getLogger(__name__)
+
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", "dedup.db")
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "200000"))
+# Também considera duplicado um email com Message-ID diferente e mesmo assunto+corpo (reenvios)
+DEDUP_BY_CONTENT = os.getenv("DEDUP_BY_CONTENT", "false").strip().lower() in ("1", "true", "yes")
+
+# Prefixos de resposta/encaminhamento (já normalizados: minúsculas, sem pontuação)
+_REPLY_PREFIX_RE = re.compile(r'^(?:(?:re|res|fw|fwd|enc|tr)\s+)+')
+_SPACES_RE = re.compile(r'\s+')
+
+# Mesma normalização (e cache) do classificador: o texto normalizado aqui
+# já fica pronto para a classificação que vem em seguida
+_classifier = EmailClassifier()
+
+
+def message_id_key(email: EmailData) -> str:
+    message_id = (email.get("message_id") or "").strip().strip("<>")
+    return f"mid:{message_id}" if message_id else ""
+
+
+def content_key(email: EmailData) -> str:
+    """Hash do assunto (sem prefixos Re:/Fwd:) e do corpo, normalizados"""
+    subject = _classifier.normalize_text(email.get("subject", ""))
+    subject = _REPLY_PREFIX_RE.sub("", _SPACES_RE.sub(" ", subject).strip())
+    body = _SPACES_RE.sub(" ", _classifier.normalize_text(email.get("snippet", ""))).strip()
+    digest = hashlib.blake2b(f"{subject}\n{body}".encode("utf-8"), digest_size=16).hexdigest()
+    return f"sha:{digest}"
+
+
+def dedup_keys(email: EmailData) -> List[str]:
+    """Message-ID; o hash do conteúdo só sem Message-ID (ou com DEDUP_BY_CONTENT)"""
+    keys = [message_id_key(email)]
+    if DEDUP_BY_CONTENT or not keys[0]:
+        keys.append(content_key(email))
+    return [k for k in keys if k]
+
+
+class DedupFilter:
+    """
+    Conjunto persistente e limitado de emails já processados
+
+    Uso: filter_new antes de classificar; remember depois que a entrega foi
+    aceita (ex.: gravada na outbox), para que uma falha no meio do caminho
+    não faça o email ser descartado na próxima tentativa.
+    """
+
+    def __init__(self, path: str = DEDUP_DB_PATH, max_entries: int = DEDUP_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL UNIQUE,
+                seen_at REAL NOT NULL
+            )
+        """)
+
+        # Chaves aceitas por filter_new e ainda não confirmadas (em trânsito no pipeline)
+        self._pending: Set[str] = set()
+
+        # Contadores desde o início do processo
+        self.checked = 0
+        self.duplicates_by_message_id = 0
+        self.duplicates_by_content = 0
+
+    def _known(self, keys: List[str]) -> Set[str]:
+        known: Set[str] = set()
+        # Limite de parâmetros por consulta no SQLite
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._db.execute(f"SELECT key FROM seen WHERE key IN ({placeholders})", chunk)
+            known.update(key for (key,) in rows)
+        return known
+
+    def filter_new(self, emails: List[EmailData]) -> List[EmailData]:
+        """Remove os emails já vistos (e repetidos dentro do próprio lote)"""
+        if not emails:
+            return []
+        keyed = [(e, dedup_keys(e)) for e in emails]
+        fresh: List[EmailData] = []
+        with self._lock:
+            known = self._known([k for _, keys in keyed for k in keys]) | self._pending
+            for e, keys in keyed:
+                duplicate = next((k for k in keys if k in known), None)
+                if duplicate is None:
+                    fresh.append(e)
+                    known.update(keys)
+                    self._pending.update(keys)
+                elif duplicate.startswith("mid:"):
+                    self.duplicates_by_message_id += 1
+                else:
+                    self.duplicates_by_content += 1
+            self.checked += len(emails)
+
+        skipped = len(emails) - len(fresh)
+        if skipped:
+            logger.info(f"♻️  {skipped} emails duplicados descartados")
+        return fresh
+
+    def remember(self, emails: List[EmailData]):
+        """Registra os emails como processados e descarta as entradas mais antigas"""
+        if not emails:
+            return
+        now = time.time()
+        rows = [(k, now) for e in emails for k in dedup_keys(e)]
+        with self._lock:
+            self._pending.difference_update(k for k, _ in rows)
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR IGNORE INTO seen (key, seen_at) VALUES (?, ?)", rows)
+            self._db.execute(
+                "DELETE FROM seen WHERE seq <= (SELECT MAX(seq) FROM seen) - ?", (self.max_entries,)
+            )
+            self._db.execute("COMMIT")
+
+    def release(self, emails: List[EmailData]):
+        """Libera emails aceitos por filter_new cuja entrega falhou (podem voltar)"""
+        with self._lock:
+            self._pending.difference_update(k for e in emails for k in dedup_keys(e))
+
+    def stats(self) -> Dict:
+        """Duplicados descartados = classificações e POSTs economizados"""
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM seen").fetchone()
+        duplicates = self.duplicates_by_message_id + self.duplicates_by_content
+        return {
+            "entries": entries,
+            "pending": len(self._pending),
+            "max_entries": self.max_entries,
+            "checked": self.checked,
+            "duplicates": duplicates,
+            "duplicates_by_message_id": self.duplicates_by_message_id,
+            "duplicates_by_content": self.duplicates_by_content,
+            "classifications_saved": duplicates,
+            "deliveries_saved": duplicates,
+            "duplicate_ratio": round(duplicates / self.checked, 4) if self.checked else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
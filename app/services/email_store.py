@@ -0,0 +1,421 @@
+"""
+Armazenamento local dos emails classificados
+SQLite com índice de texto completo (FTS5) sobre assunto, remetente e
+prévia. A chave primária já é ordenada pela data do email, então listagem,
+filtro e busca percorrem os índices do mais recente ao mais antigo e param
+no fim da página; a paginação é por cursor (keyset), e a página N custa o
+mesmo que a primeira.
+
+Cada email guarda a versão das regras que o classificou (rule_version); o
+índice FTS5 serve também de índice invertido para achar os emails afetados
+por uma mudança de palavras-chave (ver app/services/reclassifier.py). Como a
+prévia é cortada em STORE_SNIPPET_MAX_CHARS, emails mais longos guardam
+também o corpo inteiro já normalizado (full_text), indexado e usado na
+reclassificação.
+"""
+
+# Importações padrão do Python
+import os
+import re
+import time
+import sqlite3
+import datetime
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.models.EmailRecord import EmailRecord, parse_email_date
+from app.models.ClassificationRules import ClassificationRules
+from app.services.EmailClassifer import EmailClassifier
+from app.utils.serialization import dumps_str, loads
+
+STORE_DB_PATH = os.getenv("STORE_DB_PATH", "emails.db")
+# Tamanho máximo da prévia guardada (acima disso, o corpo inteiro vai normalizado em full_text)
+STORE_SNIPPET_MAX_CHARS = int(os.getenv("STORE_SNIPPET_MAX_CHARS", "2000"))
+STORE_PAGE_MAX = 200
+
+# sort_key = segundos da data << 20 | desempate (até ~1M emails no mesmo segundo)
+_TIEBREAK_BITS = 20
+_TIEBREAK_MASK = (1 << _TIEBREAK_BITS) - 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_COLUMNS = "e.sort_key, e.id, e.subject, e.sender, e.date, e.categoria, e.snippet"
+
+# Mesma normalização (e cache) do classificador: o corpo de um email recém-
+# classificado já está normalizado no cache
+_classifier = EmailClassifier()
+
+
+def fts_query(text: str) -> str:
+    """
+    Converte a busca do usuário em consulta FTS5 segura
+
+    Cada palavra vira um prefixo entre aspas ("palavra"*), todas obrigatórias;
+    operadores e aspas digitados pelo usuário não são interpretados.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(text))
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Limite superior (exclusivo) de sort_key a partir do parâmetro before:
+    o cursor "next_before" da página anterior ou uma data ISO 8601
+
+    Raises:
+        ValueError: se não for nenhum dos dois
+    """
+    if cursor.isdigit():
+        return int(cursor)
+    parsed = datetime.datetime.fromisoformat(cursor)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return max(0, int(parsed.timestamp())) << _TIEBREAK_BITS
+
+
+class EmailStore:
+    """Emails classificados, com busca por texto e filtro por categoria"""
+
+    def __init__(self, path: str = STORE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS emails (
+                sort_key INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                subject TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                date TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                snippet TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                rule_version TEXT NOT NULL DEFAULT '',
+                -- Corpo inteiro normalizado, só quando a prévia foi cortada
+                full_text TEXT NOT NULL DEFAULT ''
+            );
+            -- Entradas do índice já vêm ordenadas por sort_key dentro de cada categoria
+            CREATE INDEX IF NOT EXISTS emails_by_category ON emails (categoria);
+
+            -- Regras de cada versão já usada (diferença entre versões na reclassificação)
+            CREATE TABLE IF NOT EXISTS rule_versions (
+                version TEXT PRIMARY KEY,
+                rules TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        self._migrate()
+        self._create_fts()
+
+    def _migrate(self):
+        """
+        Bancos anteriores às colunas rule_version e full_text: os emails ficam
+        com versão desconhecida ('') e sem o corpo inteiro
+        """
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(emails)")}
+        if "rule_version" not in columns:
+            self._db.execute("ALTER TABLE emails ADD COLUMN rule_version TEXT NOT NULL DEFAULT ''")
+        if "full_text" not in columns:
+            self._db.execute("ALTER TABLE emails ADD COLUMN full_text TEXT NOT NULL DEFAULT ''")
+        self._db.execute("CREATE INDEX IF NOT EXISTS emails_by_rule_version ON emails (rule_version)")
+
+    def _create_fts(self):
+        """Índice FTS5 e gatilhos; um índice sem a coluna full_text é recriado"""
+        row = self._db.execute("SELECT sql FROM sqlite_master WHERE name = 'emails_fts'").fetchone()
+        rebuild = row is not None and "full_text" not in row["sql"]
+        if rebuild:
+            self._db.executescript("""
+                DROP TRIGGER IF EXISTS emails_ai;
+                DROP TRIGGER IF EXISTS emails_ad;
+                DROP TABLE emails_fts;
+            """)
+        self._db.executescript("""
+            -- Índice externo (content=): o texto fica só na tabela emails
+            CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                subject, sender, snippet, full_text,
+                content='emails', content_rowid='sort_key',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS emails_ai AFTER INSERT ON emails BEGIN
+                INSERT INTO emails_fts (rowid, subject, sender, snippet, full_text)
+                VALUES (new.sort_key, new.subject, new.sender, new.snippet, new.full_text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS emails_ad AFTER DELETE ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, subject, sender, snippet, full_text)
+                VALUES ('delete', old.sort_key, old.subject, old.sender, old.snippet, old.full_text);
+            END;
+            -- Só mudanças no texto reindexam (reclassificação altera apenas categoria e versão)
+            DROP TRIGGER IF EXISTS emails_au;
+            CREATE TRIGGER emails_au AFTER UPDATE OF subject, sender, snippet, full_text ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, subject, sender, snippet, full_text)
+                VALUES ('delete', old.sort_key, old.subject, old.sender, old.snippet, old.full_text);
+                INSERT INTO emails_fts (rowid, subject, sender, snippet, full_text)
+                VALUES (new.sort_key, new.subject, new.sender, new.snippet, new.full_text);
+            END;
+        """)
+        if rebuild:
+            self._db.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+
+    def _next_key(self, date_ts: float) -> int:
+        """Próxima sort_key livre no segundo da data (chamar com o lock)"""
+        base = max(0, int(date_ts)) << _TIEBREAK_BITS
+        (last,) = self._db.execute(
+            "SELECT MAX(sort_key) FROM emails WHERE sort_key BETWEEN ? AND ?",
+            (base, base | _TIEBREAK_MASK),
+        ).fetchone()
+        return base if last is None else last + 1
+
+    def add_many(self, emails: List[EmailData]) -> int:
+        """
+        Grava (ou atualiza, pelo id) os emails classificados em uma transação
+
+        Returns:
+            Quantidade de emails gravados
+        """
+        if not emails:
+            return 0
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for e in emails:
+                    if isinstance(e, EmailRecord):
+                        date_ts = e.date_ts or now
+                    else:
+                        date_ts = parse_email_date(e.get("date", "")) or now
+                    snippet = e.get("snippet") or ""
+                    # Prévia cortada: o corpo inteiro (normalizado) fica para a reclassificação
+                    full_text = _classifier.normalize_text(snippet) if len(snippet) > STORE_SNIPPET_MAX_CHARS else ""
+                    self._db.execute(
+                        "INSERT INTO emails (sort_key, id, subject, sender, date, categoria, snippet, stored_at, "
+                        "rule_version, full_text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (id) DO UPDATE SET subject = excluded.subject, "
+                        "sender = excluded.sender, categoria = excluded.categoria, snippet = excluded.snippet, "
+                        "rule_version = excluded.rule_version, full_text = excluded.full_text",
+                        (
+                            self._next_key(date_ts),
+                            str(e.get("id", "")),
+                            e.get("subject", ""),
+                            e.get("sender", ""),
+                            e.get("date", ""),
+                            e.get("categoria", "Outros"),
+                            snippet[:STORE_SNIPPET_MAX_CHARS],
+                            now,
+                            e.get("rule_version") or "",
+                            full_text,
+                        ),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(emails)
+
+    def add(self, email: EmailData) -> bool:
+        """Grava um único email"""
+        return self.add_many([email]) == 1
+
+    def search(
+        self,
+        category: Optional[str] = None,
+        q: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        """
+        Lista emails do mais recente ao mais antigo
+
+        Args:
+            category: filtra pela categoria exata
+            q: busca por texto em assunto, remetente e corpo
+            before: cursor "next_before" da página anterior (ou data ISO 8601)
+            limit: emails por página (até STORE_PAGE_MAX)
+
+        Returns:
+            {"items": [...], "next_before": cursor da próxima página ou None}
+
+        Raises:
+            ValueError: se before não é um cursor nem uma data válida
+        """
+        limit = max(1, min(limit, STORE_PAGE_MAX))
+        upper = decode_cursor(before) if before else None
+        where: List[str] = []
+        params: List[Any] = []
+
+        if q:
+            match = fts_query(q)
+            if not match:
+                return {"items": [], "next_before": None}
+            # O FTS5 entrega os rowids em ordem decrescente e para no LIMIT;
+            # CROSS JOIN impede o planner de começar pela tabela emails
+            sql = f"SELECT {_COLUMNS} FROM emails_fts AS f CROSS JOIN emails AS e ON e.sort_key = f.rowid"
+            where.append("emails_fts MATCH ?")
+            params.append(match)
+            if upper is not None:
+                where.append("f.rowid < ?")
+                params.append(upper)
+            order = "f.rowid DESC"
+        else:
+            sql = f"SELECT {_COLUMNS} FROM emails AS e"
+            if upper is not None:
+                where.append("e.sort_key < ?")
+                params.append(upper)
+            order = "e.sort_key DESC"
+
+        if category:
+            where.append("e.categoria = ?")
+            params.append(category)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        page = rows[:limit]
+        items = [
+            {
+                "id": row["id"],
+                "subject": row["subject"],
+                "sender": row["sender"],
+                "date": row["date"],
+                "categoria": row["categoria"],
+                "snippet": row["snippet"],
+            }
+            for row in page
+        ]
+        next_before = str(page[-1]["sort_key"]) if len(rows) > limit else None
+        return {"items": items, "next_before": next_before}
+
+    def count(self) -> int:
+        with self._lock:
+            (total,) = self._db.execute("SELECT COUNT(*) FROM emails").fetchone()
+        return total
+
+    def labeled(self, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Id, assunto, prévia e categoria dos emails mais recentes (treino do classificador)"""
+        sql = "SELECT id, subject, snippet, categoria FROM emails ORDER BY sort_key DESC"
+        params: tuple = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    # --- Versões das regras e reclassificação ---
+
+    def register_rules(self, rules: ClassificationRules):
+        """Guarda as regras de uma versão (ignorado se a versão já existe)"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO rule_versions (version, rules, created_at) VALUES (?, ?, ?)",
+                (rules["version"], dumps_str(rules), time.time()),
+            )
+
+    def get_rules(self, version: str) -> Optional[ClassificationRules]:
+        with self._lock:
+            row = self._db.execute("SELECT rules FROM rule_versions WHERE version = ?", (version,)).fetchone()
+        return loads(row["rules"]) if row else None
+
+    def outdated_rule_versions(self, current: str) -> List[str]:
+        """
+        Versões de regras diferentes de current presentes nos emails
+
+        Cada versão custa uma busca no índice (MIN com rule_version > anterior),
+        sem percorrer a tabela.
+        """
+        versions: List[str] = []
+        with self._lock:
+            (version,) = self._db.execute("SELECT MIN(rule_version) FROM emails").fetchone()
+            while version is not None:
+                if version != current:
+                    versions.append(version)
+                (version,) = self._db.execute(
+                    "SELECT MIN(rule_version) FROM emails WHERE rule_version > ?", (version,)
+                ).fetchone()
+        return versions
+
+    def candidates_for_reclassify(
+        self,
+        version: str,
+        keywords: Optional[List[str]],
+        after: int = -1,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """
+        Emails classificados pela versão dada que contêm alguma das
+        palavras-chave (no assunto ou no corpo inteiro), em ordem de sort_key
+
+        A busca usa o índice FTS5 (tokens sem acento, como as palavras-chave
+        normalizadas); com keywords=None devolve todos os emails da versão.
+        full_text vem vazio quando a prévia já é o corpo inteiro.
+
+        Args:
+            after: sort_key do último email do lote anterior (paginação)
+        """
+        if keywords is None:
+            sql = (
+                "SELECT sort_key, id, subject, snippet, full_text, categoria FROM emails "
+                "WHERE rule_version = ? AND sort_key > ? ORDER BY sort_key LIMIT ?"
+            )
+            params: tuple = (version, after, limit)
+        else:
+            if not keywords:
+                return []
+            match = "{subject snippet full_text} : (" + " OR ".join(f'"{kw}"' for kw in keywords) + ")"
+            sql = (
+                "SELECT e.sort_key, e.id, e.subject, e.snippet, e.full_text, e.categoria "
+                "FROM emails_fts AS f CROSS JOIN emails AS e ON e.sort_key = f.rowid "
+                "WHERE emails_fts MATCH ? AND f.rowid > ? AND e.rule_version = ? "
+                "ORDER BY f.rowid LIMIT ?"
+            )
+            params = (match, after, version, limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def set_categories(self, updates: List[Tuple[int, str]], rule_version: str) -> int:
+        """Grava as categorias reclassificadas, (sort_key, categoria), com a versão das regras"""
+        if not updates:
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "UPDATE emails SET categoria = ?, rule_version = ? WHERE sort_key = ?",
+                    [(categoria, rule_version, sort_key) for sort_key, categoria in updates],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(updates)
+
+    def restamp(self, old_version: str, new_version: str, stored_before: float) -> int:
+        """
+        Marca com new_version os emails de old_version gravados antes de
+        stored_before (já verificados: nenhuma palavra-chave alterada)
+
+        Emails com a prévia possivelmente cortada e sem full_text (gravados
+        antes dessa coluna) não foram verificados no corpo inteiro e ficam
+        de fora.
+        """
+        with self._lock:
+            return self._db.execute(
+                "UPDATE emails SET rule_version = ? WHERE rule_version = ? AND stored_at < ? "
+                "AND (full_text != '' OR length(snippet) < ?)",
+                (new_version, old_version, stored_before, STORE_SNIPPET_MAX_CHARS),
+            ).rowcount
+
+    def optimize(self):
+        """Funde os segmentos do índice FTS (útil após cargas grandes, ex.: backfill)"""
+        with self._lock:
+            self._db.execute("INSERT INTO emails_fts (emails_fts) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,202 @@
+"""
+Sincronização de flags no IMAP depois da entrega
+
+Com a sincronização ativa, a busca usa PEEK e não marca nada como lido
+(desativada, o próprio FETCH marca a mensagem como lida ao baixar); quando
+a API confirma a entrega (ou a deduplicação descarta um email já
+entregue), o UID da mensagem entra numa fila por conta. Antes da próxima
+busca daquela conta, na mesma sessão IMAP, a fila é aplicada de uma vez:
+UIDs compactados em faixas ("1:40,42,50:90") em um único UID STORE
++FLAGS.SILENT (\\Seen) (ou +X-GM-LABELS.SILENT com FLAG_SYNC_MODE=label).
+
+No modo unseen, cada mensagem marcada é uma mensagem que a próxima busca
+por não lidas deixaria de baixar de novo (imap_refetches_prevented_total).
+
+Idempotente: acrescentar flags/labels repetidas não muda nada, então UIDs que
+falharam (conexão caiu no meio do STORE) voltam para a fila e são
+reenviados depois da reconexão. UIDs de um UIDVALIDITY diferente do atual
+são descartados (o servidor renumerou a caixa; eles apontariam para outras
+mensagens).
+"""
+
+# Importações padrão do Python
+import os
+import logging
+import threading
+from typing import Any, Dict, Iterable, Set
+
+# Importações de arquivos internos
+from app.models.AccountConfig import AccountConfig
+from app.models.EmailData import EmailData
+from app.services.gmail_imap import GmailIMAPReader, session_pool, SYNC_MODE
+from app.utils.cache import LRUCache
+from app.utils.metrics import Counter, FAILURES
+
+logger = logging.getLogger(__name__)
+
+FLAG_SYNC_ENABLED = os.getenv("FLAG_SYNC_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# "seen": marca como lida; "label": aplica FLAG_SYNC_LABEL (Gmail) e a busca ignora a label
+FLAG_SYNC_MODE = os.getenv("FLAG_SYNC_MODE", "seen").strip().lower()
+FLAG_SYNC_LABEL = os.getenv("FLAG_SYNC_LABEL", "Processado")
+# UIDs já marcados lembrados por conta (evita STOREs repetidos para a mesma mensagem)
+FLAG_SYNC_MEMORY = int(os.getenv("FLAG_SYNC_MEMORY", "50000"))
+
+FLAGS_SYNCED = Counter("imap_flags_synced_total", "Mensagens marcadas no IMAP após a entrega", ["account"])
+FLAG_STORE_COMMANDS = Counter("imap_flag_store_commands_total", "Rodadas de UID STORE da sincronização de flags")
+REFETCHES_PREVENTED = Counter(
+    "imap_refetches_prevented_total",
+    "Mensagens marcadas que a busca por não lidas baixaria de novo", ["account"],
+)
+FLAGS_STALE = Counter("imap_flags_stale_total", "UIDs descartados por mudança de UIDVALIDITY", ["account"])
+
+
+class FlagSync:
+    """
+    Fila de UIDs entregues, aplicada em lote no IMAP antes de cada busca
+
+    Args:
+        mode: "seen" (\\Seen) ou "label" (X-GM-LABELS)
+        label: label do Gmail no modo "label"
+        memory: UIDs já marcados lembrados por conta
+    """
+
+    def __init__(self, mode: str = FLAG_SYNC_MODE, label: str = FLAG_SYNC_LABEL, memory: int = FLAG_SYNC_MEMORY):
+        if mode not in ("seen", "label"):
+            raise ValueError(f"FLAG_SYNC_MODE inválido: {mode} (use seen ou label)")
+        self.mode = mode
+        self.label = label
+        if mode == "label":
+            self._item, self._value = '+X-GM-LABELS.SILENT', f'("{label}")'
+        else:
+            self._item, self._value = '+FLAGS.SILENT', '(\\Seen)'
+        # conta -> UIDVALIDITY -> UIDs aguardando o STORE
+        self._pending: Dict[str, Dict[int, Set[int]]] = {}
+        self._done = LRUCache(memory)
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.queued = 0
+        self.synced = 0
+        self.commands = 0
+        self.stale = 0
+        self.failures = 0
+
+    @property
+    def exclude_label(self):
+        """Label a excluir da busca (só no modo "label")"""
+        return self.label if self.mode == "label" else None
+
+    def add(self, emails: Iterable[EmailData]) -> int:
+        """
+        Enfileira as mensagens de emails entregues (ou já entregues antes)
+
+        Emails sem uid/uidvalidity (ex.: vindos de outra origem) são ignorados.
+
+        Returns:
+            Quantidade de UIDs novos na fila
+        """
+        added = 0
+        with self._lock:
+            for e in emails:
+                uid, uidvalidity = e.get("uid"), e.get("uidvalidity")
+                if not uid or not uidvalidity:
+                    continue
+                account = e.get("account") or ""
+                if self._done.get((account, uidvalidity, uid)):
+                    continue
+                uids = self._pending.setdefault(account, {}).setdefault(uidvalidity, set())
+                if uid not in uids:
+                    uids.add(uid)
+                    added += 1
+            self.queued += added
+        return added
+
+    def pending(self, account: AccountConfig) -> int:
+        with self._lock:
+            return sum(len(uids) for uids in self._pending.get(account["name"], {}).values())
+
+    def _take(self, name: str) -> Dict[int, Set[int]]:
+        with self._lock:
+            return self._pending.pop(name, {})
+
+    def _requeue(self, name: str, taken: Dict[int, Set[int]]):
+        with self._lock:
+            pending = self._pending.setdefault(name, {})
+            for uidvalidity, uids in taken.items():
+                pending.setdefault(uidvalidity, set()).update(uids)
+
+    def flush(self, account: AccountConfig) -> int:
+        """
+        Aplica a fila da conta na sessão do pool (chamar da thread IMAP da
+        conta, antes da busca). Não levanta: em caso de falha os UIDs voltam
+        para a fila.
+
+        Returns:
+            Quantidade de mensagens marcadas
+        """
+        if not self.pending(account):
+            return 0
+        with session_pool.session(account) as gmail:
+            if gmail is None:
+                return 0
+            return self.flush_session(gmail)
+
+    def flush_session(self, gmail: GmailIMAPReader) -> int:
+        """Como flush, com uma sessão já emprestada do pool"""
+        name = gmail.account["name"]
+        taken = self._take(name)
+        if not taken:
+            return 0
+
+        synced = 0
+        try:
+            if gmail.imap.state != 'SELECTED':
+                gmail.select_inbox()
+            for uidvalidity in list(taken):
+                uids = taken[uidvalidity]
+                if uidvalidity != gmail.uidvalidity:
+                    logger.warning(
+                        f"⚠️  UIDVALIDITY mudou ({uidvalidity} → {gmail.uidvalidity}): "
+                        f"{len(uids)} mensagens não serão marcadas"
+                    )
+                    self.stale += len(uids)
+                    FLAGS_STALE.labels(name).inc(len(uids))
+                    del taken[uidvalidity]
+                    continue
+                self.commands += 1
+                FLAG_STORE_COMMANDS.inc()
+                if not gmail.uid_store(uids, self._item, self._value):
+                    raise RuntimeError("UID STORE recusado pelo servidor")
+                for uid in uids:
+                    self._done.put((name, uidvalidity, uid), True)
+                synced += len(uids)
+                del taken[uidvalidity]
+        except Exception as ex:
+            # Repetir o STORE é inofensivo: tudo que não foi confirmado volta para a fila
+            self.failures += 1
+            FAILURES.labels("flag_sync").inc()
+            self._requeue(name, taken)
+            logger.warning(f"⚠️  Falha ao sincronizar flags ({name or gmail.email_address}): {ex}")
+
+        if synced:
+            self.synced += synced
+            FLAGS_SYNCED.labels(name).inc(synced)
+            if SYNC_MODE == "unseen":
+                REFETCHES_PREVENTED.labels(name).inc(synced)
+            logger.debug(f"🏷️  {synced} mensagens marcadas ({self.mode})")
+        return synced
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(len(u) for by_validity in self._pending.values() for u in by_validity.values())
+        return {
+            "mode": self.mode,
+            "pending": pending,
+            "queued": self.queued,
+            "synced": self.synced,
+            "store_commands": self.commands,
+            "stale": self.stale,
+            "failures": self.failures,
+            # No modo unseen, cada mensagem marcada sairia de novo na busca por não lidas
+            "refetches_prevented": self.synced if SYNC_MODE == "unseen" else 0,
+        }
@@ -5,178 +5,658 @@ Requer apenas: email + senha de app (16 caracteres)
 
 # Importações padrão do Python
 import os
+import re
+import time
+import random
+import select
 import imaplib
 import email
+import threading
+import logging
+from contextlib import contextmanager
 from email.header import decode_header
-from typing import List
+from typing import Dict, List, Optional
 
 # Importações de arquivos internos
 from app.models.EmailData import EmailData
+from app.models.RawEmail import RawEmail
+from app.models.EmailRecord import EmailRecord
+from app.models.AccountConfig import AccountConfig
+from app.config.accounts import default_account, account_key
+from app.services.sync_state import SyncStateStore
+from app.utils.imap import (
+    uid_set, parse_fetch_response, find_fetch_item, find_text_part, decode_body_part, from_criteria
+)
+from app.utils.mime import parse_message_bounded, message_text
+from app.utils.helpers import html_to_text
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Servidor IMAP (o padrão é o Gmail; outro host serve para testes e benchmarks locais)
+IMAP_HOST = os.getenv("IMAP_HOST", "imap.gmail.com")
+IMAP_SSL = os.getenv("IMAP_SSL", "true").strip().lower() in ("1", "true", "yes")
+IMAP_PORT = int(os.getenv("IMAP_PORT", "993" if IMAP_SSL else "143"))
+
+# Reconexão da sessão IMAP persistente
+IMAP_RECONNECT_MAX_ATTEMPTS = int(os.getenv("IMAP_RECONNECT_MAX_ATTEMPTS", "5"))
+IMAP_RECONNECT_BASE_DELAY_SECONDS = float(os.getenv("IMAP_RECONNECT_BASE_DELAY_SECONDS", "1"))
+IMAP_RECONNECT_MAX_DELAY_SECONDS = float(os.getenv("IMAP_RECONNECT_MAX_DELAY_SECONDS", "60"))
+
+# Sincronização: "unseen" (busca por não lidos) ou "uid" (incremental por UID)
+SYNC_MODE = os.getenv("SYNC_MODE", "unseen").strip().lower()
+# Máximo de mensagens importadas numa ressincronização completa (UIDVALIDITY novo)
+SYNC_RESYNC_LIMIT = int(os.getenv("SYNC_RESYNC_LIMIT", "200"))
+
+# FETCH em lote: mensagens por comando e limite de bytes do corpo baixado
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "100"))
+FETCH_MAX_BODY_BYTES = int(os.getenv("FETCH_MAX_BODY_BYTES", str(64 * 1024)))
+# Bytes iniciais baixados/parseados por mensagem no modo unseen (anexos além disso são ignorados)
+PARSE_MAX_BYTES = int(os.getenv("PARSE_MAX_BYTES", str(256 * 1024)))
+# UIDs por comando UID STORE (o sequence set compactado fica curto mesmo com muitos UIDs)
+UID_STORE_CHUNK_SIZE = int(os.getenv("UID_STORE_CHUNK_SIZE", "1000"))
+
+# Headers baixados no FETCH em lote
+_HEADER_FIELDS = "SUBJECT FROM DATE MESSAGE-ID"
+
+# Resposta não marcada "* <n> EXISTS" enviada durante o IDLE
+_EXISTS_RE = re.compile(rb'^\* (\d+) EXISTS', re.IGNORECASE)
+# UID na linha de resposta do FETCH por número de sequência
+_FETCH_UID_RE = re.compile(rb'\bUID (\d+)', re.IGNORECASE)
+
+
+def uid_state_key(account: AccountConfig) -> str:
+    """Chave da caixa no SyncStateStore"""
+    return f"{account['email']}/INBOX"
+
+
+class FetchError(Exception):
+    """
+    Parte de um FETCH em lote falhou
+
+    Attributes:
+        raws: mensagens baixadas com sucesso (dos lotes que não falharam)
+        failed: UIDs dos lotes que falharam
+    """
+
+    def __init__(self, raws: List[RawEmail], failed: List[int]):
+        super().__init__(f"{len(failed)} mensagens não foram baixadas ({uid_set(sorted(failed))})")
+        self.raws = raws
+        self.failed = failed
 
-# Carrega variáveis de ambiente
 
 class GmailIMAPReader:
-    def __init__(self):
+    def __init__(self, account: Optional[AccountConfig] = None):
         """
         Inicializa leitor Gmail via IMAP
-        Credenciais vêm do arquivo .env
+        Credenciais vêm da conta informada ou, por padrão, do arquivo .env
         """
-        self.email_address = os.getenv('GMAIL_RECIPIENT')
-        self.password = os.getenv('GMAIL_PASSWORD')
-        self.sender_filter = os.getenv('GMAIL_SENDER', 'ccecomp@ecomp.uefs.br')
+        if account is None:
+            account = default_account()
+        self.account = account
+        self.email_address = account["email"]
+        self.password = account["password"]
+        self.senders = account["senders"]
+        self.sender_filter = ", ".join(self.senders)
         self.imap = None
+        self.uidvalidity = None
+        self.uidnext = None
         
         if not self.email_address or not self.password:
-            print("❌ Erro: Configure GMAIL_RECIPIENT e GMAIL_PASSWORD no .env")
+            logger.error("❌ Erro: Configure GMAIL_RECIPIENT e GMAIL_PASSWORD no .env")
             return
         
-        print(f"📧 Email configurado: {self.email_address}")
-        print(f"🔍 Filtrando emails de: {self.sender_filter}")
+        logger.info(f"📧 Email configurado: {self.email_address}")
+        logger.info(f"🔍 Filtrando emails de: {self.sender_filter}")
         
         self.connect()
     
     def connect(self):
         """Conecta ao Gmail via IMAP"""
         try:
-            print("\n⏳ Conectando ao Gmail...")
-            
-            # Conecta ao servidor IMAP do Gmail
-            self.imap = imaplib.IMAP4_SSL('imap.gmail.com')
+            logger.info(f"⏳ Conectando ao Gmail ({self.account['name']})...")
             
-            # Faz login
-            self.imap.login(self.email_address, self.password)
+            with span("imap_connect", account=self.account["name"]):
+                # Conecta ao servidor IMAP (Gmail por padrão)
+                if IMAP_SSL:
+                    self.imap = imaplib.IMAP4_SSL(IMAP_HOST, IMAP_PORT)
+                else:
+                    self.imap = imaplib.IMAP4(IMAP_HOST, IMAP_PORT)
+
+                # Faz login
+                self.imap.login(self.email_address, self.password)
             
-            print("✅ Conectado com sucesso!")
+            logger.info("✅ Conectado com sucesso!")
             return True
             
         except imaplib.IMAP4.error as e:
-            print(f"❌ Erro ao autenticar: {e}")
-            print("\n📋 Verifique:")
-            print("   1. Email e senha estão corretos no .env")
-            print("   2. Senha de App foi gerada (não use a senha normal)")
-            print("   3. Verificação em 2 etapas está ativada")
-            print("\n💡 Gerar senha de app: https://myaccount.google.com/apppasswords")
+            self.imap = None
+            logger.error(
+                f"❌ Erro ao autenticar: {e}\n"
+                "📋 Verifique:\n"
+                "   1. Email e senha estão corretos no .env\n"
+                "   2. Senha de App foi gerada (não use a senha normal)\n"
+                "   3. Verificação em 2 etapas está ativada\n"
+                "💡 Gerar senha de app: https://myaccount.google.com/apppasswords"
+            )
             return False
         except Exception as e:
-            print(f"❌ Erro de conexão: {e}")
+            self.imap = None
+            logger.error(f"❌ Erro de conexão: {e}")
+            return False
+
+    def is_alive(self):
+        """Verifica com NOOP se a sessão IMAP ainda responde"""
+        if not self.imap:
+            return False
+        try:
+            status, _ = self.imap.noop()
+            return status == 'OK'
+        except Exception:
             return False
     
-    def get_emails_from_sender(self, sender_email=None, max_results=10, unread_only=False):
+    def supports_idle(self):
+        """Verifica se o servidor anuncia a capability IDLE (RFC 2177)"""
+        return bool(self.imap) and 'IDLE' in self.imap.capabilities
+
+    def select_inbox(self):
+        """
+        Seleciona a INBOX e retorna o número de mensagens (EXISTS)
+        Também registra UIDVALIDITY e UIDNEXT informados pelo servidor
+        """
+        status, data = self.imap.select('INBOX')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Falha ao selecionar INBOX: {data}")
+
+        _, validity = self.imap.response('UIDVALIDITY')
+        _, uidnext = self.imap.response('UIDNEXT')
+        self.uidvalidity = int(validity[0]) if validity and validity[0] else None
+        self.uidnext = int(uidnext[0]) if uidnext and uidnext[0] else None
+
+        return int(data[0] or 0)
+
+    def idle(self, timeout, stop=None):
+        """
+        Aguarda em IDLE até o servidor anunciar mensagens novas
+        
+        A INBOX precisa estar selecionada (ver select_inbox). O comando é
+        encerrado com DONE ao receber EXISTS ou ao fim do timeout.
+        
+        Args:
+            timeout: segundos máximos em IDLE (Gmail derruba após ~29 min)
+            stop: threading.Event opcional; se setado, encerra o IDLE em até 1s
+        
+        Returns:
+            Último EXISTS anunciado, ou None se expirou (ou foi interrompido)
+            sem novidades
+        """
+        tag = self.imap._new_tag()
+        self.imap.send(tag + b' IDLE\r\n')
+
+        line = self.imap.readline()
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE recusado pelo servidor: {line!r}")
+
+        exists = None
+        sock = self.imap.sock
+        deadline = time.monotonic() + timeout
+
+        while exists is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (stop is not None and stop.is_set()):
+                break
+            # Dados já decifrados no buffer SSL não aparecem no select
+            pending = sock.pending() if hasattr(sock, 'pending') else 0
+            if not pending:
+                wait = remaining if stop is None else min(remaining, 1.0)
+                readable, _, _ = select.select([sock], [], [], wait)
+                if not readable:
+                    continue
+            line = self.imap.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("Conexão encerrada durante IDLE")
+            match = _EXISTS_RE.match(line)
+            if match:
+                exists = int(match.group(1))
+
+        # Encerra o IDLE e consome as respostas até a resposta marcada
+        self.imap.send(b'DONE\r\n')
+        while True:
+            line = self.imap.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("Conexão encerrada ao sair do IDLE")
+            if line.startswith(tag):
+                break
+            match = _EXISTS_RE.match(line)
+            if match:
+                exists = int(match.group(1))
+
+        return exists
+
+    def get_emails_from_sender(self, sender_email=None, max_results=10, unread_only=False, since_seq=None,
+                               raw=False, exclude_label=None, peek=False):
         """
         Busca emails de um remetente específico
         
         Args:
-            sender_email: Email do remetente (usa GMAIL_SENDER do .env se None)
+            sender_email: Email do remetente (usa os remetentes da conta se None)
             max_results: Número máximo de emails
             unread_only: Se True, busca apenas não lidos
+            since_seq: Se informado, busca apenas mensagens com número de
+                sequência >= since_seq (mensagens novas após um IDLE)
+            raw: Se True, retorna RawEmail sem decodificar (ver parse_raw)
+            exclude_label: ignora mensagens com esta label do Gmail (X-GM-LABELS),
+                ex.: a label aplicada às já processadas
+            peek: Se True, não marca as mensagens como lidas ao baixar (a
+                sincronização de flags marca depois da entrega)
         
         Returns:
-            Lista de dicionários com dados dos emails
+            Lista de dicionários com dados dos emails ([] só quando a busca
+            não encontra nada)
+
+        Raises:
+            ConnectionError: se não está conectado
+            imaplib.IMAP4.error: se o SELECT ou o SEARCH falhar (o chamador
+                recua, ver AdaptivePollScheduler)
         """
         if not self.imap:
-            print("❌ Não conectado ao Gmail")
-            return []
+            raise ConnectionError("Não conectado ao Gmail")
         
-        if sender_email is None:
-            sender_email = self.sender_filter
+        senders = [sender_email] if sender_email else self.senders
         
         try:
-            # Seleciona a caixa de entrada
-            self.imap.select('INBOX')
+            # Seleciona a caixa de entrada (registra o UIDVALIDITY)
+            self.select_inbox()
             
-            # Monta critério de busca
+            # Monta critério de busca (vários remetentes: OR aninhado)
             if unread_only:
-                search_criteria = f'(FROM "{sender_email}" UNSEEN)'
+                search_criteria = f'({from_criteria(senders)} UNSEEN)'
             else:
-                search_criteria = f'(FROM "{sender_email}")'
+                search_criteria = from_criteria(senders)
+            if exclude_label:
+                search_criteria = f'{search_criteria} NOT X-GM-LABELS "{exclude_label}"'
+            if since_seq:
+                search_criteria = f'{since_seq}:* {search_criteria}'
             
-            print(f"\n🔍 Buscando: {search_criteria}")
+            logger.debug(f"🔍 Buscando: {search_criteria}")
             
-            # Busca emails
-            status, messages = self.imap.search(None, search_criteria)
+            # Busca emails (UIDs: o FETCH em lote é por UID; since_seq
+            # continua sendo número de sequência dentro do critério)
+            with span("imap_search", account=self.account["name"]):
+                status, messages = self.imap.uid('SEARCH', None, search_criteria)
             
             if status != 'OK':
-                print("❌ Erro ao buscar emails")
-                return []
+                raise imaplib.IMAP4.error(f"SEARCH recusado: {status}")
             
-            # IDs dos emails encontrados
-            email_ids = messages[0].split()
+            # UIDs dos emails encontrados
+            uids = [int(u) for u in messages[0].split()]
             
-            if not email_ids:
-                print("   Nenhum email encontrado")
+            if not uids:
+                logger.debug("   Nenhum email encontrado")
                 return []
             
             # Limita ao máximo solicitado (pega os mais recentes)
-            email_ids = email_ids[-max_results:]
+            uids = uids[-max_results:]
             
-            print(f"   Encontrados: {len(email_ids)} emails")
+            logger.debug(f"   Encontrados: {len(uids)} emails")
             
-            emails = []
+            # Poucos FETCH por sequence set em vez de um por mensagem (mais recentes primeiro)
+            try:
+                raws = self.fetch_raw_batch(list(reversed(uids)))
+            except FetchError as e:
+                if not e.raws:
+                    raise
+                # Os que falharam continuam não lidos e voltam na próxima busca
+                raws = e.raws
             
-            # Processa cada email
-            for email_id in reversed(email_ids):  # Mais recentes primeiro
-                email_data = self.get_email_details(email_id)
-                if email_data:
-                    emails.append(email_data)
+            if not peek and raws:
+                # O lote usa BODY.PEEK: sem a sincronização de flags, marca
+                # como lidas aqui, como o FETCH BODY[] fazia
+                if not self.uid_store([r['uid'] for r in raws], '+FLAGS.SILENT', '(\\Seen)'):
+                    logger.warning("⚠️  Servidor recusou marcar os emails como lidos")
             
-            return emails
+            return raws if raw else [d for d in map(self.parse_raw, raws) if d]
             
         except Exception as e:
-            print(f"❌ Erro ao buscar emails: {e}")
-            return []
+            logger.error(f"❌ Erro ao buscar emails: {e}")
+            raise
     
-    def get_email_details(self, email_id):
+    def get_new_emails_by_uid(self, state_store, sender_email=None, max_results=100,
+                              resync_limit=SYNC_RESYNC_LIMIT, raw=False, hold=False):
+        """
+        Sincronização incremental: busca apenas mensagens com UID acima da
+        marca d'água persistida (UID SEARCH UID n+1:*)
+        
+        Não depende da flag UNSEEN, então emails abertos na interface do
+        Gmail também são entregues. Se o UIDVALIDITY mudou (ou a caixa nunca
+        foi sincronizada), faz uma ressincronização completa limitada às
+        resync_limit mensagens mais recentes. Se algum lote do FETCH falhar,
+        a marca d'água para antes do primeiro UID que falhou.
+        
+        Com hold=True, os UIDs retornados ficam em processamento no
+        state_store: a marca d'água persistida só passa deles depois de
+        SyncStateStore.complete (ex.: quando o pipeline grava na outbox).
+        
+        Args:
+            state_store: SyncStateStore com a marca d'água
+            sender_email: Email do remetente (usa os remetentes da conta se None)
+            max_results: Máximo de mensagens novas por chamada (as mais antigas
+                primeiro, para a marca d'água avançar sem pular mensagens)
+            resync_limit: Máximo de mensagens na ressincronização completa
+            raw: Se True, retorna RawEmail sem decodificar (ver parse_raw)
+            hold: Se True, só avança a marca persistida após complete
+        
+        Returns:
+            Lista de dicionários com dados dos emails (id = UID; [] só
+            quando não há mensagens novas)
+
+        Raises:
+            ConnectionError: se não está conectado
+            imaplib.IMAP4.error: se o SELECT ou o SEARCH falhar
+            FetchError: se nenhum lote do FETCH foi baixado (a marca d'água
+                não avança)
+        """
+        if not self.imap:
+            raise ConnectionError("Não conectado ao Gmail")
+
+        senders = [sender_email] if sender_email else self.senders
+
+        try:
+            self.select_inbox()
+            if self.uidvalidity is None:
+                raise imaplib.IMAP4.error("Servidor não informou UIDVALIDITY")
+
+            key = uid_state_key(self.account)
+            state = state_store.position(key)
+            sender_criteria = from_criteria(senders)
+
+            if state and state["uidvalidity"] == self.uidvalidity:
+                last_uid = state["last_uid"]
+                search_criteria = f'UID {last_uid + 1}:* {sender_criteria}'
+                full_resync = False
+            else:
+                if state:
+                    logger.warning(f"⚠️  UIDVALIDITY mudou ({state['uidvalidity']} → {self.uidvalidity}), ressincronizando")
+                last_uid = 0
+                search_criteria = sender_criteria
+                full_resync = True
+
+            logger.debug(f"🔍 Buscando (UID): {search_criteria}")
+            with span("imap_search", account=self.account["name"]):
+                status, messages = self.imap.uid('SEARCH', None, search_criteria)
+
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"UID SEARCH recusado: {status}")
+
+            # "n:*" sempre inclui a última mensagem, mesmo com UID <= n
+            uids = sorted(int(u) for u in messages[0].split() if int(u) > last_uid)
+
+            truncated = False
+            if full_resync:
+                uids = uids[-resync_limit:]
+            elif len(uids) > max_results:
+                uids = uids[:max_results]
+                truncated = True
+
+            logger.debug(f"   Novos: {len(uids)} emails")
+
+            # Mais recentes primeiro
+            failed = []
+            try:
+                raws = self.fetch_raw_batch(list(reversed(uids)))
+            except FetchError as e:
+                if not e.raws:
+                    # Nada baixado: é uma falha, não "nenhuma mensagem nova"
+                    raise
+                raws, failed = e.raws, e.failed
+            emails = raws if raw else [d for d in map(self.parse_raw, raws) if d]
+
+            if failed:
+                # Para antes do primeiro UID que falhou: ele e os seguintes
+                # voltam na próxima busca (a deduplicação descarta os repetidos)
+                first_failed = min(failed)
+                new_last_uid = max((u for u in uids if u < first_failed), default=last_uid)
+            else:
+                # Avança a marca d'água; sem truncamento, até UIDNEXT-1 (as
+                # mensagens intermediárias não são do remetente filtrado)
+                new_last_uid = max(uids) if uids else last_uid
+                if not truncated and self.uidnext:
+                    new_last_uid = max(new_last_uid, self.uidnext - 1)
+            in_flight = [r['uid'] for r in raws] if hold else []
+            if new_last_uid != last_uid or in_flight or (full_resync and not failed):
+                state_store.begin(key, self.uidvalidity, new_last_uid, in_flight)
+
+            return emails
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao buscar emails: {e}")
+            raise
+
+    def get_emails_details_batch(self, uids, max_body_bytes=FETCH_MAX_BODY_BYTES):
+        """
+        Extrai detalhes de vários emails com poucos round trips
+        
+        Para cada lote de FETCH_BATCH_SIZE UIDs:
+          1. UID FETCH <set> (BODY.PEEK[HEADER.FIELDS (...)] BODYSTRUCTURE)
+          2. UID FETCH <set> (BODY.PEEK[<parte>]<0.max_body_bytes>), agrupando
+             os UIDs pela parte text/plain encontrada no BODYSTRUCTURE
+        
+        Anexos nunca são baixados e o corpo é truncado em max_body_bytes.
+        Usa PEEK, então não altera a flag \\Seen.
+        
+        Args:
+            uids: UIDs dos emails (a ordem é preservada no retorno)
+            max_body_bytes: máximo de bytes baixados do corpo de cada email
+        
+        Returns:
+            Lista de dicionários com dados dos emails (id = UID)
+        
+        Raises:
+            FetchError: algum lote falhou (ver fetch_raw_batch)
+        """
+        emails = []
+        for raw in self.fetch_raw_batch(uids, max_body_bytes):
+            email_data = self.parse_raw(raw)
+            if email_data:
+                emails.append(email_data)
+        return emails
+
+    def fetch_raw_batch(self, uids, max_body_bytes=FETCH_MAX_BODY_BYTES) -> List[RawEmail]:
+        """
+        Etapa de rede de get_emails_details_batch: baixa sem decodificar
+
+        Um lote que falha não interrompe os demais, mas no fim levanta
+        FetchError com o que foi baixado e os UIDs que faltaram, para o
+        chamador distinguir uma falha de "nenhuma mensagem nova". UIDs
+        ausentes da resposta (mensagens apagadas) não contam como falha.
+        """
+        raws: List[RawEmail] = []
+        failed: List[int] = []
+        uids = [int(u) for u in uids]
+
+        for start in range(0, len(uids), FETCH_BATCH_SIZE):
+            chunk = uids[start:start + FETCH_BATCH_SIZE]
+            try:
+                with span("imap_fetch", account=self.account["name"], items=len(chunk)):
+                    raws.extend(self._fetch_batch(chunk, max_body_bytes))
+            except Exception as e:
+                logger.warning(f"⚠️  Erro ao processar lote {uid_set(chunk)}: {e}")
+                failed.extend(chunk)
+
+        if failed:
+            raise FetchError(raws, failed)
+        return raws
+
+    def _fetch_batch(self, uids, max_body_bytes) -> List[RawEmail]:
+        """Executa o FETCH em duas fases para um lote de UIDs"""
+        labels_item = " X-GM-LABELS" if 'X-GM-EXT-1' in self.imap.capabilities else ""
+        status, data = self.imap.uid(
+            'FETCH', uid_set(uids),
+            f'(UID BODY.PEEK[HEADER.FIELDS ({_HEADER_FIELDS})] BODYSTRUCTURE{labels_item})'
+        )
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"FETCH dos headers recusado: {status}")
+
+        headers = {}
+        parts = {}
+        for item in parse_fetch_response(data):
+            if item.get('UID') is None:
+                continue
+            uid = int(item['UID'])
+            headers[uid] = item
+            # Emails só com HTML: a parte HTML vira texto no parse
+            part = find_text_part(item.get('BODYSTRUCTURE'), subtypes=('plain', 'html'))
+            if part:
+                parts[uid] = part
+
+        # Agrupa por número de parte: normalmente 1 a 3 comandos por lote
+        by_part = {}
+        for uid, part in parts.items():
+            by_part.setdefault(part['part'], []).append(uid)
+
+        bodies = {}
+        for part_spec, part_uids in by_part.items():
+            status, data = self.imap.uid(
+                'FETCH', uid_set(part_uids),
+                f'(UID BODY.PEEK[{part_spec}]<0.{max_body_bytes}>)'
+            )
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"FETCH do corpo ({part_spec}) recusado: {status}")
+            for item in parse_fetch_response(data):
+                if item.get('UID') is None:
+                    continue
+                body = find_fetch_item(item, f'BODY[{part_spec}]')
+                if isinstance(body, bytes):
+                    bodies[int(item['UID'])] = body
+
+        raws: List[RawEmail] = []
+        for uid in uids:
+            item = headers.get(uid)
+            if item is None:
+                continue
+            raw_headers = find_fetch_item(item, 'BODY[HEADER')
+            labels = item.get('X-GM-LABELS')
+            part = parts.get(uid, {})
+            raws.append({
+                'id': str(uid),
+                'account': self.account['name'],
+                'uid': uid,
+                'uidvalidity': self.uidvalidity,
+                'headers': raw_headers if isinstance(raw_headers, bytes) else b'',
+                'body': bodies.get(uid, b''),
+                'encoding': part.get('encoding', '7bit'),
+                'charset': part.get('charset', 'utf-8'),
+                'subtype': part.get('subtype', 'plain'),
+                'labels': [str(l) for l in labels] if isinstance(labels, list) else [],
+            })
+        return raws
+
+    def get_email_details(self, email_id, by_uid=False, peek=False):
         """
         Extrai detalhes de um email específico
         
         Args:
             email_id: ID do email no servidor
+            by_uid: Se True, email_id é um UID (UID FETCH)
+            peek: Se True, não marca a mensagem como lida
         
         Returns:
             Dicionário com dados do email
         """
+        raw = self.fetch_raw_message(email_id, by_uid=by_uid, peek=peek)
+        return self.parse_raw(raw) if raw else None
+
+    def fetch_raw_message(self, email_id, by_uid=False, peek=False) -> Optional[RawEmail]:
+        """
+        Etapa de rede de get_email_details: baixa o início da mensagem
+        (PARSE_MAX_BYTES), o suficiente para headers e corpo de texto; anexos
+        grandes no fim da mensagem não trafegam. Como o RFC822, BODY[] marca
+        a mensagem como lida; com peek=True usa BODY.PEEK[] e a mensagem só é
+        marcada depois da entrega (ver app/services/flag_sync.py).
+        """
+        section = 'BODY.PEEK[]' if peek else 'BODY[]'
+        fetch_items = f'(UID {section}<0.{PARSE_MAX_BYTES}>)' if PARSE_MAX_BYTES else f'(UID {section})'
         try:
             # Busca o email
-            status, msg_data = self.imap.fetch(email_id, '(RFC822)')
+            with span("imap_fetch", account=self.account["name"], items=1):
+                if by_uid:
+                    status, msg_data = self.imap.uid('FETCH', email_id, fetch_items)
+                else:
+                    status, msg_data = self.imap.fetch(email_id, fetch_items)
             
             if status != 'OK':
                 return None
             
-            # Parseia o email
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-            
-            # Extrai assunto
-            subject = self.decode_header_value(msg.get('Subject', ''))
-            
-            # Extrai remetente
-            sender = self.decode_header_value(msg.get('From', ''))
-            
-            # Extrai data
-            date_str = msg.get('Date', '')
-            
-            # Extrai labels/flags (Gmail via IMAP usa X-GM-LABELS)
-            labels = []
-            if msg.get('X-GM-LABELS'):
-                labels = msg.get('X-GM-LABELS').split()
+            email_id = email_id.decode() if isinstance(email_id, bytes) else str(email_id)
+            raw: RawEmail = {
+                'id': email_id,
+                'account': self.account['name'],
+                'rfc822': msg_data[0][1],
+            }
+            found = _FETCH_UID_RE.search(msg_data[0][0])
+            uid = int(email_id) if by_uid else (int(found.group(1)) if found else None)
+            if uid is not None and self.uidvalidity is not None:
+                raw['uid'] = uid
+                raw['uidvalidity'] = self.uidvalidity
+            return raw
             
-            # Extrai prévia do corpo
-            snippet = self.get_email_body(msg, preview_only=False)
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao processar email {email_id}: {e}")
+            return None
+
+    @staticmethod
+    def parse_raw(raw: RawEmail) -> Optional[EmailData]:
+        """
+        Decodifica um RawEmail (headers, corpo e labels) em um EmailRecord
+        (compatível com EmailData). Não usa a conexão IMAP: pode rodar fora
+        da thread de rede
+        """
+        try:
+            if 'rfc822' in raw:
+                # Parseia só até a primeira parte de texto (limite de PARSE_MAX_BYTES)
+                msg = parse_message_bounded(raw['rfc822'], PARSE_MAX_BYTES)
+                
+                # Extrai labels/flags (Gmail via IMAP usa X-GM-LABELS)
+                labels = []
+                if msg.get('X-GM-LABELS'):
+                    labels = msg.get('X-GM-LABELS').split()
+                
+                # Extrai prévia do corpo
+                snippet = GmailIMAPReader.get_email_body(msg, preview_only=False)
+            else:
+                msg = email.message_from_bytes(raw.get('headers', b''))
+                labels = raw.get('labels', [])
+                snippet = decode_body_part(
+                    raw.get('body', b''), raw.get('encoding', '7bit'), raw.get('charset', 'utf-8')
+                )
+                if raw.get('subtype') == 'html':
+                    snippet = html_to_text(snippet)
+                snippet = snippet.strip()
             
-            return {
-                'id': email_id.decode() if isinstance(email_id, bytes) else str(email_id),
-                'subject': subject,
-                'sender': sender,
-                'date': date_str,
-                'labels': labels,
-                'snippet': snippet
-            }
+            # Com várias contas, o id leva o nome da conta (UIDs se repetem entre caixas)
+            account = raw.get('account')
+            # Posição na caixa: marcar como lida/etiquetar depois da entrega (flag_sync)
+            location = (
+                {'account': account or '', 'uid': raw['uid'], 'uidvalidity': raw['uidvalidity']}
+                if raw.get('uid') and raw.get('uidvalidity') else {}
+            )
+            return EmailRecord(
+                id=f"{account}:{raw['id']}" if account else raw['id'],
+                subject=GmailIMAPReader.decode_header_value(msg.get('Subject', '')),
+                sender=GmailIMAPReader.decode_header_value(msg.get('From', '')),
+                date=msg.get('Date', ''),
+                labels=labels,
+                snippet=snippet,
+                message_id=msg.get('Message-ID', '').strip(),
+                **location,
+            )
             
         except Exception as e:
-            print(f"⚠️  Erro ao processar email {email_id}: {e}")
+            logger.warning(f"⚠️  Erro ao processar email {raw.get('id')}: {e}")
             return None
     
-    def decode_header_value(self, header_value):
+    @staticmethod
+    def decode_header_value(header_value):
         """Decodifica header do email (lida com encoding)"""
         if not header_value:
             return ""
@@ -195,7 +675,8 @@ class GmailIMAPReader:
         
         return decoded_string
     
-    def get_email_body(self, msg, preview_only=False):
+    @staticmethod
+    def get_email_body(msg, preview_only=False):
         """
         Extrai corpo do email
         
@@ -206,47 +687,58 @@ class GmailIMAPReader:
         Returns:
             Texto do email
         """
-        body = ""
-        
         try:
-            # Email pode ter múltiplas partes (multipart)
-            if msg.is_multipart():
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    
-                    # Procura por texto simples
-                    if content_type == "text/plain":
-                        try:
-                            payload = part.get_payload(decode=True)
-                            if payload:
-                                body = payload.decode('utf-8', errors='ignore')
-                                break
-                        except:
-                            continue
-            else:
-                # Email simples (não-multipart)
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    body = payload.decode('utf-8', errors='ignore')
-            
-            # Se for apenas prévia, retorna primeiros caracteres
-            if preview_only and body:
-                body = body[:500]  # Primeiros 500 caracteres
-            
-            return body.strip()
+            # Primeira parte text/plain (ou HTML convertido), com o charset declarado
+            return message_text(msg, max_chars=500 if preview_only else None)
             
         except Exception as e:
-            print(f"⚠️  Erro ao extrair corpo: {e}")
+            logger.warning(f"⚠️  Erro ao extrair corpo: {e}")
             return ""
     
-    def mark_as_read(self, email_id):
-        """Marca email como lido"""
+    def mark_as_read(self, email_ids, by_uid=False):
+        """
+        Marca emails como lidos com um único STORE
+
+        Args:
+            email_ids: um id ou vários (números de sequência, ou UIDs com by_uid)
+        """
+        if isinstance(email_ids, (str, bytes, int)):
+            email_ids = [email_ids]
         try:
-            self.imap.store(email_id, '+FLAGS', '\\Seen')
-            return True
+            if by_uid:
+                return self.uid_store(email_ids, '+FLAGS.SILENT', '(\\Seen)')
+            ids = uid_set(int(i) for i in email_ids)
+            status, _ = self.imap.store(ids, '+FLAGS.SILENT', '(\\Seen)')
+            return status == 'OK'
         except Exception as e:
-            print(f"⚠️  Erro ao marcar como lido: {e}")
+            logger.warning(f"⚠️  Erro ao marcar como lido: {e}")
             return False
+
+    def uid_store(self, uids, item, value, chunk_size=UID_STORE_CHUNK_SIZE):
+        """
+        UID STORE em faixas compactadas ("1:40,42,50:90"): um comando por
+        até chunk_size UIDs, em vez de um por mensagem
+
+        A INBOX precisa estar selecionada. Acrescentar flags/labels (+...) é
+        idempotente: repetir após uma reconexão não muda o resultado.
+
+        Args:
+            item: ex.: '+FLAGS.SILENT' ou '+X-GM-LABELS.SILENT'
+            value: ex.: '(\\Seen)' ou '("Processado")'
+
+        Returns:
+            True se o servidor confirmou todos os comandos
+
+        Raises:
+            imaplib.IMAP4.abort, OSError: se a conexão cair no meio
+        """
+        ordered = sorted(set(int(u) for u in uids))
+        for i in range(0, len(ordered), chunk_size):
+            with span("imap_store", account=self.account["name"], items=len(ordered[i:i + chunk_size])):
+                status, _ = self.imap.uid('STORE', uid_set(ordered[i:i + chunk_size]), item, value)
+            if status != 'OK':
+                return False
+        return True
     
     def get_labels(self):
         """Lista todas as labels/pastas disponíveis"""
@@ -254,13 +746,13 @@ class GmailIMAPReader:
             status, folders = self.imap.list()
             
             if status == 'OK':
-                print("\n📁 Pastas/Labels disponíveis:")
-                for folder in folders:
-                    print(f"   {folder.decode()}")
+                logger.info("📁 Pastas/Labels disponíveis:\n" + "\n".join(
+                    f"   {folder.decode()}" for folder in folders
+                ))
             
             return folders
         except Exception as e:
-            print(f"❌ Erro ao listar pastas: {e}")
+            logger.error(f"❌ Erro ao listar pastas: {e}")
             return []
     
     def disconnect(self):
@@ -268,32 +760,196 @@ class GmailIMAPReader:
         try:
             if self.imap:
                 self.imap.logout()
-                print("👋 Desconectado do Gmail")
+                logger.info("👋 Desconectado do Gmail")
         except:
             pass
+        finally:
+            self.imap = None
 
 
-def fetch_unread_emails(max_results: int = 5, unread_only: bool = True) -> List[EmailData]:
+class IMAPSessionPool:
     """
-    Lê emails não lidos de um remetente específico configurado no .env
+    Mantém uma sessão IMAP autenticada por conta entre os ciclos de polling.
+
+    Antes de cada uso a sessão é verificada com NOOP; se o link caiu,
+    reconecta com backoff exponencial. Evita o handshake TLS + LOGIN a
+    cada ciclo (o Gmail limita logins frequentes).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = IMAP_RECONNECT_MAX_ATTEMPTS,
+        base_delay: float = IMAP_RECONNECT_BASE_DELAY_SECONDS,
+        max_delay: float = IMAP_RECONNECT_MAX_DELAY_SECONDS,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sessions: Dict[str, GmailIMAPReader] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.handshakes = 0
+        self.reconnects = 0
+        self.handshakes_saved = 0
+        self.failed_connects = 0
+
+    def _key_lock(self, key: str) -> threading.RLock:
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    def _connect_with_backoff(self, reader: GmailIMAPReader, start_attempt: int = 0) -> bool:
+        """Tenta (re)conectar até max_attempts vezes, com backoff exponencial + jitter"""
+        for attempt in range(start_attempt, self.max_attempts):
+            if attempt > 0:
+                delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"🔁 Nova tentativa de conexão em {delay:.1f}s ({attempt + 1}/{self.max_attempts})")
+                time.sleep(delay)
+            self.handshakes += 1
+            if reader.connect():
+                return True
+        self.failed_connects += 1
+        return False
+
+    def _get_reader(self, key: str, account: Optional[AccountConfig]) -> Optional[GmailIMAPReader]:
+        reader = self._sessions.get(key)
+
+        if reader is None:
+            reader = GmailIMAPReader(account)
+            if not reader.email_address or not reader.password:
+                return None
+            self.handshakes += 1
+            if not reader.imap and not self._connect_with_backoff(reader, start_attempt=1):
+                return None
+            self._sessions[key] = reader
+            return reader
+
+        if reader.is_alive():
+            self.handshakes_saved += 1
+            return reader
+
+        logger.warning("⚠️  Sessão IMAP caiu, reconectando...")
+        reader.disconnect()
+        self.reconnects += 1
+        if not self._connect_with_backoff(reader):
+            return None
+        return reader
+
+    @contextmanager
+    def session(self, account: Optional[AccountConfig] = None):
+        """
+        Empresta a sessão da conta (exclusiva enquanto o bloco executa)
+
+        Args:
+            account: conta a usar (a conta do .env se None)
+
+        Yields:
+            GmailIMAPReader conectado, ou None se não foi possível conectar
+        """
+        if account is None:
+            account = default_account()
+        key = account_key(account)
+        with self._key_lock(key):
+            yield self._get_reader(key, account)
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de handshakes, reconexões e handshakes evitados"""
+        return {
+            "sessions": len(self._sessions),
+            "handshakes": self.handshakes,
+            "reconnects": self.reconnects,
+            "handshakes_saved": self.handshakes_saved,
+            "failed_connects": self.failed_connects,
+        }
+
+    def close_all(self):
+        """Encerra todas as sessões abertas"""
+        with self._lock:
+            sessions = list(self._sessions.items())
+            self._sessions.clear()
+        for key, reader in sessions:
+            with self._key_lock(key):
+                reader.disconnect()
+
+
+# Pool compartilhado entre os ciclos de watch_emails
+session_pool = IMAPSessionPool()
+
+# Marca d'água da sincronização por UID
+sync_state = SyncStateStore()
+
+
+def fetch_unread_emails(max_results: int = 5, unread_only: bool = True, since_seq: Optional[int] = None,
+                        raw: bool = False, account: Optional[AccountConfig] = None,
+                        exclude_label: Optional[str] = None, peek: bool = False) -> List[EmailData]:
+    """
+    Lê emails não lidos dos remetentes da conta (por padrão, a do .env)
+    
+    A sessão IMAP é reaproveitada entre chamadas (ver IMAPSessionPool).
     
     Args:
         max_results: número máximo de emails a retornar
+        since_seq: busca apenas mensagens a partir deste número de sequência
+        raw: se True, retorna RawEmail sem decodificar (ver GmailIMAPReader.parse_raw)
+        account: conta a ler (a do .env se None)
+        exclude_label: ignora mensagens com esta label do Gmail
+        peek: não marca como lidas ao baixar (só com a sincronização de flags,
+            senão as mesmas mensagens voltariam em toda busca por não lidas)
     
     Returns:
         Lista de dicionários com informações dos emails
+
+    Raises:
+        ConnectionError: se não foi possível conectar à conta
+        imaplib.IMAP4.error: se a busca falhar (ver GmailIMAPReader)
     """
-    gmail = GmailIMAPReader()
+    with session_pool.session(account) as gmail:
+        if gmail is None:
+            # Levanta para o chamador poder recuar (ver AdaptivePollScheduler)
+            raise ConnectionError("Falha na conexão IMAP. Configure o .env corretamente.")
 
-    if not gmail.imap:
-        print("❌ Falha na conexão. Configure o .env corretamente.")
-        return []
+        emails: List[EmailData] = gmail.get_emails_from_sender(
+            max_results=max_results,
+            unread_only=unread_only,
+            since_seq=since_seq,
+            raw=raw,
+            exclude_label=exclude_label,
+            peek=peek,
+        )
 
-    emails: List[EmailData] = gmail.get_emails_from_sender(
-        max_results=max_results,
-        unread_only=unread_only
-    )
+    return emails
+
+
+def fetch_new_emails(max_results: int = 100, raw: bool = False,
+                     account: Optional[AccountConfig] = None, hold: bool = False) -> List[EmailData]:
+    """
+    Lê apenas os emails que chegaram desde a última sincronização (por UID)
+    
+    Args:
+        max_results: número máximo de emails novos a retornar
+        raw: se True, retorna RawEmail sem decodificar (ver GmailIMAPReader.parse_raw)
+        account: conta a ler (a do .env se None)
+        hold: a marca d'água só passa dos emails retornados depois de
+            sync_state.complete (ver SyncStateStore)
+    
+    Returns:
+        Lista de dicionários com informações dos emails
+
+    Raises:
+        ConnectionError: se não foi possível conectar à conta
+        imaplib.IMAP4.error, FetchError: se a busca falhar (ver GmailIMAPReader)
+    """
+    with session_pool.session(account) as gmail:
+        if gmail is None:
+            # Levanta para o chamador poder recuar (ver AdaptivePollScheduler)
+            raise ConnectionError("Falha na conexão IMAP. Configure o .env corretamente.")
 
-    gmail.disconnect()
+        emails: List[EmailData] = gmail.get_new_emails_by_uid(
+            sync_state, max_results=max_results, raw=raw, hold=hold
+        )
 
     return emails
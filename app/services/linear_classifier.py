@@ -0,0 +1,256 @@
+"""
+Classificador linear (TF-IDF com hashing + Complement Naive Bayes)
+Alternativa às contagens de palavras-chave: aprende com emails rotulados.
+
+Cada email vira um vetor esparso de features com hashing (palavras e
+bigramas do corpo, palavras do assunto em um espaço próprio), com TF
+sublinear, IDF e normalização L2. A pontuação de um lote inteiro é uma
+multiplicação esparsa pela matriz de pesos (features x categorias).
+
+O modelo é um diretório com weights.npy, idf.npy e meta.json; os .npy são
+abertos com mmap (só as linhas usadas são lidas do disco, e processos
+workers compartilham as mesmas páginas).
+
+Requer NumPy (opcional): sem ele, load_model retorna None e o
+EmailClassifier continua com as palavras-chave.
+"""
+
+# Importações padrão do Python
+import os
+import re
+import json
+import time
+import zlib
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Dimensão do espaço de features: 2**CLASSIFIER_HASH_BITS
+CLASSIFIER_HASH_BITS = int(os.getenv("CLASSIFIER_HASH_BITS", "18"))
+# Suavização (alpha) do Naive Bayes
+CLASSIFIER_ALPHA = float(os.getenv("CLASSIFIER_ALPHA", "0.3"))
+
+MODEL_FORMAT = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def extract_features(subject: str, body: str) -> List[str]:
+    """
+    Features de um email já normalizado (ver EmailClassifier.normalize_text)
+
+    Assunto: palavras com prefixo "s:" (o assunto pesa diferente do corpo).
+    Corpo: palavras e bigramas.
+    """
+    features = ["s:" + t for t in _TOKEN_RE.findall(subject)]
+    words = _TOKEN_RE.findall(body)
+    features.extend(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return features
+
+
+def _vectorize_tf(
+    docs: Iterable[Tuple[str, str]], n_features: int
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Lote de (assunto, corpo) normalizados em CSR (indptr, indices, tf sublinear)
+    Colisões de hash dentro do mesmo email são somadas.
+    """
+    mask = n_features - 1
+    indptr = [0]
+    indices: List[int] = []
+    values: List[float] = []
+    for subject, body in docs:
+        counts: Dict[int, int] = {}
+        for feature in extract_features(subject, body):
+            index = zlib.crc32(feature.encode("utf-8")) & mask
+            counts[index] = counts.get(index, 0) + 1
+        indices.extend(counts)
+        values.extend(counts.values())
+        indptr.append(len(indices))
+    tf = np.asarray(values, dtype=np.float32)
+    np.log(tf, out=tf)
+    tf += 1.0
+    return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64), tf
+
+
+def _normalize_rows(indptr: "np.ndarray", values: "np.ndarray"):
+    """Normalização L2 de cada linha do CSR, no lugar"""
+    lengths = np.diff(indptr)
+    nonempty = lengths > 0
+    if not nonempty.any():
+        return
+    squares = np.add.reduceat(values * values, indptr[:-1][nonempty])
+    norms = np.ones(len(lengths), dtype=np.float32)
+    norms[nonempty] = np.sqrt(squares)
+    norms[norms == 0] = 1.0
+    values /= np.repeat(norms, lengths)
+
+
+class LinearModel:
+    """
+    Pesos por feature e categoria, IDF e metadados
+
+    Args:
+        weights: matriz (n_features, n_classes), float32
+        idf: vetor (n_features,), 0 para features nunca vistas no treino
+        classes: nome de cada coluna de weights
+        meta: informações do treino (amostras, acurácia, data...)
+    """
+
+    def __init__(self, weights: "np.ndarray", idf: "np.ndarray", classes: Sequence[str],
+                 meta: Optional[Dict] = None):
+        self.weights = weights
+        self.idf = idf
+        self.classes = list(classes)
+        self.n_features = weights.shape[0]
+        self.meta = meta or {}
+
+    def vectorize(self, docs: Sequence[Tuple[str, str]]):
+        """CSR TF-IDF normalizado; features desconhecidas (idf 0) saem do vetor"""
+        indptr, indices, values = _vectorize_tf(docs, self.n_features)
+        values *= self.idf[indices]
+        _normalize_rows(indptr, values)
+        return indptr, indices, values
+
+    def scores(self, docs: Sequence[Tuple[str, str]]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Pontuação (n_docs, n_classes) do lote: X @ W, com X esparso
+
+        Returns:
+            (pontuações, máscara dos emails com alguma feature conhecida)
+        """
+        indptr, indices, values = self.vectorize(docs)
+        scores = np.zeros((len(docs), len(self.classes)), dtype=np.float32)
+        known = np.zeros(len(docs), dtype=bool)
+        rows = np.diff(indptr) > 0
+        if rows.any():
+            starts = indptr[:-1][rows]
+            # Cada linha = soma das linhas de W das suas features, ponderadas pelo TF-IDF
+            contributions = self.weights[indices] * values[:, None]
+            scores[rows] = np.add.reduceat(contributions, starts)
+            known[rows] = np.add.reduceat((values != 0).astype(np.int32), starts) > 0
+        return scores, known
+
+    def predict(self, docs: Sequence[Tuple[str, str]]) -> List[Optional[str]]:
+        """Categoria de cada (assunto, corpo) normalizado; None sem features conhecidas"""
+        if not docs:
+            return []
+        scores, known = self.scores(docs)
+        best = scores.argmax(axis=1)
+        return [self.classes[b] if k else None for b, k in zip(best.tolist(), known.tolist())]
+
+    def save(self, path: str):
+        """Grava o modelo em um diretório (substitui cada arquivo de forma atômica)"""
+        os.makedirs(path, exist_ok=True)
+        for name, array in (("weights.npy", self.weights), ("idf.npy", self.idf)):
+            tmp = os.path.join(path, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(array, dtype=np.float32))
+            os.replace(tmp, os.path.join(path, name))
+        meta = {**self.meta, "format": MODEL_FORMAT, "classes": self.classes, "n_features": self.n_features}
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+
+def load_model(path: str) -> Optional[LinearModel]:
+    """
+    Abre o modelo com mmap; None (com aviso) se NumPy não está instalado
+    ou o diretório não tem um modelo válido
+    """
+    if np is None:
+        logger.warning("⚠️  CLASSIFIER_BACKEND=linear requer NumPy (pip install -r requirements-optional.txt); usando palavras-chave")
+        return None
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != MODEL_FORMAT:
+            raise ValueError(f"formato {meta.get('format')} não suportado")
+        weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+        idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+        if weights.shape != (meta["n_features"], len(meta["classes"])) or idf.shape != (meta["n_features"],):
+            raise ValueError("dimensões de weights.npy/idf.npy não batem com meta.json")
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"⚠️  Modelo do classificador indisponível em {path} ({e}); usando palavras-chave")
+        return None
+    logger.info(
+        f"🧮 Modelo linear carregado: {len(meta['classes'])} categorias, "
+        f"{meta.get('samples', '?')} emails de treino"
+    )
+    return LinearModel(weights, idf, meta["classes"], meta)
+
+
+def train(
+    docs: Sequence[Tuple[str, str]],
+    labels: Sequence[str],
+    classes: Optional[Sequence[str]] = None,
+    hash_bits: int = CLASSIFIER_HASH_BITS,
+    alpha: float = CLASSIFIER_ALPHA,
+) -> LinearModel:
+    """
+    Treina um Complement Naive Bayes sobre TF-IDF (Rennie et al., 2003)
+
+    Para cada categoria, os pesos vêm da frequência das features nos emails
+    das OUTRAS categorias (mais estável com categorias desbalanceadas) e são
+    normalizados pela soma absoluta.
+
+    Args:
+        docs: (assunto, corpo) já normalizados
+        labels: categoria de cada email
+        classes: ordem das colunas (padrão: categorias presentes, em ordem alfabética)
+    """
+    if np is None:
+        raise RuntimeError("Treinar o classificador linear requer NumPy (pip install -r requirements-optional.txt)")
+    if len(docs) != len(labels) or not docs:
+        raise ValueError("docs e labels devem ter o mesmo tamanho (> 0)")
+
+    started = time.perf_counter()
+    classes = list(classes) if classes else sorted(set(labels))
+    class_index = {c: i for i, c in enumerate(classes)}
+    n_features = 1 << hash_bits
+    n_classes = len(classes)
+
+    indptr, indices, values = _vectorize_tf(docs, n_features)
+    df = np.bincount(indices, minlength=n_features).astype(np.float64)
+    idf = np.zeros(n_features, dtype=np.float32)
+    seen = df > 0
+    idf[seen] = np.log((1 + len(docs)) / (1 + df[seen])) + 1
+    values *= idf[indices]
+    _normalize_rows(indptr, values)
+
+    y = np.asarray([class_index[label] for label in labels], dtype=np.int64)
+    rows_class = np.repeat(y, np.diff(indptr))
+    counts = np.bincount(
+        rows_class * n_features + indices, weights=values, minlength=n_classes * n_features
+    ).reshape(n_classes, n_features)
+
+    # Complemento: soma das features nas outras categorias
+    complement = counts.sum(axis=0, keepdims=True) - counts + alpha
+    log_theta = np.log(complement / complement.sum(axis=1, keepdims=True))
+    log_theta /= np.abs(log_theta).sum(axis=1, keepdims=True)
+    # Menor log_theta do complemento = mais típica da categoria: pontuação = -log_theta
+    weights = np.ascontiguousarray((-log_theta).T, dtype=np.float32)
+    # Features nunca vistas não pontuam (idf 0 já as zera no vetor)
+    weights[~seen] = 0
+
+    meta = {
+        "samples": len(docs),
+        "class_counts": {c: int((y == i).sum()) for i, c in enumerate(classes)},
+        "alpha": alpha,
+        "hash_bits": hash_bits,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "train_seconds": round(time.perf_counter() - started, 3),
+    }
+    return LinearModel(weights, idf, classes, meta)
@@ -0,0 +1,197 @@
+"""
+Feed ao vivo (Server-Sent Events) dos emails recém-classificados
+Cada email é serializado uma única vez e compartilhado entre todos os
+assinantes; cada assinante guarda só referências em um buffer limitado.
+Um histórico curto permite retomar a conexão pelo Last-Event-ID.
+
+Política para clientes lentos: com o buffer cheio, o evento mais antigo é
+descartado e o cliente recebe um evento "lagged" com a quantidade perdida
+(pode recuperar o intervalo via GET /emails).
+
+Os ids começam no instante de início do feed (ms desde a época), então
+crescem entre reinícios do servidor. Um Last-Event-ID de uma execução
+anterior (ou maior que o último id publicado) não pode ser retomado pelo
+histórico: o cliente recebe um evento "reset" e deve recarregar via
+GET /emails.
+"""
+
+# Importações padrão do Python
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, Optional, Set, Tuple
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.utils.serialization import dumps_str
+
+# Eventos pendentes por cliente antes de descartar os mais antigos
+LIVE_FEED_CLIENT_BUFFER = int(os.getenv("LIVE_FEED_CLIENT_BUFFER", "100"))
+# Eventos mantidos para retomada via Last-Event-ID
+LIVE_FEED_HISTORY_SIZE = int(os.getenv("LIVE_FEED_HISTORY_SIZE", "1000"))
+LIVE_FEED_MAX_SUBSCRIBERS = int(os.getenv("LIVE_FEED_MAX_SUBSCRIBERS", "10000"))
+# Comentário periódico que mantém a conexão aberta em proxies
+LIVE_FEED_HEARTBEAT_SECONDS = float(os.getenv("LIVE_FEED_HEARTBEAT_SECONDS", "15"))
+
+# (id, categoria, bloco SSE já formatado)
+Event = Tuple[int, str, bytes]
+
+
+def _format_event(event_id: Optional[int], name: str, data: str) -> bytes:
+    # Sem id, o navegador mantém o Last-Event-ID anterior
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: {data}\n\n".encode("utf-8")
+
+
+class Subscription:
+    """Um cliente conectado: filtro de categorias e buffer limitado"""
+
+    __slots__ = ("categories", "buffer", "dropped", "reset", "wakeup")
+
+    def __init__(self, categories: Optional[Set[str]], buffer_size: int):
+        self.categories = categories
+        self.buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self.dropped = 0
+        # Last-Event-ID não retomável (outra execução do servidor)
+        self.reset = False
+        self.wakeup = asyncio.Event()
+
+    def wants(self, categoria: str) -> bool:
+        return not self.categories or categoria in self.categories
+
+    def push(self, event: Event):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1  # deque com maxlen descarta o mais antigo
+        self.buffer.append(event)
+        self.wakeup.set()
+
+
+class LiveFeed:
+    """
+    Distribui emails classificados aos assinantes conectados
+
+    Args:
+        buffer_size: eventos pendentes por cliente
+        history_size: eventos guardados para retomada
+        max_subscribers: limite de conexões simultâneas
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = LIVE_FEED_CLIENT_BUFFER,
+        history_size: int = LIVE_FEED_HISTORY_SIZE,
+        max_subscribers: int = LIVE_FEED_MAX_SUBSCRIBERS,
+    ):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._history: Deque[Event] = deque(maxlen=history_size)
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Ids crescem entre reinícios: o primeiro evento de cada execução
+        # fica acima dos ids já entregues pela execução anterior
+        self._first_id = int(time.time() * 1000)
+        self._last_id = self._first_id
+
+        self.published = 0
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Event loop onde os assinantes vivem (chamado no startup)"""
+        self._loop = loop
+
+    def publish(self, email: EmailData):
+        """
+        Publica um email classificado; pode ser chamado de qualquer thread
+        (fora do event loop, a entrega é agendada com call_soon_threadsafe)
+        """
+        categoria = email.get("categoria", "Outros")
+        data = dumps_str(email)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            self._dispatch(categoria, data)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, categoria, data)
+
+    def _dispatch(self, categoria: str, data: str):
+        self._last_id += 1
+        event = (self._last_id, categoria, _format_event(self._last_id, "email", data))
+        self._history.append(event)
+        self.published += 1
+        for sub in self._subscribers:
+            if sub.wants(categoria):
+                sub.push(event)
+
+    def is_full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def subscribe(
+        self, categories: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None
+    ) -> Subscription:
+        """Registra um assinante e reenvia o que ele perdeu desde last_event_id"""
+        sub = Subscription(set(categories) if categories else None, self.buffer_size)
+
+        if last_event_id is not None and not self._first_id <= last_event_id <= self._last_id:
+            # Id de outra execução: o intervalo perdido não está no histórico
+            sub.reset = True
+            for event in self._history:
+                if sub.wants(event[1]):
+                    sub.push(event)
+        elif last_event_id is not None and last_event_id < self._last_id:
+            oldest = self._history[0][0] if self._history else self._last_id + 1
+            if last_event_id + 1 < oldest:
+                # Parte do intervalo já saiu do histórico
+                sub.dropped += oldest - last_event_id - 1
+            for event in self._history:
+                if event[0] > last_event_id and sub.wants(event[1]):
+                    sub.push(event)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+        self.dropped += sub.dropped
+
+    async def events(
+        self, categories: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream SSE de um assinante: eventos, avisos de perda e heartbeats
+        A assinatura só existe enquanto o stream está sendo consumido.
+        """
+        sub = self.subscribe(categories, last_event_id)
+        try:
+            yield f"retry: 3000\n: conectado ({self._last_id})\n\n".encode("utf-8")
+            if sub.reset:
+                yield _format_event(None, "reset", json.dumps({"first_event_id": self._first_id}))
+            while True:
+                if sub.dropped:
+                    lost, sub.dropped = sub.dropped, 0
+                    self.dropped += lost
+                    yield _format_event(None, "lagged", json.dumps({"dropped": lost}))
+                while sub.buffer:
+                    yield sub.buffer.popleft()[2]
+                    if sub.dropped:
+                        break
+                if sub.buffer or sub.dropped:
+                    continue
+                sub.wakeup.clear()
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), LIVE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "first_event_id": self._first_id,
+            "last_event_id": self._last_id,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
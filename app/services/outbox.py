@@ -0,0 +1,253 @@
+"""
+Outbox durável de entregas para a API InboxStream
+Emails classificados são gravados em SQLite antes da entrega; um worker em
+segundo plano drena a fila com backoff exponencial + jitter e só remove
+cada entrada após resposta 2xx.
+"""
+
+# Importações padrão do Python
+import os
+import time
+import random
+import sqlite3
+import threading
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.models.EmailRecord import EmailRecord
+from app.api.inbox_stream import send_batch_to_api
+from app.utils.metrics import Counter, FAILURES, span
+from app.utils.serialization import dumps_str, loads
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", "outbox.db")
+# Limite de entradas pendentes (limita o uso de disco); acima disso enqueue recusa
+OUTBOX_MAX_ENTRIES = int(os.getenv("OUTBOX_MAX_ENTRIES", "100000"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "600"))
+# Após N tentativas a entrada fica como "morta" para inspeção (0 = sem limite)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "0"))
+
+EMAILS_DELIVERED = Counter("emails_delivered_total", "Emails confirmados (2xx) pela API")
+DELIVERY_RETRIES = Counter("delivery_retries_total", "Entregas que falharam e foram reagendadas")
+
+
+class Outbox:
+    """Fila persistente de emails a entregar"""
+
+    def __init__(self, path: str = OUTBOX_DB_PATH, max_entries: int = OUTBOX_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                email_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT,
+                dead INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (dead, next_attempt_at)")
+
+        # Contadores desde o início do processo
+        self.enqueued = 0
+        self.delivered = 0
+        self.retries = 0
+        self.rejected = 0
+        self.dead = 0
+
+    def enqueue(self, emails: List[EmailData]) -> bool:
+        """
+        Grava os emails na fila (uma transação)
+
+        Returns:
+            False se a fila está cheia (OUTBOX_MAX_ENTRIES) e nada foi gravado
+        """
+        if not emails:
+            return True
+        now = time.time()
+        rows = [(str(e.get("id", "")), dumps_str(e), now, now) for e in emails]
+        with self._lock:
+            (depth,) = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()
+            if depth + len(rows) > self.max_entries:
+                self.rejected += len(rows)
+                logger.error(f"❌ Outbox cheia ({depth}/{self.max_entries}), {len(rows)} emails recusados")
+                return False
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO outbox (email_id, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._db.execute("COMMIT")
+            self.enqueued += len(rows)
+        return True
+
+    def put(self, email: EmailData) -> bool:
+        """Grava um único email (compatível com o parâmetro deliver do backfill)"""
+        return self.enqueue([email])
+
+    def due(self, limit: int = OUTBOX_BATCH_SIZE) -> List[Tuple[int, int, EmailData]]:
+        """Entradas prontas para (re)envio: [(seq, tentativas, email)]"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, attempts, payload FROM outbox "
+                "WHERE dead = 0 AND next_attempt_at <= ? ORDER BY next_attempt_at, seq LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [(seq, attempts, EmailRecord.from_dict(loads(payload))) for seq, attempts, payload in rows]
+
+    def ack(self, seqs: List[int]):
+        """Remove entradas entregues (2xx)"""
+        if not seqs:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+            self._db.execute("COMMIT")
+            self.delivered += len(seqs)
+
+    def retry(self, failures: List[Tuple[int, int]], error: str = ""):
+        """
+        Reagenda entradas que falharam: [(seq, tentativas anteriores)]
+        O atraso dobra a cada tentativa, com jitter, até OUTBOX_RETRY_MAX_SECONDS
+        """
+        if not failures:
+            return
+        now = time.time()
+        updates = []
+        for seq, attempts in failures:
+            attempts += 1
+            delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1)))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            dead = 1 if OUTBOX_MAX_ATTEMPTS and attempts >= OUTBOX_MAX_ATTEMPTS else 0
+            self.dead += dead
+            updates.append((attempts, now + delay, error[:500], dead, seq))
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, dead = ? WHERE seq = ?",
+                updates,
+            )
+            self._db.execute("COMMIT")
+            self.retries += len(updates)
+
+    def stats(self) -> Dict:
+        """Profundidade da fila e contadores de entrega"""
+        with self._lock:
+            depth, due, dead, oldest = self._db.execute(
+                "SELECT COUNT(*), "
+                "COALESCE(SUM(dead = 0 AND next_attempt_at <= ?), 0), "
+                "COALESCE(SUM(dead), 0), MIN(created_at) FROM outbox",
+                (time.time(),),
+            ).fetchone()
+        return {
+            "depth": depth,
+            "due": due,
+            "dead": dead,
+            "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else 0,
+            "max_entries": self.max_entries,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OutboxWorker:
+    """
+    Drena a outbox em segundo plano, em lotes, via send_batch_to_api
+
+    Args:
+        outbox: fila a drenar
+        send_batch: função de entrega em lote (retorna mapa id->sucesso)
+        on_delivered: chamada para cada email entregue (ex.: log de latência)
+        idle_seconds: espera quando não há nada pronto para envio
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        send_batch: Callable[[List[EmailData]], Dict[str, bool]] = send_batch_to_api,
+        on_delivered: Optional[Callable[[EmailData], None]] = None,
+        idle_seconds: float = 1.0,
+    ):
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.on_delivered = on_delivered
+        self.idle_seconds = idle_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def drain_once(self) -> int:
+        """Envia um lote de entradas prontas; retorna quantas foram processadas"""
+        rows = self.outbox.due()
+        if not rows:
+            return 0
+
+        emails = [email for _, _, email in rows]
+        try:
+            with span("api_send", items=len(emails)):
+                results = self.send_batch(emails)
+            error = "API não confirmou (não-2xx)"
+        except Exception as ex:
+            results = {}
+            error = str(ex)
+
+        delivered, delivered_emails, failed = [], [], []
+        for seq, attempts, email in rows:
+            if results.get(str(email.get("id", "")) or "<no-id>"):
+                delivered.append(seq)
+                delivered_emails.append(email)
+            else:
+                failed.append((seq, attempts))
+
+        # Confirma antes dos callbacks: uma falha neles não pode reenviar o que a API já aceitou
+        self.outbox.ack(delivered)
+        self.outbox.retry(failed, error)
+        EMAILS_DELIVERED.inc(len(delivered))
+        DELIVERY_RETRIES.inc(len(failed))
+        if failed:
+            logger.warning(f"⚠️  {len(failed)} entregas falharam, reagendadas com backoff ({error})")
+
+        if self.on_delivered:
+            for email in delivered_emails:
+                try:
+                    self.on_delivered(email)
+                except Exception as ex:
+                    FAILURES.labels("on_delivered").inc()
+                    logger.error(f"❌ Falha no callback de entrega do email ID {email.get('id')}: {ex}")
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.drain_once():
+                    self._stop.wait(self.idle_seconds)
+            except Exception as ex:
+                logger.error(f"❌ Erro no worker da outbox: {ex}")
+                self._stop.wait(self.idle_seconds)
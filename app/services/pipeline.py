@@ -0,0 +1,540 @@
+"""
+Pipeline assíncrono de ingestão
+fetch (IMAP) → parse → classify → deliver (outbox), com filas limitadas
+entre as etapas (backpressure). Chamadas bloqueantes rodam em executores,
+então o event loop do FastAPI continua livre para as requisições.
+"""
+
+# Importações padrão do Python
+import os
+import time
+import asyncio
+import imaplib
+import itertools
+import functools
+import contextvars
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.models.RawEmail import RawEmail
+from app.models.AccountConfig import AccountConfig
+from app.config.accounts import load_accounts, accounts_for_shard, account_key, SHARD_INDEX, SHARD_COUNT
+from app.services.gmail_imap import (
+    GmailIMAPReader, fetch_unread_emails, fetch_new_emails, session_pool, sync_state, uid_state_key, SYNC_MODE
+)
+from app.services.EmailClassifer import EmailClassifier, init_classifier_worker, classify_texts
+from app.services.outbox import Outbox
+from app.services.email_store import EmailStore
+from app.services.dedup import DedupFilter
+from app.services.raw_cache import RawMessageCache
+from app.services.flag_sync import FlagSync
+from app.services.scheduler import AdaptivePollScheduler, ArrivalHistoryStore
+from app.utils.metrics import Counter, Gauge, FAILURES, span
+
+logger = logging.getLogger(__name__)
+
+# Modo do watcher: "poll" (intervalo fixo) ou "idle" (push via IMAP IDLE)
+WATCH_MODE = os.getenv("WATCH_MODE", "poll").strip().lower()
+# Intervalo fixo (POLL_ADAPTIVE=false) e espera após falha de conexão no IDLE
+POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "60"))
+# Gmail encerra o IDLE após ~29 min; reemite antes disso
+IDLE_TIMEOUT_SECONDS = int(os.getenv("IDLE_TIMEOUT_SECONDS", str(25 * 60)))
+# Máximo de emails buscados por ciclo no modo "unseen"
+MAX_RESULTS_PER_POLL = int(os.getenv("MAX_RESULTS_PER_POLL", "2"))
+
+# Máximo de buscas IMAP simultâneas somando todas as contas (IDLE não conta)
+INGEST_MAX_CONCURRENCY = int(os.getenv("INGEST_MAX_CONCURRENCY", "4"))
+
+# Capacidade de cada fila entre etapas e tamanho dos lotes por etapa
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "50"))
+# Processos para classificação (0 = thread, no próprio processo)
+PIPELINE_CLASSIFY_PROCESSES = int(os.getenv("PIPELINE_CLASSIFY_PROCESSES", "1"))
+# Tempo máximo para esvaziar as filas no desligamento
+PIPELINE_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("PIPELINE_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+# Retorno de _wait_idle quando o servidor não anuncia IDLE
+IDLE_UNSUPPORTED = object()
+
+
+EMAILS_FETCHED = Counter("emails_fetched_total", "Emails baixados do IMAP", ["account"])
+EMAILS_CLASSIFIED = Counter("emails_classified_total", "Emails classificados por categoria", ["categoria"])
+QUEUE_DEPTH = Gauge("queue_depth", "Itens aguardando em cada fila do pipeline", ["queue"])
+LAST_POLL = Gauge(
+    "last_successful_poll_timestamp_seconds", "Momento (epoch) da última busca bem-sucedida", ["account"]
+)
+POLL_INTERVAL = Gauge("poll_interval_seconds", "Intervalo atual do polling de cada conta", ["account"])
+
+
+class StageStats:
+    """Contadores e latência de uma etapa"""
+
+    def __init__(self, queue: Optional[asyncio.Queue] = None):
+        self.queue = queue
+        self.items = 0
+        self.batches = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.batches += 1
+        self.total_seconds += seconds
+        self.last_seconds = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else None,
+            "queue_capacity": self.queue.maxsize if self.queue else None,
+            "items": self.items,
+            "batches": self.batches,
+            "errors": self.errors,
+            "avg_batch_ms": round(1000 * self.total_seconds / self.batches, 2) if self.batches else 0.0,
+            "last_batch_ms": round(1000 * self.last_seconds, 2),
+        }
+
+
+class IngestionPipeline:
+    """
+    Pipeline fetch → parse → classify → deliver
+
+    Cada conta tem seu worker de busca (conexão e thread próprias); as
+    etapas seguintes são compartilhadas. Na sincronização por UID, a marca
+    d'água persistida só passa de uma mensagem depois que ela chega à
+    outbox (ou é descartada de propósito); falhas no caminho fazem a
+    próxima busca repeti-la.
+
+    Args:
+        outbox: destino final (entrega durável com retry)
+        store: armazenamento local para busca (opcional)
+        dedup: descarta emails já processados antes de classificar (opcional)
+        raw_cache: guarda as mensagens brutas para reprocessamento (opcional)
+        flag_sync: marca no IMAP as mensagens já entregues, antes de cada busca (opcional)
+        on_classified: chamada no event loop para cada email classificado
+        queue_size: capacidade de cada fila entre etapas
+        accounts: contas monitoradas (padrão: as deste shard em ACCOUNTS_FILE / .env)
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        store: Optional[EmailStore] = None,
+        dedup: Optional[DedupFilter] = None,
+        on_classified: Optional[Callable[[EmailData], None]] = None,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        accounts: Optional[List[AccountConfig]] = None,
+        raw_cache: Optional[RawMessageCache] = None,
+        flag_sync: Optional[FlagSync] = None,
+    ):
+        self.outbox = outbox
+        self.store = store
+        self.dedup = dedup
+        self.raw_cache = raw_cache
+        self.flag_sync = flag_sync
+        self.reprocess_status: Dict[str, Any] = {"running": False}
+        self.on_classified = on_classified
+        self.queue_size = queue_size
+        self.mode = WATCH_MODE
+
+        if accounts is None:
+            accounts = accounts_for_shard(load_accounts())
+        self.accounts = accounts
+        # Nome da conta -> chave da marca d'água (sincronização por UID)
+        self._state_keys = {a["name"]: uid_state_key(a) for a in accounts}
+
+        self._stop = threading.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._fetch_tasks: List[asyncio.Task] = []
+        self._fetch_slots: Optional[asyncio.Semaphore] = None
+        # Uma thread de IMAP por conta (a sessão de cada conta é única) e um pool para parse/outbox
+        self._imap_executors: Dict[str, ThreadPoolExecutor] = {
+            account_key(a): ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"imap-{account_key(a)}")
+            for a in accounts
+        }
+        self._io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline-io")
+        self._classify_executor: Optional[Executor] = None
+        self._classifier = EmailClassifier()
+
+        self.parse_queue: Optional[asyncio.Queue] = None
+        self.classify_queue: Optional[asyncio.Queue] = None
+        self.deliver_queue: Optional[asyncio.Queue] = None
+        self.stages: Dict[str, StageStats] = {}
+        self.last_poll_at: Optional[float] = None
+        self.account_stats: Dict[str, Dict[str, Any]] = {
+            account_key(a): {"mode": WATCH_MODE, "last_poll_at": None, "fetched": 0, "errors": 0}
+            for a in accounts
+        }
+        # Intervalo do polling por conta, adaptado à taxa de chegada
+        self._arrivals = ArrivalHistoryStore()
+        self.schedulers: Dict[str, AdaptivePollScheduler] = {
+            account_key(a): AdaptivePollScheduler(
+                account_key(a), self._arrivals, fixed_seconds=POLL_INTERVAL_SECONDS
+            )
+            for a in accounts
+        }
+
+    # --- Ciclo de vida ---
+
+    async def start(self):
+        """Cria as filas e as tarefas de cada etapa"""
+        self._stop.clear()
+        self.parse_queue = asyncio.Queue(self.queue_size)
+        self.classify_queue = asyncio.Queue(self.queue_size)
+        self.deliver_queue = asyncio.Queue(self.queue_size)
+        self.stages = {
+            "fetch": StageStats(),
+            "parse": StageStats(self.parse_queue),
+            "classify": StageStats(self.classify_queue),
+            "deliver": StageStats(self.deliver_queue),
+        }
+
+        self._classifier.reload_rules()
+        rules = self._classifier.worker_args()
+        if PIPELINE_CLASSIFY_PROCESSES > 0:
+            self._classify_executor = ProcessPoolExecutor(
+                max_workers=PIPELINE_CLASSIFY_PROCESSES,
+                initializer=init_classifier_worker, initargs=rules,
+            )
+        else:
+            self._classify_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="classify",
+                initializer=init_classifier_worker, initargs=rules,
+            )
+
+        for name, queue in (
+            ("parse", self.parse_queue), ("classify", self.classify_queue), ("deliver", self.deliver_queue)
+        ):
+            QUEUE_DEPTH.labels(name).set_function(queue.qsize)
+
+        self._fetch_slots = asyncio.Semaphore(INGEST_MAX_CONCURRENCY)
+        self._fetch_tasks = [
+            asyncio.create_task(self._fetch_loop(a), name=f"pipeline-fetch-{account_key(a)}")
+            for a in self.accounts
+        ]
+        self._tasks = [
+            asyncio.create_task(self._parse_loop(), name="pipeline-parse"),
+            asyncio.create_task(self._classify_loop(), name="pipeline-classify"),
+            asyncio.create_task(self._deliver_loop(), name="pipeline-deliver"),
+        ]
+        logger.info(
+            f"🚀 Pipeline de ingestão iniciado (modo: {self.mode}, {len(self.accounts)} contas, "
+            f"shard {SHARD_INDEX + 1}/{SHARD_COUNT})"
+        )
+
+    async def stop(self):
+        """
+        Para de buscar, espera as filas esvaziarem (até o timeout) e encerra
+        as etapas. O que já chegou à outbox fica em disco.
+        """
+        self._stop.set()
+        if not self.stages:
+            return
+        for task in self._fetch_tasks:
+            task.cancel()
+        await asyncio.gather(*self._fetch_tasks, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(self._drain(), PIPELINE_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️  Pipeline encerrado com itens ainda nas filas")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        for executor in self._imap_executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._io_executor.shutdown(wait=True)
+        if self._classify_executor:
+            self._classify_executor.shutdown(wait=True)
+        await asyncio.get_running_loop().run_in_executor(None, session_pool.close_all)
+        self._arrivals.save()
+        logger.info("⛔ Pipeline de ingestão encerrado")
+
+    async def _drain(self):
+        for queue in (self.parse_queue, self.classify_queue, self.deliver_queue):
+            await queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidade das filas e latência por etapa"""
+        return {
+            "mode": self.mode,
+            "last_poll_at": self.last_poll_at,
+            "accounts": {
+                key: {**stats, "scheduler": self.schedulers[key].stats()}
+                for key, stats in self.account_stats.items()
+            },
+            "stages": {name: stage.as_dict() for name, stage in self.stages.items()},
+            "imap": session_pool.stats(),
+            "dedup": self.dedup.stats() if self.dedup else None,
+            "raw_cache": self.raw_cache.stats() if self.raw_cache else None,
+            "flag_sync": self.flag_sync.stats() if self.flag_sync else None,
+        }
+
+    # --- Etapas ---
+
+    async def _run(self, executor: Executor, fn, *args):
+        if isinstance(executor, ThreadPoolExecutor):
+            # Leva o contexto (span atual) para a thread: spans lá dentro ficam como filhos
+            fn = functools.partial(contextvars.copy_context().run, fn)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    async def _take_batch(self, queue: asyncio.Queue) -> List[Any]:
+        """Espera o primeiro item e junta os que já estão na fila (até o lote)"""
+        batch = [await queue.get()]
+        while len(batch) < PIPELINE_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        return batch
+
+    def _fetch_once(self, account: AccountConfig, since_seq: Optional[int]) -> List[RawEmail]:
+        if self.flag_sync:
+            # Mesma sessão e mesma thread da busca: as entregues já saem do UNSEEN
+            self.flag_sync.flush(account)
+        if SYNC_MODE == "uid":
+            # Incremental por UID: já retorna apenas o que chegou desde o último ciclo
+            return fetch_new_emails(raw=True, account=account, hold=True)
+        return fetch_unread_emails(
+            max_results=MAX_RESULTS_PER_POLL, unread_only=True, since_seq=since_seq, raw=True,
+            account=account, exclude_label=self.flag_sync.exclude_label if self.flag_sync else None,
+            # Sem a sincronização de flags, o próprio FETCH marca como lida
+            peek=self.flag_sync is not None,
+        )
+
+    def _settle_uids(self, items: List[Any], done: bool):
+        """
+        Sincronização por UID: conclui (done) os UIDs dos itens, liberando a
+        marca d'água persistida, ou os devolve para a próxima busca
+        """
+        if SYNC_MODE != "uid":
+            return
+        groups: Dict[tuple, List[int]] = {}
+        for item in items:
+            key = self._state_keys.get(item.get("account") or "")
+            uid, uidvalidity = item.get("uid"), item.get("uidvalidity")
+            if key and uid and uidvalidity:
+                groups.setdefault((key, uidvalidity), []).append(uid)
+        settle = sync_state.complete if done else sync_state.release
+        for (key, uidvalidity), uids in groups.items():
+            settle(key, uidvalidity, uids)
+
+    def _wait_idle(self, account: AccountConfig) -> Any:
+        """
+        Bloqueia em IMAP IDLE até chegar mensagem nova
+
+        Returns:
+            Número de sequência a partir do qual buscar, None se expirou, ou
+            IDLE_UNSUPPORTED se o servidor não suporta IDLE (sem esperar)
+        """
+        with session_pool.session(account) as gmail:
+            if gmail is None:
+                self._stop.wait(POLL_INTERVAL_SECONDS)
+                return None
+            if not gmail.supports_idle():
+                return IDLE_UNSUPPORTED
+            known = gmail.select_inbox()
+            exists = gmail.idle(IDLE_TIMEOUT_SECONDS, stop=self._stop)
+        # "n:*" inclui a última mensagem mesmo se houve EXPUNGE no meio
+        return known + 1 if exists is not None else None
+
+    async def _fetch_loop(self, account: AccountConfig):
+        key = account_key(account)
+        executor = self._imap_executors[key]
+        stats = self.account_stats[key]
+        scheduler = self.schedulers[key]
+        since_seq = None
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                async with self._fetch_slots:
+                    with span("poll", account=key) as current:
+                        raws = await self._run(executor, self._fetch_once, account, since_seq)
+                        current["items"] = len(raws)
+                self.stages["fetch"].record(len(raws), time.perf_counter() - started)
+                self.last_poll_at = stats["last_poll_at"] = time.time()
+                stats["fetched"] += len(raws)
+                EMAILS_FETCHED.labels(key).inc(len(raws))
+                LAST_POLL.labels(key).set(self.last_poll_at)
+                delay = scheduler.record(len(raws))
+            except Exception as ex:
+                self.stages["fetch"].errors += 1
+                stats["errors"] += 1
+                logger.error(f"❌ Falha na busca de emails ({key}): {ex}")
+                raws = []
+                delay = scheduler.record_error()
+            POLL_INTERVAL.labels(key).set(delay)
+            for raw in raws:
+                await self.parse_queue.put(raw)  # bloqueia se parse estiver atrasado
+
+            since_seq = None
+            if stats["mode"] == "idle" and not scheduler.errors:
+                try:
+                    woke = await self._run(executor, self._wait_idle, account)
+                except (imaplib.IMAP4.error, OSError) as ex:
+                    # A sessão é revalidada (NOOP) e reconectada pelo pool
+                    logger.warning(f"⚠️  IDLE interrompido ({key}): {ex}")
+                    continue
+                if woke is not IDLE_UNSUPPORTED:
+                    since_seq = woke
+                    continue
+                logger.warning(f"⚠️  Servidor não suporta IDLE ({key}), usando polling")
+                stats["mode"] = "poll"
+            await asyncio.sleep(delay)
+
+    async def _parse_loop(self):
+        while True:
+            batch = await self._take_batch(self.parse_queue)
+            started = time.perf_counter()
+            try:
+                fresh = [r for r in batch if not r.get("reprocess")]
+                if self.raw_cache and fresh:
+                    try:
+                        await self._run(self._io_executor, self.raw_cache.put_many, fresh)
+                    except Exception as ex:
+                        logger.error(f"❌ Falha ao gravar no cache de mensagens: {ex}")
+                with span("parse", items=len(batch)):
+                    parsed = await self._run(
+                        self._io_executor,
+                        lambda: [(r.get("reprocess"), GmailIMAPReader.parse_raw(r)) for r in batch],
+                    )
+                    emails = [e for again, e in parsed if e and not again]
+                    # Ilegíveis e duplicados não seguem: a busca não precisa repeti-los
+                    settled = [r for r, (again, e) in zip(batch, parsed) if not again and not e]
+                    if self.dedup:
+                        # Duplicados saem aqui: não são classificados nem enviados
+                        fresh_emails = await self._run(self._io_executor, self.dedup.filter_new, emails)
+                        if len(fresh_emails) < len(emails):
+                            kept = set(map(id, fresh_emails))
+                            duplicates = [e for e in emails if id(e) not in kept]
+                            settled += duplicates
+                            if self.flag_sync:
+                                # Já entregues antes: marcar também, senão voltam em toda busca por não lidas
+                                self.flag_sync.add(duplicates)
+                        emails = fresh_emails
+                    if settled:
+                        await self._run(self._io_executor, self._settle_uids, settled, True)
+                    # Reprocessamento (cache local): já vistos de propósito, sem deduplicação
+                    emails += [e for again, e in parsed if e and again]
+                self.stages["parse"].record(len(batch), time.perf_counter() - started)
+                for e in emails:
+                    await self.classify_queue.put(e)
+            except Exception as ex:
+                self.stages["parse"].errors += 1
+                logger.error(f"❌ Falha ao decodificar emails: {ex}")
+                self._settle_uids([r for r in batch if not r.get("reprocess")], False)
+            finally:
+                for _ in batch:
+                    self.parse_queue.task_done()
+
+    async def _classify_loop(self):
+        while True:
+            batch = await self._take_batch(self.classify_queue)
+            started = time.perf_counter()
+            try:
+                texts = [(e.get("subject", ""), e.get("snippet", "")) for e in batch]
+                with span("classify", items=len(batch)):
+                    rule_version, categorias = await self._run(self._classify_executor, classify_texts, texts)
+                self.stages["classify"].record(len(batch), time.perf_counter() - started)
+                logger.info(f"📂 {len(batch)} emails classificados")
+                for email, categoria in zip(batch, categorias):
+                    email["categoria"] = categoria
+                    email["rule_version"] = rule_version
+                    EMAILS_CLASSIFIED.labels(categoria).inc()
+                    if self.on_classified:
+                        self.on_classified(email)
+                    await self.deliver_queue.put(email)
+            except Exception as ex:
+                self.stages["classify"].errors += 1
+                logger.error(f"❌ Falha ao classificar emails: {ex}")
+                if self.dedup:
+                    self.dedup.release(batch)
+                self._settle_uids(batch, False)
+            finally:
+                for _ in batch:
+                    self.classify_queue.task_done()
+
+    async def _deliver_loop(self):
+        while True:
+            batch = await self._take_batch(self.deliver_queue)
+            started = time.perf_counter()
+            try:
+                with span("deliver", items=len(batch)):
+                    if self.store:
+                        await self._run(self._io_executor, self.store.add_many, batch)
+                    delivered = await self._run(self._io_executor, self.outbox.enqueue, batch)
+                if delivered:
+                    self.stages["deliver"].record(len(batch), time.perf_counter() - started)
+                else:
+                    self.stages["deliver"].errors += 1
+                    FAILURES.labels("deliver").inc()
+                    logger.error(f"❌ {len(batch)} emails não couberam na outbox")
+            except Exception as ex:
+                delivered = False
+                self.stages["deliver"].errors += 1
+                logger.error(f"❌ Falha ao gravar na outbox: {ex}")
+            try:
+                # Na outbox a entrega é garantida: a marca d'água pode passar
+                # destes UIDs; se não couberam, a próxima busca os repete
+                await self._run(self._io_executor, self._settle_uids, batch, bool(delivered))
+                if self.dedup:
+                    # Na outbox a entrega é garantida: a partir daqui conta como visto
+                    update = self.dedup.remember if delivered else self.dedup.release
+                    await self._run(self._io_executor, update, batch)
+            except Exception as ex:
+                logger.error(f"❌ Falha ao registrar emails processados: {ex}")
+            finally:
+                for _ in batch:
+                    self.deliver_queue.task_done()
+
+    # --- Reprocessamento ---
+
+    async def reprocess_from_cache(
+        self,
+        account: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        """
+        Reenvia as mensagens do cache local pelo caminho parse → classify →
+        deliver, sem acessar o IMAP (ex.: após mudar palavras-chave ou a
+        extração do corpo). O armazenamento local e a API recebem os emails
+        de novo, com a nova categoria.
+
+        Args:
+            account: só as mensagens desta conta
+            since: só as gravadas no cache a partir deste timestamp
+            limit: máximo de mensagens
+
+        Returns:
+            Quantidade de mensagens colocadas no pipeline
+        """
+        if self.raw_cache is None:
+            raise RuntimeError("Cache de mensagens desativado (RAW_CACHE_ENABLED)")
+        if self.reprocess_status.get("running"):
+            raise RuntimeError("Reprocessamento já em andamento")
+
+        status = self.reprocess_status = {
+            "running": True, "queued": 0, "started_at": time.time(), "finished_at": None,
+        }
+        iterator = self.raw_cache.iter_raw(account=account, since=since, limit=limit)
+        logger.info("♻️  Reprocessando mensagens do cache local")
+        try:
+            while not self._stop.is_set():
+                raws = await self._run(
+                    self._io_executor, lambda: list(itertools.islice(iterator, PIPELINE_BATCH_SIZE))
+                )
+                if not raws:
+                    break
+                for raw in raws:
+                    raw["reprocess"] = True
+                    await self.parse_queue.put(raw)  # backpressure: segue o ritmo do pipeline
+                status["queued"] += len(raws)
+        finally:
+            status["running"] = False
+            status["finished_at"] = time.time()
+        logger.info(f"♻️  Reprocessamento: {status['queued']} mensagens reenviadas ao pipeline")
+        return status["queued"]
@@ -0,0 +1,315 @@
+"""
+Cache local das mensagens brutas baixadas do IMAP
+Guarda o que o fetch trouxe (RawEmail: o início da mensagem RFC 822 ou
+headers + parte de texto) para reprocessar o histórico (novas palavras-chave,
+nova extração de corpo) sem baixar tudo do Gmail de novo.
+
+Os registros são acrescentados a segmentos (arquivos só de acréscimo, até
+RAW_CACHE_SEGMENT_MB cada), comprimidos um a um com zlib, e indexados em
+SQLite por conta, UIDVALIDITY e UID. A leitura usa mmap: um reprocessamento
+percorre os segmentos direto do page cache, em ordem de gravação. Acima de
+RAW_CACHE_MAX_MB, os segmentos mais antigos são descartados inteiros.
+"""
+
+# Importações padrão do Python
+import os
+import mmap
+import zlib
+import json
+import time
+import struct
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Importações de arquivos internos
+from app.models.RawEmail import RawEmail
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+RAW_CACHE_ENABLED = os.getenv("RAW_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+RAW_CACHE_DIR = os.getenv("RAW_CACHE_DIR", "raw_cache")
+# Espaço máximo em disco (os segmentos mais antigos são descartados)
+RAW_CACHE_MAX_MB = int(os.getenv("RAW_CACHE_MAX_MB", "1024"))
+RAW_CACHE_SEGMENT_MB = int(os.getenv("RAW_CACHE_SEGMENT_MB", "64"))
+RAW_CACHE_COMPRESSION_LEVEL = int(os.getenv("RAW_CACHE_COMPRESSION_LEVEL", "6"))
+
+# Campos binários do RawEmail; os demais vão no cabeçalho JSON do registro
+_BYTES_FIELDS = ("rfc822", "headers", "body")
+# Registro no segmento: tamanho do cabeçalho JSON (uint32) + cabeçalho + campos binários
+_HEADER_LEN = struct.Struct("<I")
+
+RAW_CACHE_WRITES = Counter("raw_cache_writes_total", "Mensagens gravadas no cache local")
+RAW_CACHE_READS = Counter("raw_cache_reads_total", "Mensagens lidas do cache local (reprocessamento)")
+RAW_CACHE_BYTES = Gauge("raw_cache_bytes", "Espaço em disco ocupado pelo cache de mensagens brutas")
+
+
+def encode_raw(raw: RawEmail) -> bytes:
+    """RawEmail -> bytes (antes da compressão)"""
+    header: Dict[str, Any] = {k: v for k, v in raw.items() if k not in _BYTES_FIELDS}
+    blobs = [(k, raw[k]) for k in _BYTES_FIELDS if isinstance(raw.get(k), bytes)]
+    header["_sizes"] = [[k, len(v)] for k, v in blobs]
+    encoded = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"".join([_HEADER_LEN.pack(len(encoded)), encoded] + [v for _, v in blobs])
+
+
+def decode_raw(data: bytes) -> RawEmail:
+    (size,) = _HEADER_LEN.unpack_from(data)
+    header = json.loads(data[_HEADER_LEN.size:_HEADER_LEN.size + size])
+    offset = _HEADER_LEN.size + size
+    for key, length in header.pop("_sizes"):
+        header[key] = bytes(data[offset:offset + length])
+        offset += length
+    return header
+
+
+class RawMessageCache:
+    """
+    Mensagens brutas em segmentos só de acréscimo, com índice SQLite
+
+    Args:
+        path: diretório do cache (segmentos seg-NNNNNN.dat e index.db)
+        max_bytes: espaço máximo somando os segmentos
+        segment_bytes: tamanho a partir do qual um novo segmento é aberto
+    """
+
+    def __init__(
+        self,
+        path: str = RAW_CACHE_DIR,
+        max_bytes: int = RAW_CACHE_MAX_MB * 1024 * 1024,
+        segment_bytes: int = RAW_CACHE_SEGMENT_MB * 1024 * 1024,
+        level: int = RAW_CACHE_COMPRESSION_LEVEL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = max(1024 * 1024, min(segment_bytes, max_bytes))
+        self.level = level
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (account, uidvalidity, uid)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS messages_by_position ON messages (segment, offset);
+        """)
+
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._segments: Dict[int, int] = self._scan_segments()
+        self._active = max(self._segments, default=0) or self._new_segment()
+        self._file = open(self._segment_path(self._active), "ab")
+        self._truncate_active()
+
+        self.evicted_segments = 0
+        RAW_CACHE_BYTES.set_function(self.size_bytes)
+
+    # --- Segmentos ---
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"seg-{segment:06d}.dat")
+
+    def _scan_segments(self) -> Dict[int, int]:
+        segments = {}
+        for name in os.listdir(self.path):
+            if name.startswith("seg-") and name.endswith(".dat"):
+                segment = int(name[4:-4])
+                segments[segment] = os.path.getsize(os.path.join(self.path, name))
+        return segments
+
+    def _new_segment(self) -> int:
+        segment = max(self._segments, default=0) + 1
+        open(self._segment_path(segment), "ab").close()
+        self._segments[segment] = 0
+        return segment
+
+    def _truncate_active(self):
+        """Descarta bytes além do último registro indexado (gravação interrompida)"""
+        (end,) = self._db.execute(
+            "SELECT MAX(offset + length) FROM messages WHERE segment = ?", (self._active,)
+        ).fetchone()
+        end = end or 0
+        if self._segments[self._active] > end:
+            self._file.truncate(end)
+            self._segments[self._active] = end
+
+    def _roll(self):
+        """Fecha o segmento ativo, abre o próximo e descarta os antigos acima do limite"""
+        self._file.close()
+        self._active = self._new_segment()
+        self._file = open(self._segment_path(self._active), "ab")
+        while self.size_bytes() > self.max_bytes and len(self._segments) > 1:
+            self._evict(min(self._segments))
+
+    def _evict(self, segment: int):
+        self._db.execute("DELETE FROM messages WHERE segment = ?", (segment,))
+        mapped = self._maps.pop(segment, None)
+        if mapped is not None:
+            mapped.close()
+        os.remove(self._segment_path(segment))
+        del self._segments[segment]
+        self.evicted_segments += 1
+        logger.info(f"🗑️  Cache de mensagens: segmento {segment} descartado (limite {self.max_bytes} bytes)")
+
+    def _map(self, segment: int, end: int) -> mmap.mmap:
+        """mmap do segmento, refeito se o segmento cresceu além do mapeado"""
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), "rb") as f:
+                mapped = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped
+
+    # --- Gravação e leitura ---
+
+    def put_many(self, raws: List[RawEmail]) -> int:
+        """
+        Grava as mensagens que têm uid e uidvalidity (as já presentes são ignoradas)
+
+        Returns:
+            Quantidade de mensagens novas gravadas
+        """
+        keyed = [
+            (r.get("account") or "", r["uidvalidity"], r["uid"], r) for r in raws
+            if r.get("uid") is not None and r.get("uidvalidity") is not None
+        ]
+        if not keyed:
+            return 0
+        with self._lock:
+            existing = set()
+            for account, uidvalidity, uid, _ in keyed:
+                if self._db.execute(
+                    "SELECT 1 FROM messages WHERE account = ? AND uidvalidity = ? AND uid = ?",
+                    (account, uidvalidity, uid),
+                ).fetchone():
+                    existing.add((account, uidvalidity, uid))
+
+            rows = []
+            written = 0
+            now = time.time()
+            for account, uidvalidity, uid, raw in keyed:
+                if (account, uidvalidity, uid) in existing:
+                    continue
+                existing.add((account, uidvalidity, uid))
+                if self._segments[self._active] >= self.segment_bytes:
+                    # Índice antes do novo segmento: o descarte apaga linhas do índice
+                    self._insert(rows)
+                    rows = []
+                    self._roll()
+                plain = encode_raw(raw)
+                data = zlib.compress(plain, self.level)
+                offset = self._segments[self._active]
+                self._file.write(data)
+                self._segments[self._active] += len(data)
+                rows.append((account, uidvalidity, uid, self._active, offset, len(data), len(plain), now))
+                written += 1
+            self._insert(rows)
+        return written
+
+    def _insert(self, rows: List[Tuple]):
+        """Índice só depois dos bytes no disco (chamar com o lock)"""
+        if not rows:
+            return
+        self._file.flush()
+        self._db.execute("BEGIN")
+        self._db.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._db.execute("COMMIT")
+        RAW_CACHE_WRITES.inc(len(rows))
+
+    def _read(self, segment: int, offset: int, length: int) -> RawEmail:
+        mapped = self._map(segment, offset + length)
+        return decode_raw(zlib.decompress(mapped[offset:offset + length]))
+
+    def get(self, account: str, uidvalidity: int, uid: int) -> Optional[RawEmail]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT segment, offset, length FROM messages WHERE account = ? AND uidvalidity = ? AND uid = ?",
+                (account, uidvalidity, uid),
+            ).fetchone()
+            if row is None:
+                return None
+            return self._read(*row)
+
+    def iter_raw(
+        self,
+        account: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: Optional[int] = None,
+        batch: int = 500,
+    ) -> Iterator[RawEmail]:
+        """
+        Percorre as mensagens em ordem de gravação (leitura sequencial dos segmentos)
+
+        Args:
+            account: só as mensagens desta conta
+            since: só as gravadas a partir deste timestamp
+            limit: máximo de mensagens
+        """
+        where, params = ["(segment > ? OR (segment = ? AND offset > ?))"], []
+        if account is not None:
+            where.append("account = ?")
+            params.append(account)
+        if since is not None:
+            where.append("stored_at >= ?")
+            params.append(since)
+        sql = (
+            "SELECT segment, offset, length FROM messages WHERE " + " AND ".join(where) +
+            " ORDER BY segment, offset LIMIT ?"
+        )
+        position = (0, -1)
+        remaining = limit if limit else None
+        while remaining is None or remaining > 0:
+            size = batch if remaining is None else min(batch, remaining)
+            with self._lock:
+                rows = self._db.execute(sql, [position[0], position[0], position[1], *params, size]).fetchall()
+                raws = []
+                for segment, offset, length in rows:
+                    try:
+                        raws.append(self._read(segment, offset, length))
+                    except (OSError, ValueError, zlib.error) as e:
+                        logger.warning(f"⚠️  Registro ilegível no cache (segmento {segment}, {offset}): {e}")
+            if not rows:
+                return
+            position = rows[-1][:2]
+            RAW_CACHE_READS.inc(len(raws))
+            if remaining is not None:
+                remaining -= len(rows)
+            yield from raws
+
+    # --- Estado ---
+
+    def size_bytes(self) -> int:
+        return sum(self._segments.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count, raw_size) = self._db.execute("SELECT COUNT(*), SUM(raw_size) FROM messages").fetchone()
+        size = self.size_bytes()
+        return {
+            "messages": count,
+            "segments": len(self._segments),
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "compression_ratio": round((raw_size or 0) / size, 2) if size else None,
+            "evicted_segments": self.evicted_segments,
+        }
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._db.close()
@@ -0,0 +1,176 @@
+"""
+Reclassificação incremental dos emails armazenados após mudança nas regras
+
+Quando o arquivo de regras muda, só os emails que contêm alguma palavra-chave
+adicionada, removida ou alterada (ver changed_keywords) podem mudar de
+categoria. Esses emails são encontrados pelo índice FTS5 do armazenamento
+(índice invertido por token, sobre o corpo inteiro) e reclassificados em
+lotes; os demais só têm a versão das regras atualizada, sem reler o texto.
+Os que não dá para descartar pelo índice (prévia cortada sem o corpo
+inteiro guardado, ou gravados durante a reclassificação) são reclassificados
+com o texto que houver.
+
+Emails de uma versão cujas regras não foram guardadas (ex.: gravados antes
+da coluna rule_version) são todos reclassificados, uma única vez.
+"""
+
+# Importações padrão do Python
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+# Importações de arquivos internos
+from app.config.rules import changed_keywords, known_rules, load_rules
+from app.models.ClassificationRules import ClassificationRules
+from app.services.EmailClassifer import EmailClassifier
+from app.services.email_store import EmailStore
+from app.utils.metrics import Counter, FAILURES
+
+logger = logging.getLogger(__name__)
+
+RECLASSIFY_ENABLED = os.getenv("RECLASSIFY_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# Intervalo entre verificações de emails com regras antigas
+RECLASSIFY_INTERVAL_SECONDS = float(os.getenv("RECLASSIFY_INTERVAL_SECONDS", "30"))
+RECLASSIFY_BATCH_SIZE = int(os.getenv("RECLASSIFY_BATCH_SIZE", "500"))
+
+EMAILS_RECLASSIFIED = Counter(
+    "emails_reclassified_total", "Emails reclassificados após mudança nas regras", ["result"]
+)
+
+
+class RuleReclassifier:
+    """
+    Mantém as categorias do armazenamento em dia com as regras atuais, em
+    segundo plano
+
+    Args:
+        store: armazenamento local dos emails classificados
+        interval_seconds: espera entre verificações
+        batch_size: emails reclassificados por transação
+        rules_path: arquivo de regras (padrão: CLASSIFIER_RULES_FILE)
+    """
+
+    def __init__(
+        self,
+        store: EmailStore,
+        interval_seconds: float = RECLASSIFY_INTERVAL_SECONDS,
+        batch_size: int = RECLASSIFY_BATCH_SIZE,
+        rules_path: Optional[str] = None,
+    ):
+        self.store = store
+        self.rules_path = rules_path
+        self.interval_seconds = interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.last_run: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rule-reclassifier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as ex:
+                FAILURES.labels("reclassify").inc()
+                logger.error(f"❌ Falha na reclassificação: {ex}")
+            self._stop.wait(self.interval_seconds)
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Leva os emails de todas as versões antigas para as regras atuais
+
+        Returns:
+            Resumo: versão atual, emails verificados, reclassificados (com
+            categoria alterada) e apenas remarcados com a versão nova
+        """
+        rules = load_rules(self.rules_path)
+        for known in known_rules().values():
+            self.store.register_rules(known)
+
+        summary = {"version": rules["version"], "checked": 0, "changed": 0, "restamped": 0, "versions": []}
+        outdated = self.store.outdated_rule_versions(rules["version"])
+        if not outdated:
+            return summary
+
+        classifier = EmailClassifier(rules=rules)
+        started = time.perf_counter()
+        for version in outdated:
+            if self._stop.is_set():
+                break
+            self._upgrade(version, rules, classifier, summary)
+            summary["versions"].append(version or "<desconhecida>")
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        summary["finished_at"] = time.time()
+        self.last_run = summary
+        logger.info(
+            f"🏷️  Reclassificação para as regras {rules['version']}: {summary['checked']} emails verificados, "
+            f"{summary['changed']} mudaram de categoria, {summary['restamped']} só remarcados"
+        )
+        return summary
+
+    def _upgrade(
+        self,
+        version: str,
+        rules: ClassificationRules,
+        classifier: EmailClassifier,
+        summary: Dict[str, Any],
+    ):
+        """Reclassifica os emails de uma versão antiga afetados pela mudança"""
+        old = self.store.get_rules(version) if version else None
+        keywords = sorted(changed_keywords(old, rules)) if old is not None else None
+        if keywords is None:
+            logger.warning(
+                f"⚠️  Regras da versão {version or '<desconhecida>'} indisponíveis: "
+                f"reclassificando todos os emails dela"
+            )
+
+        started_at = time.time()
+        self._reclassify(version, keywords, rules, classifier, summary)
+
+        if not self._stop.is_set() and keywords is not None:
+            # Os que sobraram não contêm nenhuma palavra-chave alterada: mesma categoria
+            restamped = self.store.restamp(version, rules["version"], stored_before=started_at)
+            summary["restamped"] += restamped
+            EMAILS_RECLASSIFIED.labels("restamped").inc(restamped)
+            # Restantes que o índice não cobre: reclassificados um a um
+            self._reclassify(version, None, rules, classifier, summary)
+
+    def _reclassify(
+        self,
+        version: str,
+        keywords: Optional[List[str]],
+        rules: ClassificationRules,
+        classifier: EmailClassifier,
+        summary: Dict[str, Any],
+    ):
+        """Reclassifica, em lotes, os candidatos de uma versão (ver candidates_for_reclassify)"""
+        after = -1
+        while not self._stop.is_set():
+            rows = self.store.candidates_for_reclassify(version, keywords, after, self.batch_size)
+            if not rows:
+                break
+            categorias = classifier.classify_batch([(r["subject"], r["full_text"] or r["snippet"]) for r in rows])
+            self.store.set_categories(
+                [(r["sort_key"], categoria) for r, categoria in zip(rows, categorias)], rules["version"]
+            )
+            changed = sum(1 for r, categoria in zip(rows, categorias) if r["categoria"] != categoria)
+            summary["checked"] += len(rows)
+            summary["changed"] += changed
+            EMAILS_RECLASSIFIED.labels("changed").inc(changed)
+            EMAILS_RECLASSIFIED.labels("unchanged").inc(len(rows) - changed)
+            after = rows[-1]["sort_key"]
+
+    def status(self) -> Dict[str, Any]:
+        return {"running": bool(self._thread and self._thread.is_alive()), "last_run": self.last_run or None}
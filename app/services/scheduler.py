@@ -0,0 +1,205 @@
+"""
+Agendador adaptativo do polling IMAP
+O intervalo entre buscas varia entre POLL_MIN_SECONDS e POLL_MAX_SECONDS
+conforme a taxa de chegada de emails: uma média móvel exponencial (EWMA)
+da taxa recente e o histórico por hora da semana (matrículas de manhã,
+silêncio de madrugada). Em erros do servidor, recua exponencialmente.
+Cada decisão fica registrada para consulta (GET /pipeline).
+"""
+
+# Importações padrão do Python
+import os
+import json
+import math
+import time
+import random
+import threading
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Importações de arquivos internos
+from app.utils.helpers import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+POLL_ADAPTIVE = os.getenv("POLL_ADAPTIVE", "true").strip().lower() in ("1", "true", "yes")
+POLL_MIN_SECONDS = float(os.getenv("POLL_MIN_SECONDS", "15"))
+# Teto do intervalo em períodos calmos (CHECK_EMAILS_INTERVAL_MINUTES)
+POLL_MAX_SECONDS = float(os.getenv("POLL_MAX_SECONDS", "0")) or \
+    float(os.getenv("CHECK_EMAILS_INTERVAL_MINUTES", "5")) * 60
+# Emails esperados por busca: intervalo = alvo / taxa estimada
+POLL_TARGET_ARRIVALS = float(os.getenv("POLL_TARGET_ARRIVALS", "0.5"))
+# Meia-vida da média móvel da taxa de chegada
+POLL_RATE_HALFLIFE_SECONDS = float(os.getenv("POLL_RATE_HALFLIFE_SECONDS", "1800"))
+# Teto do recuo após erros consecutivos
+POLL_ERROR_MAX_SECONDS = float(os.getenv("POLL_ERROR_MAX_SECONDS", "900"))
+SCHEDULER_STATE_FILE = os.getenv("SCHEDULER_STATE_FILE", "scheduler_state.json")
+
+# Uma faixa por hora da semana (segunda 00h = 0)
+_BUCKETS = 7 * 24
+# Peso de uma hora de observação no histórico da faixa (buscas curtas pesam menos,
+# então rajadas com polling frequente não dominam a faixa)
+_HISTORY_ALPHA = 0.2
+# Intervalo mínimo entre gravações do histórico
+_SAVE_EVERY_SECONDS = 300
+
+
+def hour_of_week(at: Optional[float] = None) -> int:
+    t = time.localtime(at)
+    return t.tm_wday * 24 + t.tm_hour
+
+
+class ArrivalHistoryStore:
+    """Taxa de chegada (emails/s) por hora da semana, por conta, em JSON"""
+
+    def __init__(self, path: str = SCHEDULER_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._history: Dict[str, List[float]] = self._load()
+
+    def _load(self) -> Dict[str, List[float]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {k: v for k, v in data.items() if isinstance(v, list) and len(v) == _BUCKETS}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Histórico do agendador ilegível ({self.path}), recomeçando: {e}")
+            return {}
+
+    def get(self, key: str) -> List[float]:
+        with self._lock:
+            return self._history.setdefault(key, [0.0] * _BUCKETS)
+
+    def observe(self, key: str, bucket: int, rate: float, seconds: float):
+        """
+        Atualiza a faixa com a taxa observada durante `seconds` segundos
+        e grava no máximo a cada 5 min
+        """
+        weight = _HISTORY_ALPHA * min(1.0, seconds / 3600)
+        with self._lock:
+            buckets = self._history.setdefault(key, [0.0] * _BUCKETS)
+            buckets[bucket] += weight * (rate - buckets[bucket])
+            now = time.monotonic()
+            if now - self._last_save >= _SAVE_EVERY_SECONDS:
+                self._last_save = now
+                write_json_atomic(self.path, self._history)
+
+    def save(self):
+        with self._lock:
+            write_json_atomic(self.path, self._history)
+
+
+class AdaptivePollScheduler:
+    """
+    Decide quanto esperar até a próxima busca de uma conta
+
+    Args:
+        key: identificador da conta (histórico separado por conta)
+        history: histórico por hora da semana (compartilhado entre contas)
+        min_seconds / max_seconds: limites do intervalo
+        adaptive: se False, usa sempre fixed_seconds
+        fixed_seconds: intervalo quando não adaptativo
+    """
+
+    def __init__(
+        self,
+        key: str,
+        history: Optional[ArrivalHistoryStore] = None,
+        min_seconds: float = POLL_MIN_SECONDS,
+        max_seconds: float = POLL_MAX_SECONDS,
+        adaptive: bool = POLL_ADAPTIVE,
+        fixed_seconds: float = 60,
+    ):
+        self.key = key
+        self.history = history
+        self.min_seconds = min_seconds
+        self.max_seconds = max(min_seconds, max_seconds)
+        self.adaptive = adaptive
+        self.fixed_seconds = fixed_seconds
+
+        self.rate = 0.0  # emails/s (EWMA)
+        self.errors = 0  # erros consecutivos
+        self.interval = fixed_seconds if not adaptive else self.max_seconds
+        self._last_poll: Optional[float] = None
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=50)
+
+    def _decide(self, interval: float, reason: str, fetched: int, expected: float,
+                at: Optional[float] = None) -> float:
+        previous = self.interval
+        self.interval = interval
+        decision = {
+            "at": time.time() if at is None else at,
+            "fetched": fetched,
+            "rate_per_hour": round(self.rate * 3600, 2),
+            "expected_per_hour": round(expected * 3600, 2),
+            "interval_seconds": round(interval, 1),
+            "reason": reason,
+        }
+        self.decisions.append(decision)
+        if abs(interval - previous) >= max(1.0, 0.1 * previous):
+            logger.info(
+                f"⏲️  Polling {self.key or 'padrão'}: {previous:.0f}s → {interval:.0f}s ({reason}, "
+                f"{decision['expected_per_hour']} emails/h esperados)"
+            )
+        return interval
+
+    def record(self, fetched: int, now: Optional[float] = None) -> float:
+        """
+        Registra o resultado de uma busca bem-sucedida
+
+        Returns:
+            Segundos até a próxima busca
+        """
+        now = time.time() if now is None else now
+        self.errors = 0
+        if not self.adaptive:
+            return self._decide(self.fixed_seconds, "fixo", fetched, 0.0, now)
+
+        if self._last_poll is None:
+            # Primeira busca: o que veio acumulou por tempo desconhecido
+            elapsed = None
+        else:
+            elapsed = max(1.0, now - self._last_poll)
+        self._last_poll = now
+
+        bucket = hour_of_week(now)
+        if elapsed is not None:
+            observed = fetched / elapsed
+            alpha = 1 - math.exp(-elapsed * math.log(2) / POLL_RATE_HALFLIFE_SECONDS)
+            self.rate += alpha * (observed - self.rate)
+            if self.history:
+                self.history.observe(self.key, bucket, observed, elapsed)
+
+        typical = self.history.get(self.key)[bucket] if self.history else 0.0
+        expected = max(self.rate, typical)
+        if fetched and elapsed is not None:
+            # Rajada em curso: a próxima busca vem logo
+            interval, reason = self.min_seconds, "rajada"
+        elif expected > 0:
+            interval = POLL_TARGET_ARRIVALS / expected
+            reason = "histórico" if typical > self.rate else "taxa recente"
+        else:
+            interval, reason = self.max_seconds, "sem movimento"
+        interval = min(self.max_seconds, max(self.min_seconds, interval))
+        return self._decide(interval, reason, fetched, expected, now)
+
+    def record_error(self) -> float:
+        """Registra uma falha do servidor; o intervalo dobra a cada erro seguido (com jitter)"""
+        self.errors += 1
+        base = self.fixed_seconds if not self.adaptive else self.min_seconds
+        delay = min(POLL_ERROR_MAX_SECONDS, base * (2 ** self.errors))
+        delay *= random.uniform(0.75, 1.0)
+        return self._decide(delay, f"erro ({self.errors} seguidos)", 0, self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "adaptive": self.adaptive,
+            "interval_seconds": round(self.interval, 1),
+            "rate_per_hour": round(self.rate * 3600, 2),
+            "consecutive_errors": self.errors,
+            "decisions": list(self.decisions)[-10:],
+        }
@@ -0,0 +1,127 @@
+"""
+Estado da sincronização incremental por UID
+Guarda, por conta/caixa, o UIDVALIDITY e o último UID processado
+
+Com begin/complete/release, a marca d'água persistida só passa de um UID
+depois que a mensagem foi processada (ex.: gravada na outbox). Enquanto
+isso, um cursor em memória evita buscar de novo as mensagens em
+processamento; se o processo cair, a próxima execução recomeça da marca
+persistida e busca de novo o que não foi concluído.
+"""
+
+# Importações padrão do Python
+import os
+import json
+import threading
+import logging
+from typing import Dict, Iterable, Optional, TypedDict
+
+# Importações de arquivos internos
+from app.utils.helpers import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+SYNC_STATE_FILE = os.getenv("SYNC_STATE_FILE", "sync_state.json")
+
+
+class SyncState(TypedDict):
+    """Marca d'água de uma caixa de correio"""
+    uidvalidity: int
+    last_uid: int
+
+
+class SyncStateStore:
+    """Armazena o estado de sincronização em um arquivo JSON local"""
+
+    def __init__(self, path: str = SYNC_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._states: Dict[str, SyncState] = self._load()
+        # Posição da busca (pode estar à frente da marca persistida)
+        self._cursors: Dict[str, SyncState] = {}
+        # UIDs buscados e ainda não concluídos -> vezes em processamento
+        self._inflight: Dict[str, Dict[int, int]] = {}
+
+    def _load(self) -> Dict[str, SyncState]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Estado de sincronização ilegível ({self.path}), recomeçando: {e}")
+            return {}
+
+    def get(self, key: str) -> Optional[SyncState]:
+        """Retorna o estado da caixa (ou None se nunca sincronizada)"""
+        with self._lock:
+            state = self._states.get(key)
+            return dict(state) if state else None
+
+    def position(self, key: str) -> Optional[SyncState]:
+        """De onde a próxima busca parte: o cursor em memória ou a marca persistida"""
+        with self._lock:
+            state = self._cursors.get(key) or self._states.get(key)
+            return dict(state) if state else None
+
+    def update(self, key: str, uidvalidity: int, last_uid: int):
+        """Avança a marca d'água da caixa e persiste em disco"""
+        self.begin(key, uidvalidity, last_uid, ())
+
+    def begin(self, key: str, uidvalidity: int, last_uid: int, uids: Iterable[int]):
+        """
+        Registra uma busca: o cursor vai para last_uid e os UIDs retornados
+        ficam em processamento (a marca persistida para antes do menor deles)
+        """
+        with self._lock:
+            cursor = self._cursors.get(key)
+            if cursor is None or cursor["uidvalidity"] != uidvalidity:
+                # UIDVALIDITY novo: os UIDs antigos não valem mais
+                self._inflight.pop(key, None)
+            self._cursors[key] = {"uidvalidity": uidvalidity, "last_uid": last_uid}
+            inflight = self._inflight.setdefault(key, {})
+            for uid in uids:
+                inflight[uid] = inflight.get(uid, 0) + 1
+            self._persist(key)
+
+    def complete(self, key: str, uidvalidity: int, uids: Iterable[int]):
+        """UIDs processados: a marca persistida pode passar deles"""
+        self._finish(key, uidvalidity, uids, rewind=False)
+
+    def release(self, key: str, uidvalidity: int, uids: Iterable[int]):
+        """UIDs que falharam: o cursor volta para antes deles e a próxima busca os repete"""
+        self._finish(key, uidvalidity, uids, rewind=True)
+
+    def _finish(self, key: str, uidvalidity: int, uids: Iterable[int], rewind: bool):
+        with self._lock:
+            cursor = self._cursors.get(key)
+            if cursor is None or cursor["uidvalidity"] != uidvalidity:
+                return
+            inflight = self._inflight.get(key, {})
+            finished = []
+            for uid in uids:
+                count = inflight.get(uid)
+                if count is None:
+                    continue
+                finished.append(uid)
+                if count > 1:
+                    inflight[uid] = count - 1
+                else:
+                    del inflight[uid]
+            if rewind and finished:
+                cursor["last_uid"] = min(cursor["last_uid"], min(finished) - 1)
+            self._persist(key)
+
+    def _persist(self, key: str):
+        """Grava a marca d'água: o cursor, limitado pelo menor UID em processamento (chamar com o lock)"""
+        cursor = self._cursors[key]
+        last_uid = cursor["last_uid"]
+        inflight = self._inflight.get(key)
+        if inflight:
+            last_uid = min(last_uid, min(inflight) - 1)
+        state = self._states.get(key)
+        if state and state["uidvalidity"] == cursor["uidvalidity"] and state["last_uid"] == last_uid:
+            return
+        self._states[key] = {"uidvalidity": cursor["uidvalidity"], "last_uid": last_uid}
+        # Escrita atômica: um crash no meio nunca deixa o arquivo corrompido
+        write_json_atomic(self.path, self._states)
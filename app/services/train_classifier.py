@@ -0,0 +1,122 @@
+"""
+Treino do classificador linear a partir do armazenamento local
+Usa os emails já classificados (emails.db) como exemplos rotulados; as
+categorias gravadas vêm do motor de palavras-chave, então correções manuais
+podem ser passadas em um CSV (id,categoria) e prevalecem sobre elas.
+
+Uma parte dos exemplos fica de fora para medir a acurácia do modelo e das
+palavras-chave; o modelo final é treinado com todos e gravado em
+CLASSIFIER_MODEL_DIR. Para usá-lo: CLASSIFIER_BACKEND=linear.
+
+Uso: python -m app.services.train_classifier [--labels correcoes.csv] [--limit N]
+"""
+
+# Importações padrão do Python
+import os
+import csv
+import random
+import argparse
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Importações de arquivos internos
+from app.services import linear_classifier
+from app.services.EmailClassifer import EmailClassifier, CLASSIFIER_MODEL_DIR
+from app.services.email_store import EmailStore
+
+logger = logging.getLogger(__name__)
+
+# Fração dos exemplos reservada para avaliação
+CLASSIFIER_HOLDOUT = float(os.getenv("CLASSIFIER_HOLDOUT", "0.2"))
+
+
+def read_corrections(path: str) -> Dict[str, str]:
+    """Categorias corrigidas à mão: CSV com cabeçalho id,categoria"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return {row["id"]: row["categoria"] for row in csv.DictReader(f) if row.get("categoria")}
+
+
+def accuracy(predicted: Sequence[str], expected: Sequence[str]) -> float:
+    if not expected:
+        return 0.0
+    return sum(1 for p, e in zip(predicted, expected) if p == e) / len(expected)
+
+
+def train_and_evaluate(
+    texts: List[Tuple[str, str]],
+    labels: List[str],
+    holdout: float = CLASSIFIER_HOLDOUT,
+    seed: int = 42,
+) -> Tuple["linear_classifier.LinearModel", Dict[str, Any]]:
+    """
+    Treina com (1 - holdout) dos exemplos, mede a acurácia no restante
+    (modelo linear e palavras-chave) e retreina com todos
+
+    Args:
+        texts: (assunto, corpo) originais, sem normalizar
+        labels: categoria correta de cada email
+    """
+    keywords = EmailClassifier(backend="keywords")
+    docs = [(keywords.normalize_text(s), keywords.normalize_text(b)) for s, b in texts]
+    classes = [c for c in keywords.category_order if c in set(labels)]
+
+    order = list(range(len(docs)))
+    random.Random(seed).shuffle(order)
+    n_test = int(len(order) * holdout) if len(order) >= 10 else 0
+    test, train = order[:n_test], order[n_test:]
+
+    report: Dict[str, Any] = {"samples": len(docs), "holdout": n_test}
+    if test:
+        model = linear_classifier.train([docs[i] for i in train], [labels[i] for i in train], classes)
+        expected = [labels[i] for i in test]
+        linear = EmailClassifier(model=model)
+        report["accuracy_linear"] = round(accuracy(linear.classify_batch([texts[i] for i in test]), expected), 4)
+        report["accuracy_keywords"] = round(
+            accuracy(keywords.classify_batch([texts[i] for i in test]), expected), 4
+        )
+
+    model = linear_classifier.train(docs, labels, classes)
+    model.meta.update(report)
+    return model, report
+
+
+def train_from_store(
+    store: EmailStore,
+    corrections_path: Optional[str] = None,
+    limit: Optional[int] = None,
+    model_dir: str = CLASSIFIER_MODEL_DIR,
+    holdout: float = CLASSIFIER_HOLDOUT,
+) -> Dict[str, Any]:
+    """Treina com os emails do armazenamento (mais as correções) e grava o modelo"""
+    rows = store.labeled(limit)
+    corrections = read_corrections(corrections_path) if corrections_path else {}
+    if not rows:
+        raise ValueError("Nenhum email classificado no armazenamento local")
+
+    texts = [(row["subject"], row["snippet"]) for row in rows]
+    labels = [corrections.get(row["id"], row["categoria"]) for row in rows]
+    model, report = train_and_evaluate(texts, labels, holdout)
+    report["corrections"] = sum(1 for row in rows if row["id"] in corrections)
+    model.meta["corrections"] = report["corrections"]
+    model.save(model_dir)
+    report["model_dir"] = model_dir
+    return report
+
+
+if __name__ == "__main__":
+    from app.config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Treina o classificador linear com os emails do armazenamento local")
+    parser.add_argument("--labels", help="CSV id,categoria com correções manuais")
+    parser.add_argument("--limit", type=int, help="usa só os N emails mais recentes")
+    parser.add_argument("--model-dir", default=CLASSIFIER_MODEL_DIR)
+    parser.add_argument("--holdout", type=float, default=CLASSIFIER_HOLDOUT)
+    args = parser.parse_args()
+
+    store = EmailStore()
+    try:
+        result = train_from_store(store, args.labels, args.limit, args.model_dir, args.holdout)
+    finally:
+        store.close()
+    logger.info(f"🧮 Classificador treinado: {result}")
@@ -2,4 +2,37 @@
 Funções auxiliares e utilitários
 """
 
+# Importações padrão do Python
+import os
+import re
+import html
+import json
+from typing import Any
 
+
+def write_json_atomic(path: str, data: Any):
+    """Grava JSON de forma atômica (arquivo temporário + os.replace)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+_HTML_HIDDEN_RE = re.compile(r'<(script|style|head)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_HTML_BREAK_RE = re.compile(r'<(?:br|/p|/div|/li|/tr|/h[1-6])\b[^>]*>', re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r'<[^>]+>|<!--.*?-->', re.DOTALL)
+_BLANK_LINES_RE = re.compile(r'[ \t\r\f\v]*\n\s*')
+_SPACES_RE = re.compile(r'[ \t\r\f\v]+')
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Conversão rápida de HTML para texto (corpo de emails só com HTML)
+    Remove scripts/estilos e tags, mantém quebras de parágrafo e decodifica entidades
+    """
+    text = _HTML_HIDDEN_RE.sub(' ', markup)
+    text = _HTML_BREAK_RE.sub('\n', text)
+    text = _HTML_TAG_RE.sub(' ', text)
+    text = html.unescape(text)
+    text = _SPACES_RE.sub(' ', text)
+    return _BLANK_LINES_RE.sub('\n', text).strip()
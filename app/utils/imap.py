@@ -0,0 +1,246 @@
+"""
+Utilitários do protocolo IMAP
+Conjuntos de UIDs, parser de respostas FETCH e BODYSTRUCTURE
+"""
+
+# Importações padrão do Python
+import re
+import base64
+import binascii
+import quopri
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Literal IMAP no fim de uma linha: {123}
+_LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+
+_LITERAL = object()
+
+
+def uid_set(uids: Iterable[int]) -> str:
+    """
+    Compacta UIDs em um sequence set IMAP
+
+    Exemplo: [1, 2, 3, 5, 7, 8] -> "1:3,5,7:8"
+    """
+    ranges: List[str] = []
+    ordered = sorted(set(int(u) for u in uids))
+    if not ordered:
+        return ""
+
+    start = prev = ordered[0]
+    for uid in ordered[1:]:
+        if uid == prev + 1:
+            prev = uid
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = uid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def _tokenize(text: bytes, tokens: List[Any]):
+    """Quebra um trecho de resposta em tokens: '(' ')' átomos, strings e NIL"""
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i:i + 1]
+        if c in (b' ', b'\r', b'\n'):
+            i += 1
+        elif c in (b'(', b')'):
+            tokens.append(c.decode())
+            i += 1
+        elif c == b'"':
+            j = i + 1
+            buf = bytearray()
+            while j < n and text[j:j + 1] != b'"':
+                if text[j:j + 1] == b'\\':
+                    j += 1
+                buf += text[j:j + 1]
+                j += 1
+            tokens.append(buf.decode('utf-8', errors='ignore'))
+            i = j + 1
+        else:
+            # Átomo; seções como BODY[HEADER.FIELDS (A B)]<0> contêm espaços e parênteses
+            j = i
+            while j < n and text[j:j + 1] not in (b' ', b'(', b')', b'\r', b'\n'):
+                if text[j:j + 1] == b'[':
+                    close = text.find(b']', j)
+                    j = n if close == -1 else close
+                j += 1
+            atom = text[i:j].decode('utf-8', errors='ignore')
+            tokens.append(None if atom.upper() == 'NIL' else atom)
+            i = j
+
+
+def _parse_list(tokens: List[Any], pos: int) -> Tuple[List[Any], int]:
+    """Lê uma lista parentizada a partir de tokens[pos] (logo após o '(')"""
+    items: List[Any] = []
+    while pos < len(tokens):
+        tok = tokens[pos]
+        if tok == '(':
+            sub, pos = _parse_list(tokens, pos + 1)
+            items.append(sub)
+        elif tok == ')':
+            return items, pos + 1
+        elif isinstance(tok, tuple) and tok[0] is _LITERAL:
+            items.append(tok[1])
+            pos += 1
+        else:
+            items.append(tok)
+            pos += 1
+    return items, pos
+
+
+def parse_fetch_response(data: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Converte a resposta de imaplib para FETCH/UID FETCH em dicionários
+
+    imaplib entrega cada literal como tupla (prefixo, bytes) e o restante
+    como bytes; aqui tudo vira um dicionário por mensagem, com os itens em
+    maiúsculas: {'SEQ': '1', 'UID': '5', 'BODYSTRUCTURE': [...], 'BODY[1]<0>': b'...'}
+
+    Literais viram bytes; átomos e strings viram str; NIL vira None.
+    """
+    tokens: List[Any] = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            prefix, literal = item[0], item[1]
+            match = _LITERAL_RE.search(prefix)
+            if match:
+                prefix = prefix[:match.start()]
+            _tokenize(prefix, tokens)
+            tokens.append((_LITERAL, literal))
+        else:
+            _tokenize(item, tokens)
+
+    messages: List[Dict[str, Any]] = []
+    pos = 0
+    while pos < len(tokens):
+        seq = tokens[pos]
+        if pos + 1 >= len(tokens) or tokens[pos + 1] != '(':
+            pos += 1
+            continue
+        items, pos = _parse_list(tokens, pos + 2)
+        message: Dict[str, Any] = {'SEQ': seq}
+        for i in range(0, len(items) - 1, 2):
+            key = items[i]
+            if isinstance(key, str):
+                message[key.upper()] = items[i + 1]
+        messages.append(message)
+    return messages
+
+
+def find_fetch_item(message: Dict[str, Any], prefix: str) -> Optional[Any]:
+    """Retorna o primeiro item cujo nome começa com prefix (ex.: 'BODY[HEADER')"""
+    for key, value in message.items():
+        if key.startswith(prefix):
+            return value
+    return None
+
+
+def _params(fields: Any) -> Dict[str, str]:
+    """Converte a lista de parâmetros do BODYSTRUCTURE em dicionário"""
+    if not isinstance(fields, list):
+        return {}
+    return {
+        str(fields[i]).lower(): str(fields[i + 1])
+        for i in range(0, len(fields) - 1, 2)
+    }
+
+
+def _text_parts(structure: List[Any], prefix: str) -> Iterable[Dict[str, Any]]:
+    """Percorre o BODYSTRUCTURE em ordem, gerando as partes folha do tipo texto"""
+    if structure and isinstance(structure[0], list):
+        # Multipart: partes filhas, seguidas do subtipo
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            yield from _text_parts(child, f"{prefix}.{index}" if prefix else str(index))
+        return
+
+    if len(structure) < 7 or not isinstance(structure[0], str):
+        return
+    if structure[0].upper() != 'TEXT':
+        return
+
+    params = _params(structure[2])
+    try:
+        size = int(structure[6])
+    except (TypeError, ValueError):
+        size = 0
+    yield {
+        'part': prefix or '1',
+        'subtype': str(structure[1]).lower(),
+        'charset': params.get('charset', 'utf-8'),
+        'encoding': str(structure[5] or '7bit').lower(),
+        'size': size,
+    }
+
+
+def find_text_part(structure: Any, subtypes: Tuple[str, ...] = ('plain',)) -> Optional[Dict[str, Any]]:
+    """
+    Localiza no BODYSTRUCTURE a primeira parte de texto do subtipo desejado
+
+    Em mensagens não-multipart, qualquer parte de texto é aceita (parte "1"),
+    assim como em GmailIMAPReader.get_email_body.
+
+    Returns:
+        {'part': '1.1', 'subtype': 'plain', 'charset': ..., 'encoding': ..., 'size': ...}
+        ou None se não houver parte adequada
+    """
+    if not isinstance(structure, list) or not structure:
+        return None
+
+    if not isinstance(structure[0], list):
+        parts = list(_text_parts(structure, ''))
+        return parts[0] if parts else None
+
+    candidates = list(_text_parts(structure, ''))
+    for subtype in subtypes:
+        for part in candidates:
+            if part['subtype'] == subtype:
+                return part
+    return None
+
+
+def decode_body_part(data: bytes, encoding: str, charset: str) -> str:
+    """
+    Decodifica uma parte (possivelmente truncada) conforme o
+    Content-Transfer-Encoding e o charset
+    """
+    if not data:
+        return ""
+
+    encoding = (encoding or '').lower()
+    if encoding == 'base64':
+        compact = b''.join(data.split())
+        compact = compact[:len(compact) - len(compact) % 4]
+        try:
+            data = base64.b64decode(compact)
+        except (binascii.Error, ValueError):
+            data = b''
+    elif encoding == 'quoted-printable':
+        data = quopri.decodestring(data)
+
+    try:
+        return data.decode(charset or 'utf-8', errors='ignore')
+    except LookupError:
+        return data.decode('utf-8', errors='ignore')
+
+
+def from_criteria(senders: List[str]) -> str:
+    """
+    Critério de busca por um ou mais remetentes, combinados com OR
+
+    Exemplo: ["a@x", "b@x", "c@x"] -> '(OR FROM "a@x" OR FROM "b@x" FROM "c@x")'
+    """
+    if not senders:
+        return 'ALL'
+    keys = [f'FROM "{s}"' for s in senders]
+    criteria = keys[-1]
+    for key in reversed(keys[:-1]):
+        criteria = f'OR {key} {criteria}'
+    return f'({criteria})'
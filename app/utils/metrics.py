@@ -0,0 +1,307 @@
+"""
+Métricas no formato de texto do Prometheus e spans de tempo por etapa
+Sem dependências externas: contadores, gauges e histogramas com labels,
+exportados em GET /metrics. span() mede uma etapa no histograma
+stage_duration_seconds e, com TRACE_SPANS=true, guarda os spans recentes
+(com o span pai) para GET /trace.
+"""
+
+# Importações padrão do Python
+import os
+import math
+import time
+import itertools
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = "notificacoes_"
+# Guarda os spans recentes (nome, duração, pai, atributos) para GET /trace
+TRACE_SPANS = os.getenv("TRACE_SPANS", "false").strip().lower() in ("1", "true", "yes")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+# Loga um aviso para spans mais lentos que isto (0 = desativado)
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "0"))
+
+# Buckets (segundos): de operações locais (ms) a buscas IMAP lentas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """Base das métricas: nome, ajuda, labels e registro global"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, values: Sequence[Any], kwargs: Dict[str, Any]) -> LabelValues:
+        if kwargs:
+            values = [kwargs[name] for name in self.labelnames]
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+        return tuple(str(v) for v in values)
+
+    def _labels_text(self, key: LabelValues, extra: str = "") -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Bound:
+    """Métrica com os labels já fixados (retorno de labels())"""
+
+    __slots__ = ("_metric", "_key")
+
+    def __init__(self, metric: _Metric, key: LabelValues):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1):
+        self._metric._inc(self._key, amount)
+
+    def dec(self, amount: float = 1):
+        self._metric._inc(self._key, -amount)
+
+    def set(self, value: float):
+        self._metric._set(self._key, value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self._metric._set_function(self._key, fn)
+
+    def observe(self, value: float):
+        self._metric._observe(self._key, value)
+
+
+class Counter(_Metric):
+    """Valor que só cresce (ex.: emails classificados, falhas)"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def labels(self, *values, **kwargs) -> _Bound:
+        return _Bound(self, self._key(values, kwargs))
+
+    def inc(self, amount: float = 1):
+        self._inc((), amount)
+
+    def _inc(self, key: LabelValues, amount: float):
+        if amount < 0:
+            raise ValueError("Contadores não diminuem")
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *values, **kwargs) -> float:
+        with self._lock:
+            return self._values.get(self._key(values, kwargs), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels_text(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo; set_function calcula o valor na hora da coleta"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def labels(self, *values, **kwargs) -> _Bound:
+        return _Bound(self, self._key(values, kwargs))
+
+    def set(self, value: float):
+        self._set((), value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self._set_function((), fn)
+
+    def _set(self, key: LabelValues, value: float):
+        with self._lock:
+            self._values[key] = float(value)
+
+    def _inc(self, key: LabelValues, amount: float):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _set_function(self, key: LabelValues, fn: Callable[[], float]):
+        with self._lock:
+            self._functions[key] = fn
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                values[key] = float(fn())
+            except Exception as e:
+                logger.debug(f"Gauge {self.name}{key} indisponível: {e}")
+        return [f"{self.name}{self._labels_text(k)} {_format_value(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Distribuição de durações em buckets cumulativos, com soma e contagem"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [contagem por bucket..., soma, total]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def labels(self, *values, **kwargs) -> _Bound:
+        return _Bound(self, self._key(values, kwargs))
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    def _observe(self, key: LabelValues, value: float):
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines: List[str] = []
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{self._labels_text(key, le)} {_format_value(cumulative)}")
+            inf = self._labels_text(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_sum{self._labels_text(key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{self._labels_text(key)} {_format_value(row[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Todas as métricas do processo, na ordem de criação"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Exposição em texto (text/plain; version=0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Duração de cada etapa (poll, imap_connect, imap_search, imap_fetch, parse, classify, deliver, api_send)",
+    ["stage"],
+)
+FAILURES = Counter("failures_total", "Falhas por etapa", ["stage"])
+
+
+# --- Spans ---
+
+_span_ids = itertools.count(1)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+_spans: Deque[Dict[str, Any]] = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Mede um trecho como a etapa `stage`
+
+    Sempre alimenta o histograma stage_duration_seconds; exceções contam em
+    failures_total e são repassadas. Com TRACE_SPANS=true o span é guardado
+    com o pai (o span aberto na mesma thread/tarefa) e os atributos, que
+    podem ser completados dentro do bloco (ex.: span["items"] = 10).
+    """
+    record: Dict[str, Any] = dict(attrs)
+    token = None
+    if TRACE_SPANS:
+        record["id"] = next(_span_ids)
+        record["parent"] = _current_span.get()
+        token = _current_span.set(record["id"])
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        # Cancelamentos (CancelledError) não contam como falha
+        record["error"] = type(e).__name__
+        FAILURES.labels(stage).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(duration)
+        if token is not None:
+            _current_span.reset(token)
+            record.update(stage=stage, start=started_at, duration_ms=round(duration * 1000, 3))
+            _spans.append(record)
+        if TRACE_SLOW_SECONDS and duration >= TRACE_SLOW_SECONDS:
+            logger.warning(f"🐢 Etapa {stage} lenta: {duration:.2f}s {attrs or ''}")
+
+
+def recent_spans(limit: int = 100, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Spans mais recentes primeiro (vazio se TRACE_SPANS estiver desativado)"""
+    spans = [s for s in reversed(list(_spans)) if stage is None or s["stage"] == stage]
+    return spans[:limit]
@@ -0,0 +1,103 @@
+"""
+Parser MIME incremental e limitado
+Alimenta o BytesFeedParser em blocos e para assim que a primeira parte
+text/plain termina (ou ao atingir o orçamento de bytes), sem decodificar
+anexos que vêm depois dela.
+"""
+
+# Importações padrão do Python
+from email.feedparser import BytesFeedParser
+from email.message import Message
+from email.policy import compat32
+from typing import List, Optional
+
+# Importações de arquivos internos
+from app.utils.helpers import html_to_text
+
+_FEED_CHUNK_BYTES = 64 * 1024
+
+
+class _PartRecorder:
+    """message_factory que registra as partes na ordem em que o parser as cria"""
+
+    def __init__(self):
+        self.parts: List[Message] = []
+
+    def __call__(self, policy=compat32) -> Message:
+        part = Message(policy)
+        self.parts.append(part)
+        return part
+
+    def first_text_done(self) -> bool:
+        """
+        True se já existe uma parte text/plain seguida de outra parte: o
+        parser só cria a próxima depois de fechar o boundary da anterior,
+        então o conteúdo da text/plain está completo
+        """
+        for index, part in enumerate(self.parts):
+            if _is_body_part(part, "text/plain"):
+                return index + 1 < len(self.parts)
+        return False
+
+
+def _is_body_part(part: Message, content_type: str) -> bool:
+    return (
+        part.get_content_type() == content_type
+        and part.get_content_disposition() != "attachment"
+    )
+
+
+def parse_message_bounded(data: bytes, max_bytes: int) -> Message:
+    """
+    Parseia no máximo max_bytes de uma mensagem RFC 822
+
+    Headers e a primeira parte text/plain ficam completos se couberem no
+    orçamento; partes posteriores (ex.: anexos) não são lidas. Mensagens
+    cortadas no meio são aceitas (o parser registra o defeito e segue).
+    """
+    recorder = _PartRecorder()
+    parser = BytesFeedParser(policy=compat32.clone(message_factory=recorder))
+    view = memoryview(data)[:max_bytes] if max_bytes else memoryview(data)
+    for start in range(0, len(view), _FEED_CHUNK_BYTES):
+        parser.feed(view[start:start + _FEED_CHUNK_BYTES].tobytes())
+        if recorder.first_text_done():
+            break
+    return parser.close()
+
+
+def _decode_part(part: Message) -> str:
+    payload = part.get_payload(decode=True)
+    if not payload:
+        return ""
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="ignore")
+    except LookupError:
+        return payload.decode("utf-8", errors="ignore")
+
+
+def message_text(msg: Message, max_chars: Optional[int] = None) -> str:
+    """
+    Texto do corpo: a primeira parte text/plain ou, em emails só com HTML,
+    a primeira text/html convertida para texto
+    """
+    if not msg.is_multipart():
+        text = _decode_part(msg)
+        if msg.get_content_type() == "text/html":
+            text = html_to_text(text)
+    else:
+        text = ""
+        html_part = None
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            if _is_body_part(part, "text/plain"):
+                text = _decode_part(part)
+                break
+            if html_part is None and _is_body_part(part, "text/html"):
+                html_part = part
+        if not text and html_part is not None:
+            text = html_to_text(_decode_part(html_part))
+
+    text = text.strip()
+    return text[:max_chars] if max_chars else text
@@ -0,0 +1,43 @@
+"""
+Serialização JSON rápida
+Usa orjson quando instalado (opcional, 5-10x mais rápido que o json da
+biblioteca padrão) e json.dumps caso contrário; os dois aceitam EmailRecord.
+"""
+
+# Importações padrão do Python
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+# Importações de arquivos internos
+from app.models.EmailRecord import EmailRecord
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, EmailRecord):
+        return obj.to_dict()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON em UTF-8 (bytes), aceitando EmailRecord em qualquer nível"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    """Como dumps, mas em texto (SQLite, Server-Sent Events)"""
+    return dumps(obj).decode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
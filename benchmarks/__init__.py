@@ -0,0 +1,5 @@
+"""
+Benchmarks dos caminhos críticos do pipeline
+Execute a partir da raiz do projeto, ex.: python -m benchmarks.bench_classifier
+Suíte completa (por etapa e ponta a ponta, resultados em JSON): python -m benchmarks.run_all
+"""
@@ -0,0 +1,79 @@
+"""
+Benchmark do EmailClassifier: matcher compilado (uma passada) vs a
+implementação original (uma regex por palavra-chave)
+
+Uso: python -m benchmarks.bench_classifier [n_emails]
+"""
+
+# Importações padrão do Python
+import os
+import sys
+import time
+from typing import Dict
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+from app.services.EmailClassifer import EmailClassifier, normalize_cache
+from benchmarks.corpus import generate_emails
+
+
+class LegacyEmailClassifier(EmailClassifier):
+    """Classificação original: re.search por palavra-chave e categoria"""
+
+    def normalize_text(self, text: str) -> str:
+        return self._normalize(text)
+
+    def classify_email(self, email: EmailData) -> str:
+        subject = self.normalize_text(email.get("subject", ""))
+        snippet = self.normalize_text(email.get("snippet", ""))
+        full_text = subject + " " + snippet
+
+        matches: Dict[str, int] = {}
+        for category, keywords in self.categories.items():
+            count = sum(1 for kw in keywords if self.contains_keyword(full_text, kw))
+            if count > 0:
+                matches[category] = count
+
+        if not matches:
+            return "Outros"
+        return max(matches, key=lambda c: (matches[c], -self.category_order.index(c)))
+
+
+def _run(classifier: EmailClassifier, emails) -> (list, float):
+    normalize_cache.clear()
+    start = time.perf_counter()
+    result = [classifier.classify_email(e) for e in emails]
+    return result, time.perf_counter() - start
+
+
+def main(n: int = 20000):
+    emails = generate_emails(n)
+    legacy, compiled = LegacyEmailClassifier(), EmailClassifier()
+
+    legacy_result, legacy_time = _run(legacy, emails)
+    compiled_result, compiled_time = _run(compiled, emails)
+    cache_stats = normalize_cache.stats()
+
+    normalize_cache.clear()
+    start = time.perf_counter()
+    batch_result = [e["categoria"] for e in compiled.classify_iter(emails, in_place=True, threshold=1)]
+    batch_time = time.perf_counter() - start
+
+    divergent = sum(1 for a, b in zip(legacy_result, compiled_result) if a != b)
+    divergent += sum(1 for a, b in zip(compiled_result, batch_result) if a != b)
+    print(f"Emails:       {n}")
+    print(f"Original:     {legacy_time:.3f}s ({n / legacy_time:,.0f} emails/s)")
+    print(f"Compilado:    {compiled_time:.3f}s ({n / compiled_time:,.0f} emails/s)")
+    print(f"Em lote:      {batch_time:.3f}s ({n / batch_time:,.0f} emails/s, "
+          f"{os.cpu_count()} núcleos)")
+    print(f"Speedup:      {legacy_time / compiled_time:.1f}x (compilado), "
+          f"{legacy_time / batch_time:.1f}x (em lote)")
+    print(f"Cache:        {cache_stats['hit_rate']:.0%} de acertos "
+          f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
+    print(f"Divergências: {divergent}")
+    if divergent:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
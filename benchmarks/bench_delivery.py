@@ -0,0 +1,82 @@
+"""
+Benchmark da entrega HTTP contra o stub local da API
+
+Compara: requests.post por email (original), sessão com pool keep-alive,
+rota de lote e o fallback de envios concorrentes (API sem rota de lote).
+
+Uso: python -m benchmarks.bench_delivery [n_emails]
+"""
+
+# Importações padrão do Python
+import sys
+import time
+
+# Importações de terceiros
+import requests
+
+# Importações de arquivos internos
+from app.api import inbox_stream
+from app.api.inbox_stream import build_payload, send_email_to_api, send_batch_to_api
+from benchmarks.corpus import generate_emails
+from benchmarks.stub_api import StubAPI
+
+
+def _point_to(stub: StubAPI):
+    inbox_stream.API_URL = stub.url
+    inbox_stream.BATCH_API_URL = stub.url + "batch"
+    inbox_stream._batch_supported = None
+
+
+def _report(name: str, n: int, elapsed: float, stub: StubAPI, ok: int):
+    print(f"{name:<22} {n / elapsed:>9,.0f} emails/s  "
+          f"{stub.requests:>5} requisições  {stub.connections:>5} conexões  {ok}/{n} ok")
+
+
+def main(n: int = 2000):
+    emails = generate_emails(n)
+
+    # Original: requests.post (nova conexão TCP por email)
+    stub = StubAPI().start()
+    start = time.perf_counter()
+    ok = sum(
+        200 <= requests.post(stub.url, json=build_payload(e), timeout=15).status_code < 300
+        for e in emails
+    )
+    _report("requests.post", n, time.perf_counter() - start, stub, ok)
+    stub.stop()
+
+    # Sessão com pool keep-alive
+    stub = StubAPI().start()
+    _point_to(stub)
+    start = time.perf_counter()
+    ok = sum(send_email_to_api(e) for e in emails)
+    _report("sessão keep-alive", n, time.perf_counter() - start, stub, ok)
+    stub.stop()
+
+    # Rota de lote
+    stub = StubAPI().start()
+    _point_to(stub)
+    start = time.perf_counter()
+    results = send_batch_to_api(emails)
+    _report("lote", n, time.perf_counter() - start, stub, sum(results.values()))
+    stub.stop()
+
+    # Sem rota de lote: envios individuais concorrentes
+    stub = StubAPI(batch=False).start()
+    _point_to(stub)
+    start = time.perf_counter()
+    results = send_batch_to_api(emails)
+    _report("fallback concorrente", n, time.perf_counter() - start, stub, sum(results.values()))
+    stub.stop()
+
+    # Mapeamento dos resultados por item (falhas parciais no lote)
+    stub = StubAPI(fail_every=10).start()
+    _point_to(stub)
+    results = send_batch_to_api(emails[:100])
+    failed = [eid for eid, ok in results.items() if not ok]
+    print(f"Falhas parciais mapeadas: {len(failed)}/100 (esperado: 10)")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
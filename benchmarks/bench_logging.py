@@ -0,0 +1,79 @@
+"""
+Benchmark do logging: custo de um logger.info na thread que processa os
+emails, com handlers síncronos (FileHandler + StreamHandler, como antes)
+e com a fila (QueueHandler + QueueListener de app/config/logging_config.py)
+
+Uso: python -m benchmarks.bench_logging [n_mensagens]
+"""
+
+# Importações padrão do Python
+import os
+import sys
+import time
+import logging
+import tempfile
+from typing import List
+
+# Importações de arquivos internos
+from app.config import logging_config
+
+
+def _measure(logger: logging.Logger, n: int) -> List[float]:
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        logger.info(f"📂 Email {i} classificado em Avisos da Coordenação / Secretaria")
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def _report(name: str, latencies: List[float], total: float):
+    n = len(latencies)
+    p50, p99 = latencies[n // 2] * 1e6, latencies[int(n * 0.99)] * 1e6
+    print(f"{name:<12} p50 {p50:7.1f} µs  p99 {p99:8.1f} µs  total na thread {total:.3f}s")
+
+
+def main(n: int = 50000):
+    with tempfile.TemporaryDirectory() as workdir:
+        # Terminal redirecionado para arquivo (como sob systemd/docker)
+        console = open(os.path.join(workdir, "console.log"), "w", encoding="utf-8")
+        sys.stderr, stderr = console, sys.stderr
+        root = logging.getLogger()
+        logger = logging.getLogger("bench")
+        try:
+            formatter = logging.Formatter(logging_config.TEXT_FORMAT)
+            sync_handlers = [
+                logging.FileHandler(os.path.join(workdir, "sync.log"), encoding="utf-8"),
+                logging.StreamHandler(console),
+            ]
+            for handler in sync_handlers:
+                handler.setFormatter(formatter)
+                root.addHandler(handler)
+            root.setLevel(logging.INFO)
+            start = time.perf_counter()
+            sync = _measure(logger, n)
+            sync_total = time.perf_counter() - start
+            for handler in sync_handlers:
+                root.removeHandler(handler)
+                handler.close()
+
+            logging_config.LOG_FILE = os.path.join(workdir, "queue.log")
+            logging_config.setup_logging("INFO")
+            start = time.perf_counter()
+            queued = _measure(logger, n)
+            queued_total = time.perf_counter() - start
+            drain_start = time.perf_counter()
+            logging_config.stop_logging()
+            drain = time.perf_counter() - drain_start
+        finally:
+            sys.stderr = stderr
+            console.close()
+
+    print(f"Mensagens:   {n}")
+    _report("Síncrono", sync, sync_total)
+    _report("Fila", queued, queued_total)
+    print(f"Escrita da fila concluída {drain:.3f}s após a última mensagem (thread do listener)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
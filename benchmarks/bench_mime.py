@@ -0,0 +1,90 @@
+"""
+Benchmark do parse MIME de um email com anexo grande
+
+Compara o caminho original (message_from_bytes + percorrer todas as
+partes) com o parser limitado (BytesFeedParser até a primeira text/plain),
+medindo tempo e pico de memória (tracemalloc) por mensagem. "parcial"
+simula o FETCH BODY[]<0.PARSE_MAX_BYTES>: só o início da mensagem trafega.
+
+Uso: python -m benchmarks.bench_mime [tamanho_do_anexo_em_MB]
+"""
+
+# Importações padrão do Python
+import sys
+import time
+import email
+import tracemalloc
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# Importações de arquivos internos
+from app.services.gmail_imap import GmailIMAPReader, PARSE_MAX_BYTES
+from app.utils.mime import parse_message_bounded, message_text
+
+TEXTO = "Prezados estudantes, segue em anexo o edital de monitoria 2025.1. " * 40
+
+
+def build_message(attachment_mb: int, html_only: bool = False) -> bytes:
+    """Email do colegiado com corpo texto+HTML (ou só HTML) e um PDF anexo"""
+    msg = MIMEMultipart("mixed")
+    msg["Subject"] = "Edital de monitoria"
+    msg["From"] = "Colegiado ECOMP <ccecomp@ecomp.uefs.br>"
+    msg["Date"] = "Mon, 10 Mar 2025 10:00:00 -0300"
+    alternative = MIMEMultipart("alternative")
+    if not html_only:
+        alternative.attach(MIMEText(TEXTO, "plain", "utf-8"))
+    alternative.attach(MIMEText(f"<html><body><p>{TEXTO}</p></body></html>", "html", "utf-8"))
+    msg.attach(alternative)
+    msg.attach(MIMEApplication(b"%PDF-1.7\n" + bytes(attachment_mb * 2**20), "pdf", Name="edital.pdf"))
+    return msg.as_bytes()
+
+
+def legacy_body(data: bytes) -> str:
+    msg = email.message_from_bytes(data)
+    body = ""
+    for part in msg.walk():
+        if part.get_content_type() == "text/plain":
+            payload = part.get_payload(decode=True)
+            if payload:
+                body = payload.decode("utf-8", errors="ignore")
+                break
+    return body.strip()
+
+
+def bounded_body(data: bytes) -> str:
+    return message_text(parse_message_bounded(data, PARSE_MAX_BYTES))
+
+
+def _measure(name: str, fn, data: bytes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = fn(data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<28} {elapsed * 1000:>9.1f} ms   pico {peak / 2**20:>8.2f} MiB   {len(text):>6} caracteres")
+    return text
+
+
+def main(attachment_mb: int = 20):
+    data = build_message(attachment_mb)
+    print(f"Mensagem: {len(data) / 2**20:.1f} MiB (anexo de {attachment_mb} MiB), "
+          f"PARSE_MAX_BYTES={PARSE_MAX_BYTES}\n")
+
+    legacy = _measure("original (message_from_bytes)", legacy_body, data)
+    bounded = _measure("limitado (mensagem inteira)", bounded_body, data)
+    partial = _measure("limitado (FETCH parcial)", bounded_body, data[:PARSE_MAX_BYTES])
+    print(f"\nMesmo texto: {legacy == bounded == partial}")
+
+    html_only = build_message(attachment_mb, html_only=True)
+    text = _measure("só HTML (FETCH parcial)", bounded_body, html_only[:PARSE_MAX_BYTES])
+    print(f"HTML convertido: {text[:60]!r}...")
+
+    raw = {"id": "1", "rfc822": data[:PARSE_MAX_BYTES]}
+    parsed = GmailIMAPReader.parse_raw(raw)
+    print(f"parse_raw: assunto={parsed['subject']!r}, corpo={len(parsed['snippet'])} caracteres")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,92 @@
+"""
+Benchmark da reclassificação incremental após mudança nas regras
+
+Carrega N emails sintéticos no armazenamento, altera o arquivo de regras
+(uma palavra-chave removida, uma adicionada, duas categorias trocando de
+prioridade) e compara a reclassificação incremental (índice FTS5) com a
+reclassificação completa do acervo, conferindo que as categorias finais
+são as mesmas.
+
+Uso: python -m benchmarks.bench_reclassify [n_emails]
+"""
+
+# Importações padrão do Python
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+# Relê o arquivo de regras a cada verificação (sem o intervalo mínimo)
+os.environ.setdefault("CLASSIFIER_RULES_CHECK_SECONDS", "0")
+
+# Importações de arquivos internos
+from app.config.rules import CLASSIFIER_RULES_FILE
+from app.services.EmailClassifer import EmailClassifier
+from app.services.email_store import EmailStore
+from app.services.reclassifier import RuleReclassifier
+from benchmarks.corpus import generate_emails
+
+
+def _edit_rules(path: str, version: int, edit):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["version"] = version
+    edit(data)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    # mtime diferente mesmo em sistemas de arquivos com resolução de 1 s
+    os.utime(path, (time.time() + version, time.time() + version))
+
+
+def _remove_keyword(data):
+    data["categories"]["Eventos / Palestras / Workshops"].remove("palestra")
+    data["categories"]["Eventos / Palestras / Workshops"].append("hackathon")
+
+
+def _swap_priority(data):
+    order = data["category_order"]
+    i, j = order.index("TCC / Projeto Final"), order.index("Estágio / Trainee / Oportunidades")
+    order[i], order[j] = order[j], order[i]
+
+
+def main(n: int = 100_000):
+    workdir = tempfile.mkdtemp()
+    rules_path = os.path.join(workdir, "classification_rules.json")
+    shutil.copy(CLASSIFIER_RULES_FILE, rules_path)
+
+    classifier = EmailClassifier(rules_path=rules_path)
+    store = EmailStore(os.path.join(workdir, "emails.db"))
+    store.add_many(classifier.classify_all(generate_emails(n)))
+    reclassifier = RuleReclassifier(store, rules_path=rules_path)
+    reclassifier.run_once()
+    print(f"Emails: {n}")
+
+    for version, (name, edit) in enumerate(
+        (("palavra-chave trocada", _remove_keyword), ("prioridade trocada", _swap_priority)), start=2
+    ):
+        _edit_rules(rules_path, version, edit)
+        classifier.reload_rules()
+
+        start = time.perf_counter()
+        summary = reclassifier.run_once()
+        incremental = time.perf_counter() - start
+
+        rows = store.labeled()
+        start = time.perf_counter()
+        full = classifier.classify_all([{"subject": r["subject"], "snippet": r["snippet"]} for r in rows])
+        rescan = time.perf_counter() - start
+        divergent = sum(1 for r, e in zip(rows, full) if r["categoria"] != e["categoria"])
+
+        print(
+            f"{name:<22} incremental {incremental:>6.2f} s ({summary['checked']} verificados, "
+            f"{summary['changed']} mudaram)   completa {rescan:>6.2f} s   divergências {divergent}"
+        )
+
+    store.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,72 @@
+"""
+Benchmark do EmailRecord: memória por email e vazão de codificação do
+payload da API, comparados com dicionários EmailData + json da biblioteca
+padrão (o que o requests faz com json=)
+
+Uso: python -m benchmarks.bench_records [n_emails]
+"""
+
+# Importações padrão do Python
+import sys
+import json
+import time
+import tracemalloc
+from typing import Callable, List
+
+# Importações de arquivos internos
+from app.api.inbox_stream import build_payload, BATCH_CHUNK_SIZE
+from app.models.EmailRecord import EmailRecord
+from app.utils import serialization
+from benchmarks.corpus import generate_emails
+
+
+def _bytes_per_item(build: Callable[[], list], n: int) -> float:
+    """Memória alocada por item (os textos já existem: mede só o contêiner e o que ele cria)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return (after - before) / n
+
+
+def _encode_rate(emails: list, encode: Callable[[list], bytes]) -> (float, int):
+    """Emails/s codificando lotes de BATCH_CHUNK_SIZE como no envio para a API"""
+    start = time.perf_counter()
+    size = 0
+    for i in range(0, len(emails), BATCH_CHUNK_SIZE):
+        size += len(encode(emails[i:i + BATCH_CHUNK_SIZE]))
+    return len(emails) / (time.perf_counter() - start), size
+
+
+def main(n: int = 100000):
+    emails = generate_emails(n)
+    for i, e in enumerate(emails):
+        e["message_id"] = f"<{i}.bench@ecomp.uefs.br>"
+        e["categoria"] = "Outros"
+
+    dict_bytes = _bytes_per_item(lambda: [dict(e) for e in emails], n)
+    record_bytes = _bytes_per_item(lambda: [EmailRecord(**e) for e in emails], n)
+    records: List[EmailRecord] = [EmailRecord(**e) for e in emails]
+
+    def encode_dicts(batch: list) -> bytes:
+        return json.dumps([build_payload(e) for e in batch]).encode("utf-8")
+
+    def encode_records(batch: list) -> bytes:
+        return serialization.dumps([build_payload(r) for r in batch])
+
+    dict_rate, dict_size = _encode_rate(emails, encode_dicts)
+    record_rate, record_size = _encode_rate(records, encode_records)
+
+    encoder = "orjson" if serialization.orjson is not None else "json (orjson não instalado)"
+    print(f"Emails:       {n}")
+    print(f"Memória:      dict {dict_bytes:,.0f} B/email, EmailRecord {record_bytes:,.0f} B/email "
+          f"(inclui a data ISO já convertida)")
+    print(f"Codificação:  dict + json {dict_rate:,.0f} emails/s ({dict_size / n:,.0f} B/email)")
+    print(f"              EmailRecord + {encoder} {record_rate:,.0f} emails/s ({record_size / n:,.0f} B/email)")
+    print(f"Speedup:      {record_rate / dict_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,69 @@
+"""
+Benchmark do armazenamento local (SQLite + FTS5)
+
+Carrega N emails sintéticos e mede a latência (p50/p99) das consultas da
+rota GET /emails: listagem, filtro por categoria, busca por texto
+(termo comum e raro) e paginação profunda por cursor.
+
+Uso: python -m benchmarks.bench_store [n_emails]
+"""
+
+# Importações padrão do Python
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+# Importações de arquivos internos
+from app.services.EmailClassifer import EmailClassifier
+from app.services.email_store import EmailStore
+from benchmarks.corpus import generate_emails
+
+
+def _percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _measure(name: str, fn, repeat: int = 200):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{name:<32} p50 {statistics.median(samples):>7.2f} ms   p99 {_percentile(samples, 0.99):>7.2f} ms")
+
+
+def main(n: int = 100_000):
+    path = os.path.join(tempfile.mkdtemp(), "emails.db")
+    store = EmailStore(path)
+
+    emails = EmailClassifier().classify_all(generate_emails(n))
+    start = time.perf_counter()
+    for i in range(0, n, 1000):
+        store.add_many(emails[i:i + 1000])
+    store.optimize()
+    elapsed = time.perf_counter() - start
+    print(f"Carga: {n:,} emails em {elapsed:.1f}s ({n / elapsed:,.0f} emails/s), "
+          f"{os.path.getsize(path) / 2**20:.1f} MiB\n")
+
+    # Cursor da 50ª página (paginação profunda)
+    page = store.search(limit=200)
+    for _ in range(49):
+        page = store.search(before=page["next_before"], limit=200)
+    deep_cursor = page["next_before"]
+
+    _measure("listagem (50 mais recentes)", lambda: store.search())
+    _measure("categoria", lambda: store.search(category="TCC / Projeto Final"))
+    _measure("busca termo comum (prazo)", lambda: store.search(q="prazo"))
+    _measure("busca termo raro (robotica)", lambda: store.search(q="robotica"))
+    _measure("busca + categoria", lambda: store.search(q="edital", category="Monitoria / Tutoria / Bolsas Acadêmicas"))
+    _measure("busca por prefixo (compil)", lambda: store.search(q="compil"))
+    _measure("página 51 por cursor", lambda: store.search(before=deep_cursor))
+    _measure("busca comum, página 51", lambda: store.search(q="prazo", before=deep_cursor))
+    store.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
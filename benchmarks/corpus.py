@@ -0,0 +1,240 @@
+"""
+Gerador de corpus sintético de emails no estilo do colegiado
+Determinístico (semente fixa) para que os resultados sejam comparáveis
+"""
+
+# Importações padrão do Python
+import random
+import datetime
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+from typing import List
+
+# Importações de arquivos internos
+from app.models.EmailData import EmailData
+
+ASSUNTOS = [
+    "Comunicado da Coordenação: prazo para {x}",
+    "Defesa de TCC - banca de {x}",
+    "Vaga de estágio em {x}",
+    "Edital de monitoria de {x}",
+    "Palestra: {x} no auditório",
+    "Aula cancelada de {x}",
+    "Matrícula e ajuste de disciplinas - {x}",
+    "Achados e perdidos: {x} encontrado",
+    "Prováveis concluintes - colação de grau {x}",
+    "Auxílio moradia e alimentação - PROAE {x}",
+    "Seleção PIBIC / Iniciação Científica {x}",
+    "Re: Dúvida sobre {x}",
+    "Fwd: {x}",
+]
+
+TEMAS = [
+    "Algoritmos", "Sistemas Digitais", "Redes de Computadores", "Cálculo II",
+    "Engenharia de Software", "Banco de Dados", "Inteligência Artificial",
+    "Compiladores", "Petrobras", "Laboratório de Robótica", "2025.1", "2025.2",
+    "guarda-chuva azul", "carteira", "semestre letivo",
+]
+
+FRASES = [
+    "Prezados estudantes, segue o comunicado da secretaria do colegiado.",
+    "Informamos que o prazo para envio do formulário termina na próxima semana.",
+    "A banca será composta pelo orientador e dois professores convidados.",
+    "A empresa oferece bolsa, vale-transporte e possibilidade de contratação.",
+    "As inscrições estão abertas e o resultado será publicado no site.",
+    "O evento contará com palestras, oficinas e uma mesa redonda.",
+    "A reposição da aula será agendada conforme o horário da disciplina.",
+    "Solicitamos que regularizem o cadastro no SEI até o fim do período.",
+    "O objeto perdido pode ser retirado na secretaria.",
+    "Mais informações no edital anexo e no calendário acadêmico.",
+    "Atenciosamente, Coordenação do Colegiado de Engenharia de Computação.",
+    "Esta mensagem foi enviada automaticamente, favor não responder.",
+]
+
+
+def generate_emails(n: int, seed: int = 42, body_sentences: int = 8) -> List[EmailData]:
+    """Gera n emails sintéticos (assunto, remetente, data RFC 2822 e corpo)"""
+    rng = random.Random(seed)
+    start = datetime.datetime(2023, 1, 1, 8, 0, tzinfo=datetime.timezone.utc)
+    emails: List[EmailData] = []
+    for i in range(n):
+        subject = rng.choice(ASSUNTOS).format(x=rng.choice(TEMAS))
+        body = " ".join(rng.choice(FRASES) for _ in range(rng.randint(1, body_sentences)))
+        date = start + datetime.timedelta(minutes=37 * i + rng.randint(0, 30))
+        emails.append({
+            "id": str(i + 1),
+            "subject": subject,
+            "sender": "Colegiado ECOMP <ccecomp@ecomp.uefs.br>",
+            "date": format_datetime(date),
+            "labels": [],
+            "snippet": body,
+        })
+    return emails
+
+
+def build_message(email: EmailData, layout: str = "plain", attachment_kb: int = 0) -> bytes:
+    """
+    Mensagem RFC 822 de um email do corpus
+
+    Args:
+        layout: "plain" (só texto), "alternative" (texto + HTML) ou "html" (só HTML)
+        attachment_kb: se > 0, anexa um PDF desse tamanho depois do corpo
+    """
+    body = email["snippet"]
+    html = f"<html><body><p>{body}</p></body></html>"
+    if layout == "plain":
+        content = MIMEText(body, "plain", "utf-8")
+    elif layout == "html":
+        content = MIMEText(html, "html", "utf-8")
+    else:
+        content = MIMEMultipart("alternative")
+        content.attach(MIMEText(body, "plain", "utf-8"))
+        content.attach(MIMEText(html, "html", "utf-8"))
+
+    if attachment_kb:
+        msg = MIMEMultipart("mixed")
+        msg.attach(content)
+        pdf = b"%PDF-1.7\n" + bytes(attachment_kb * 1024)
+        msg.attach(MIMEApplication(pdf, "pdf", Name="edital.pdf"))
+    else:
+        msg = content
+
+    msg["Subject"] = email["subject"]
+    msg["From"] = email["sender"]
+    msg["To"] = "estudantes@ecomp.uefs.br"
+    msg["Date"] = email["date"]
+    msg["Message-ID"] = f"<{email['id']}.bench@ecomp.uefs.br>"
+    return msg.as_bytes()
+
+
+def generate_messages(n: int, seed: int = 42, attachment_every: int = 10,
+                      attachment_kb: int = 512) -> List[bytes]:
+    """
+    Gera n mensagens RFC 822 com a mistura de formatos vista na caixa real:
+    a maioria texto + HTML, algumas só texto ou só HTML e, a cada
+    attachment_every mensagens, um PDF anexo de attachment_kb KiB
+    """
+    rng = random.Random(seed)
+    messages: List[bytes] = []
+    for i, email in enumerate(generate_emails(n, seed)):
+        layout = rng.choices(["alternative", "plain", "html"], weights=[6, 3, 1])[0]
+        attach = attachment_kb if attachment_every and (i + 1) % attachment_every == 0 else 0
+        messages.append(build_message(email, layout, attach))
+    return messages
+
+
+# Corpus rotulado: cada categoria tem assuntos e frases próprias, mas as
+# palavras-chave são compartilhadas como na caixa real ("bolsa" em estágio,
+# monitoria e assistência; "inscrição" em monitoria e matrícula; "prazo" e
+# "disciplina" em quase tudo), e muitos emails são respostas/encaminhamentos
+CATEGORIAS_ROTULADAS = {
+    "Achados e Perdidos": (
+        ["{x} esquecido no laboratório", "Alguém viu um(a) {x}?", "Objeto encontrado: {x}"],
+        ["Foi encontrado um objeto no módulo 5 após a aula.",
+         "Quem perdeu pode procurar a portaria com documento.",
+         "Esqueci no auditório durante a palestra, se alguém achar me avise."],
+    ),
+    "Prováveis Concluintes / Formandos": (
+        ["Lista de prováveis concluintes {x}", "Colação de grau - turma {x}", "Formatura {x}"],
+        ["Confiram se o nome consta na lista de concluintes do semestre.",
+         "A solenidade de colação será no auditório central.",
+         "Os formandos devem entregar a documentação até o prazo."],
+    ),
+    "Avisos da Coordenação / Secretaria": (
+        ["Comunicado da coordenação - {x}", "Reunião do colegiado {x}", "Eleição para coordenador {x}"],
+        ["O colegiado se reunirá para deliberar sobre o calendário.",
+         "A secretaria estará fechada na próxima sexta-feira.",
+         "Segue a convocação para a reunião ordinária do colegiado."],
+    ),
+    "Estágio / Trainee / Oportunidades": (
+        ["Vaga de estágio - {x}", "Programa de trainee {x}", "Oportunidade na empresa {x}"],
+        ["A empresa oferece bolsa de estágio e vale-transporte.",
+         "Enviem o currículo para o processo seletivo até sexta.",
+         "Vaga remota para desenvolvedor com possibilidade de efetivação."],
+    ),
+    "TCC / Projeto Final": (
+        ["Defesa de TCC - {x}", "Cronograma do TCC {x}", "Banca de projeto final {x}"],
+        ["A defesa será pública e a banca avaliará a monografia.",
+         "O orientador deve enviar a ata após a apresentação.",
+         "Entreguem a versão final do trabalho de conclusão com as correções."],
+    ),
+    "Pesquisa / Iniciação Científica / Pós-Graduação": (
+        ["Seleção de mestrado {x}", "Bolsista de IC para o projeto {x}", "Chamada de artigos {x}"],
+        ["O laboratório procura estudantes para iniciação científica.",
+         "O programa de pós-graduação abriu vagas de mestrado e doutorado.",
+         "A submissão de artigos ao simpósio vai até o fim do mês."],
+    ),
+    "Monitoria / Tutoria / Bolsas Acadêmicas": (
+        ["Edital de monitoria - {x}", "Resultado da seleção de monitores {x}", "Tutoria de {x}"],
+        ["O monitor receberá bolsa e deve cumprir doze horas semanais.",
+         "A inscrição para monitoria é feita com o histórico escolar.",
+         "Os selecionados para tutoria devem assinar o termo de compromisso."],
+    ),
+    "Eventos / Palestras / Workshops": (
+        ["Palestra: {x}", "Semana acadêmica de computação {x}", "Workshop de {x}"],
+        ["O evento terá palestras, oficinas e emissão de certificado.",
+         "As vagas do minicurso são limitadas, garanta a sua.",
+         "A programação completa da semana acadêmica está no site."],
+    ),
+    "Disciplinas / Professores / Aulas": (
+        ["Aula de {x} cancelada", "Notas da prova de {x}", "Reposição de {x}"],
+        ["A aula de hoje foi cancelada e será reposta no sábado.",
+         "As notas da segunda avaliação já estão no sistema.",
+         "O professor disponibilizou os slides e a lista de exercícios."],
+    ),
+    "Matrícula / Ajuste de Disciplina / SEI": (
+        ["Período de matrícula {x}", "Ajuste de matrícula - {x}", "Processo SEI: {x}"],
+        ["O ajuste de matrícula será feito pelo sistema acadêmico.",
+         "Pedidos de trancamento devem ser abertos no SEI.",
+         "Confiram o comprovante de matrícula antes do início das aulas."],
+    ),
+    "Assistência Estudantil / Benefícios": (
+        ["Auxílio moradia - {x}", "Restaurante universitário {x}", "PROAE: cadastro {x}"],
+        ["A PROAE abriu o cadastro socioeconômico para auxílios.",
+         "O auxílio alimentação será pago até o quinto dia útil.",
+         "Estudantes em vulnerabilidade podem solicitar o benefício."],
+    ),
+    "Outros": (
+        ["Feliz {x}!", "Manutenção do servidor de email {x}", "Pesquisa de satisfação {x}"],
+        ["Desejamos a todos boas festas e um ótimo recesso.",
+         "O acesso ao email ficará indisponível durante a madrugada.",
+         "Responda ao questionário, leva menos de cinco minutos."],
+    ),
+}
+
+# Frases neutras, com palavras-chave que não indicam a categoria
+FRASES_RUIDO = [
+    "Qualquer dúvida, procurem a secretaria ou o coordenador.",
+    "Atenção ao prazo e ao calendário do semestre.",
+    "Mais informações no edital e no site do colegiado.",
+    "Lembrem de acompanhar o email institucional da disciplina.",
+    "Atenciosamente, Coordenação do Colegiado de Engenharia de Computação.",
+    "Esta mensagem foi enviada automaticamente, favor não responder.",
+]
+
+
+def generate_labeled_emails(n: int, seed: int = 7) -> List[EmailData]:
+    """
+    Gera n emails com a categoria correta em 'categoria_real'
+
+    Cada email mistura frases da sua categoria com ruído e, às vezes, com
+    uma frase de outra categoria (citações, encaminhamentos).
+    """
+    rng = random.Random(seed)
+    categorias = list(CATEGORIAS_ROTULADAS)
+    emails = generate_emails(n, seed, body_sentences=1)
+    for email in emails:
+        categoria = rng.choice(categorias)
+        assuntos, frases = CATEGORIAS_ROTULADAS[categoria]
+        subject = rng.choice(assuntos).format(x=rng.choice(TEMAS))
+        if rng.random() < 0.2:
+            subject = rng.choice(["Re: ", "Fwd: ", "Lembrete: "]) + subject
+        body = rng.sample(frases, rng.randint(1, 2))
+        body += rng.sample(FRASES_RUIDO, rng.randint(1, 3))
+        if rng.random() < 0.3:
+            body.append(rng.choice(CATEGORIAS_ROTULADAS[rng.choice(categorias)][1]))
+        rng.shuffle(body)
+        email.update(subject=subject, snippet=" ".join(body), categoria_real=categoria)
+    return emails
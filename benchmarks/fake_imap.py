@@ -0,0 +1,426 @@
+"""
+Servidor IMAP local (em processo) que imita o Gmail para benchmarks
+
+Implementa o subconjunto usado por GmailIMAPReader, sem TLS:
+CAPABILITY, LOGIN, SELECT, NOOP, LIST, SEARCH/UID SEARCH (FROM, SUBJECT,
+UNSEEN, SEEN, ALL, OR, NOT, UID e sequence sets), FETCH/UID FETCH (UID,
+FLAGS, RFC822, BODY[]/BODY.PEEK[] com seções HEADER.FIELDS e partes,
+parciais <0.N> e BODYSTRUCTURE), STORE/UID STORE, IDLE e LOGOUT.
+
+Uso: aponte IMAP_HOST/IMAP_PORT para server.address e IMAP_SSL=false.
+"""
+
+# Importações padrão do Python
+import re
+import email
+import socketserver
+import threading
+import time
+from email.message import Message
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Itens de FETCH: seções BODY[...] (com parcial) ou átomos
+_FETCH_ITEM_RE = re.compile(r'BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+\.\d+>)?|[A-Z0-9.\-]+')
+_SECTION_RE = re.compile(r'BODY(\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?')
+_SEARCH_TOKEN_RE = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+
+
+def _crlf(data: bytes) -> bytes:
+    return data.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _bodystructure(part: Message) -> str:
+    """BODYSTRUCTURE (RFC 3501) de uma parte, recursivo para multipart"""
+    if part.is_multipart():
+        children = "".join(_bodystructure(child) for child in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype().upper())})"
+
+    maintype = part.get_content_maintype().upper()
+    subtype = part.get_content_subtype().upper()
+    params = part.get_params()[1:] if part.get_params() else []
+    param_list = " ".join(f"{_quote(k.upper())} {_quote(v)}" for k, v in params)
+    encoding = (part.get("Content-Transfer-Encoding") or "7bit").upper()
+    body = _crlf(str(part.get_payload()).encode("utf-8", errors="replace"))
+    fields = (
+        f"{_quote(maintype)} {_quote(subtype)} ({param_list}) NIL NIL "
+        f"{_quote(encoding)} {len(body)}"
+    )
+    if maintype == "TEXT":
+        # Partes de texto também informam o número de linhas
+        lines = body.count(b"\n")
+        fields += f" {lines}"
+    return f"({fields})"
+
+
+def _parse_set(spec: str, maximum: int) -> Set[int]:
+    """Sequence set IMAP ("1:3,5,7:*") em números; "n:*" sempre inclui o máximo"""
+    numbers: Set[int] = set()
+    for piece in spec.split(","):
+        if ":" in piece:
+            a, b = piece.split(":", 1)
+            start = maximum if a == "*" else int(a)
+            end = maximum if b == "*" else int(b)
+            numbers.update(range(min(start, end), max(start, end) + 1))
+        else:
+            numbers.add(maximum if piece == "*" else int(piece))
+    return numbers
+
+
+class _StoredMessage:
+    __slots__ = ("uid", "data", "msg", "flags")
+
+    def __init__(self, uid: int, data: bytes):
+        self.uid = uid
+        self.data = _crlf(data)
+        self.msg = email.message_from_bytes(self.data)
+        self.flags: Set[str] = set()
+
+    def header_fields(self, names: List[str]) -> bytes:
+        """Seção HEADER.FIELDS: só os campos pedidos (com continuações), + linha vazia"""
+        wanted = {n.upper() for n in names}
+        head = self.data.split(b"\r\n\r\n", 1)[0]
+        out: List[bytes] = []
+        keep = False
+        for line in head.split(b"\r\n"):
+            if line[:1] in (b" ", b"\t"):
+                if keep:
+                    out.append(line)
+                continue
+            keep = line.split(b":", 1)[0].strip().decode("ascii", "ignore").upper() in wanted
+            if keep:
+                out.append(line)
+        return b"\r\n".join(out) + b"\r\n\r\n"
+
+    def part_body(self, section: str) -> bytes:
+        """Seção numérica ("1", "1.2"): conteúdo codificado da parte"""
+        part = self.msg
+        for index in section.split("."):
+            if part.is_multipart():
+                part = part.get_payload()[int(index) - 1]
+            elif index != "1":
+                return b""
+        if part.is_multipart():
+            return b""
+        return _crlf(str(part.get_payload()).encode("utf-8", errors="replace"))
+
+
+class FakeIMAPServer:
+    """
+    Caixa INBOX em memória servida em 127.0.0.1, numa porta livre
+
+    Args:
+        messages: mensagens RFC 822 iniciais (UIDs 1..n)
+        latency_ms: atraso artificial por comando (simula o RTT até o Gmail)
+        uidvalidity: UIDVALIDITY anunciado no SELECT
+    """
+
+    def __init__(self, messages: Optional[List[bytes]] = None, latency_ms: float = 0,
+                 uidvalidity: int = 1):
+        self.latency_ms = latency_ms
+        self.uidvalidity = uidvalidity
+        self._messages: List[_StoredMessage] = []
+        self._next_uid = 1
+        self._lock = threading.Lock()
+        self._idlers: Set["_Handler"] = set()
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+
+        # Contadores
+        self.connections = 0
+        self.logins = 0
+        self.commands = 0
+        self.bytes_sent = 0
+        # Momento (perf_counter) em que cada UID entrou na caixa
+        self.appended_at: Dict[int, float] = {}
+
+        for data in messages or []:
+            self.append(data)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def append(self, data: bytes, seen: bool = False) -> int:
+        """Entrega uma mensagem nova na INBOX e avisa as sessões em IDLE"""
+        with self._lock:
+            stored = _StoredMessage(self._next_uid, data)
+            if seen:
+                stored.flags.add("\\Seen")
+            self._next_uid += 1
+            self._messages.append(stored)
+            self.appended_at[stored.uid] = time.perf_counter()
+            exists = len(self._messages)
+            idlers = list(self._idlers)
+        for handler in idlers:
+            handler.send_untagged(f"{exists} EXISTS")
+        return stored.uid
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def start(self) -> "FakeIMAPServer":
+        server = self
+
+        class Handler(_Handler):
+            fake = server
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Uma sessão IMAP: um comando por linha, respostas com literais {n}"""
+
+    fake: FakeIMAPServer
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self._write_lock = threading.Lock()
+        with self.fake._lock:
+            self.fake.connections += 1
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+        self.fake.bytes_sent += len(data)
+
+    def send_untagged(self, text: str):
+        try:
+            self._write(f"* {text}\r\n".encode())
+        except OSError:
+            pass
+
+    def handle(self):
+        self._write(b"* OK [CAPABILITY IMAP4rev1 IDLE] Fake IMAP pronto\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.decode("utf-8", "replace").rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2:
+                self._write(b"* BAD comando vazio\r\n")
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+            with self.fake._lock:
+                self.fake.commands += 1
+            if self.fake.latency_ms:
+                time.sleep(self.fake.latency_ms / 1000)
+
+            by_uid = command == "UID"
+            if by_uid:
+                sub = args.split(" ", 1)
+                command, args = sub[0].upper(), (sub[1] if len(sub) > 1 else "")
+
+            handler: Optional[Callable] = getattr(self, f"cmd_{command.lower()}", None)
+            if handler is None:
+                self._write(f"{tag} BAD comando não suportado: {command}\r\n".encode())
+                continue
+            try:
+                result = handler(tag, args, by_uid)
+            except (ValueError, IndexError, KeyError) as e:
+                self._write(f"{tag} BAD {command}: {e}\r\n".encode())
+                continue
+            if result is False:
+                return
+
+    # --- Comandos ---
+
+    def cmd_capability(self, tag, args, by_uid):
+        self._write(f"* CAPABILITY IMAP4rev1 IDLE\r\n{tag} OK CAPABILITY concluído\r\n".encode())
+
+    def cmd_login(self, tag, args, by_uid):
+        with self.fake._lock:
+            self.fake.logins += 1
+        self._write(f"{tag} OK LOGIN concluído\r\n".encode())
+
+    def cmd_noop(self, tag, args, by_uid):
+        self._write(f"{tag} OK NOOP concluído\r\n".encode())
+
+    def cmd_list(self, tag, args, by_uid):
+        self._write(f'* LIST (\\HasNoChildren) "/" "INBOX"\r\n{tag} OK LIST concluído\r\n'.encode())
+
+    def cmd_select(self, tag, args, by_uid):
+        with self.fake._lock:
+            exists = len(self.fake._messages)
+            uidnext = self.fake._next_uid
+        self._write(
+            f"* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)\r\n"
+            f"* {exists} EXISTS\r\n* 0 RECENT\r\n"
+            f"* OK [UIDVALIDITY {self.fake.uidvalidity}] UIDs válidos\r\n"
+            f"* OK [UIDNEXT {uidnext}] Próximo UID\r\n"
+            f"{tag} OK [READ-WRITE] SELECT concluído\r\n".encode()
+        )
+
+    cmd_examine = cmd_select
+
+    def cmd_logout(self, tag, args, by_uid):
+        self._write(f"* BYE até logo\r\n{tag} OK LOGOUT concluído\r\n".encode())
+        return False
+
+    def cmd_idle(self, tag, args, by_uid):
+        with self.fake._lock:
+            self.fake._idlers.add(self)
+        try:
+            self._write(b"+ idling\r\n")
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    break
+        finally:
+            with self.fake._lock:
+                self.fake._idlers.discard(self)
+        self._write(f"{tag} OK IDLE concluído\r\n".encode())
+
+    def _snapshot(self) -> List[_StoredMessage]:
+        with self.fake._lock:
+            return list(self.fake._messages)
+
+    def _select_set(self, spec: str, by_uid: bool, messages: List[_StoredMessage]):
+        """(número de sequência, mensagem) do sequence set, por UID ou sequência"""
+        if not messages:
+            return []
+        if by_uid:
+            wanted = _parse_set(spec, messages[-1].uid)
+            return [(i + 1, m) for i, m in enumerate(messages) if m.uid in wanted]
+        wanted = _parse_set(spec, len(messages))
+        return [(i + 1, m) for i, m in enumerate(messages) if i + 1 in wanted]
+
+    def cmd_search(self, tag, args, by_uid):
+        messages = self._snapshot()
+        tokens = _SEARCH_TOKEN_RE.findall(args)
+        if tokens and tokens[0].upper() == "CHARSET":
+            tokens = tokens[2:]
+        limits = (len(messages), messages[-1].uid if messages else 0)
+        matcher, pos = _parse_search_keys(tokens, 0, limits)
+        if pos != len(tokens):
+            raise ValueError(f"critério inesperado: {tokens[pos]}")
+        found = [
+            str(m.uid if by_uid else seq)
+            for seq, m in enumerate(messages, start=1)
+            if matcher(seq, m)
+        ]
+        self._write(f"* SEARCH {' '.join(found)}\r\n{tag} OK SEARCH concluído\r\n".encode())
+
+    def cmd_fetch(self, tag, args, by_uid):
+        spec, items = args.split(" ", 1)
+        names = _FETCH_ITEM_RE.findall(items.upper())
+        messages = self._snapshot()
+        out = bytearray()
+        for seq, m in self._select_set(spec, by_uid, messages):
+            fields: List[bytes] = []
+            if by_uid and "UID" not in names:
+                fields.append(f"UID {m.uid}".encode())
+            for name in names:
+                fields.append(self._fetch_item(name, m))
+            out += f"* {seq} FETCH (".encode() + b" ".join(fields) + b")\r\n"
+        out += f"{tag} OK FETCH concluído\r\n".encode()
+        self._write(bytes(out))
+
+    def _fetch_item(self, name: str, m: _StoredMessage) -> bytes:
+        if name == "UID":
+            return f"UID {m.uid}".encode()
+        if name == "FLAGS":
+            return f"FLAGS ({' '.join(sorted(m.flags))})".encode()
+        if name == "BODYSTRUCTURE":
+            return f"BODYSTRUCTURE {_bodystructure(m.msg)}".encode()
+        if name == "RFC822":
+            m.flags.add("\\Seen")
+            return f"RFC822 {{{len(m.data)}}}\r\n".encode() + m.data
+
+        match = _SECTION_RE.fullmatch(name)
+        if not match:
+            raise ValueError(f"item de FETCH não suportado: {name}")
+        peek, section, start, length = match.groups()
+        if section.startswith("HEADER.FIELDS"):
+            data = m.header_fields(section[section.index("(") + 1:section.rindex(")")].split())
+        elif section == "":
+            data = m.data
+        elif section == "HEADER":
+            data = m.data.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n"
+        else:
+            data = m.part_body(section)
+        label = f"BODY[{section}]"
+        if start is not None:
+            data = data[int(start):int(start) + int(length)]
+            label += f"<{start}>"
+        if not peek:
+            m.flags.add("\\Seen")
+        return f"{label} {{{len(data)}}}\r\n".encode() + data
+
+    def cmd_store(self, tag, args, by_uid):
+        spec, action, flags = args.split(" ", 2)
+        names = set(flags.strip("()").split())
+        action = action.upper()
+        out = bytearray()
+        for seq, m in self._select_set(spec, by_uid, self._snapshot()):
+            if action.startswith("+"):
+                m.flags |= names
+            elif action.startswith("-"):
+                m.flags -= names
+            else:
+                m.flags = set(names)
+            if not action.endswith(".SILENT"):
+                uid = f"UID {m.uid} " if by_uid else ""
+                out += f"* {seq} FETCH ({uid}FLAGS ({' '.join(sorted(m.flags))}))\r\n".encode()
+        out += f"{tag} OK STORE concluído\r\n".encode()
+        self._write(bytes(out))
+
+
+def _parse_search_keys(tokens: List[str], pos: int, limits: Tuple[int, int],
+                       until: Optional[str] = None):
+    """
+    Lê chaves de SEARCH até o fim (ou até o ")"), combinadas com E
+
+    limits: (total de mensagens, maior UID), valores de "*" nos sequence sets
+    """
+    keys = []
+    while pos < len(tokens) and tokens[pos] != until:
+        key, pos = _parse_search_key(tokens, pos, limits)
+        keys.append(key)
+    return (lambda seq, m: all(k(seq, m) for k in keys)), pos
+
+
+def _parse_search_key(tokens: List[str], pos: int, limits: Tuple[int, int]):
+    token = tokens[pos]
+    upper = token.upper()
+    if token == "(":
+        matcher, pos = _parse_search_keys(tokens, pos + 1, limits, until=")")
+        return matcher, pos + 1
+    if upper == "OR":
+        left, pos = _parse_search_key(tokens, pos + 1, limits)
+        right, pos = _parse_search_key(tokens, pos, limits)
+        return (lambda seq, m: left(seq, m) or right(seq, m)), pos
+    if upper == "NOT":
+        inner, pos = _parse_search_key(tokens, pos + 1, limits)
+        return (lambda seq, m: not inner(seq, m)), pos
+    if upper == "ALL":
+        return (lambda seq, m: True), pos + 1
+    if upper in ("UNSEEN", "SEEN"):
+        seen = upper == "SEEN"
+        return (lambda seq, m: ("\\Seen" in m.flags) == seen), pos + 1
+    if upper in ("FROM", "SUBJECT", "TO"):
+        needle = tokens[pos + 1].strip('"').lower()
+        header = upper.capitalize()
+        return (lambda seq, m: needle in (m.msg.get(header) or "").lower()), pos + 2
+    if upper == "UID":
+        uids = _parse_set(tokens[pos + 1], limits[1])
+        return (lambda seq, m: m.uid in uids), pos + 2
+    if token[0].isdigit() or token[0] == "*":
+        seqs = _parse_set(token, limits[0])
+        return (lambda seq, m: seq in seqs), pos + 1
+    raise ValueError(f"critério não suportado: {token}")
@@ -0,0 +1,501 @@
+"""
+Suíte de benchmarks ponta a ponta do pipeline
+
+Cada etapa roda em um subprocesso próprio (pico de RSS isolado), contra um
+servidor IMAP local (benchmarks.fake_imap) e um stub da API InboxStream
+(benchmarks.stub_api), com o corpus sintético de benchmarks.corpus.
+Para cada etapa: vazão, latência p50/p99 por operação e pico de RSS.
+O resultado vai para benchmarks/results/<data>-<commit>.json.
+
+Uso:
+    python -m benchmarks.run_all [--n 2000] [--stages parse,classify] [--compare anterior.json]
+"""
+
+# Importações padrão do Python
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Remetente do corpus (benchmarks.corpus) e da conta de teste
+_SENDER = "ccecomp@ecomp.uefs.br"
+
+
+# --- Medição ---
+
+def _rss_bytes() -> int:
+    """RSS atual do processo (Linux: /proc/self/statm; demais: pico via getrusage)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _RSSSampler:
+    """Amostra o RSS em segundo plano durante a etapa e guarda o pico"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_rss = _rss_bytes()
+        self.peak = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self) -> "_RSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def _timed(fn: Callable, items) -> List[float]:
+    """Chama fn(item) para cada item; latência de cada chamada em ms"""
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# --- Ambiente isolado ---
+
+def _isolate_env(workdir: str, imap_address=None, api_url: Optional[str] = None):
+    """
+    Configura o ambiente ANTES de importar o app: os módulos leem as
+    variáveis na importação (bancos e estado em um diretório temporário)
+    """
+    os.environ.update({
+        "GMAIL_RECIPIENT": "bench@ecomp.uefs.br",
+        "GMAIL_PASSWORD": "senha-de-app",
+        "GMAIL_SENDER": _SENDER,
+        "ACCOUNTS_FILE": "",
+        "OUTBOX_DB_PATH": os.path.join(workdir, "outbox.db"),
+        "STORE_DB_PATH": os.path.join(workdir, "emails.db"),
+        "DEDUP_DB_PATH": os.path.join(workdir, "dedup.db"),
+        "SYNC_STATE_FILE": os.path.join(workdir, "sync_state.json"),
+        "SCHEDULER_STATE_FILE": os.path.join(workdir, "scheduler_state.json"),
+        "BACKFILL_CHECKPOINT_FILE": os.path.join(workdir, "backfill_checkpoint.json"),
+        "RAW_CACHE_DIR": os.path.join(workdir, "raw_cache"),
+    })
+    if imap_address:
+        os.environ.update({
+            "IMAP_HOST": imap_address[0], "IMAP_PORT": str(imap_address[1]), "IMAP_SSL": "false",
+        })
+    if api_url:
+        os.environ["INBOXSTREAM_API_URL"] = api_url
+        os.environ["INBOXSTREAM_BATCH_API_URL"] = api_url + "batch"
+
+
+# --- Etapas ---
+# Cada etapa recebe (n, workdir) e retorna {"items": ..., "seconds": ..., "samples_ms": [...]};
+# a preparação fica fora de "seconds", mas dentro do processo (e do RSS inicial).
+
+def _start_imap(n: int):
+    from benchmarks.corpus import generate_messages
+    from benchmarks.fake_imap import FakeIMAPServer
+    return FakeIMAPServer(generate_messages(n)).start()
+
+
+def _reader(n: int, workdir: str):
+    server = _start_imap(n)
+    _isolate_env(workdir, imap_address=server.address)
+    from app.services.gmail_imap import GmailIMAPReader
+    reader = GmailIMAPReader()
+    reader.select_inbox()
+    return server, reader
+
+
+def stage_get_email_details(n: int, workdir: str) -> Dict[str, Any]:
+    """Caminho original: um FETCH BODY[] + parse por mensagem (modo unseen)"""
+    server, reader = _reader(n, workdir)
+    ids = [str(i) for i in range(1, n + 1)]
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(reader.get_email_details, ids)
+        seconds = time.perf_counter() - start
+    reader.disconnect()
+    server.stop()
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss,
+            "extra": {"imap_commands": server.commands}}
+
+
+def stage_fetch_batch(n: int, workdir: str) -> Dict[str, Any]:
+    """FETCH em lote por UID (headers + BODYSTRUCTURE, depois só a parte de texto)"""
+    server, reader = _reader(n, workdir)
+    from app.services.gmail_imap import FETCH_BATCH_SIZE
+    chunks = _chunks(list(range(1, n + 1)), FETCH_BATCH_SIZE)
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(reader.fetch_raw_batch, chunks)
+        seconds = time.perf_counter() - start
+    reader.disconnect()
+    server.stop()
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss,
+            "unit": f"lote de {FETCH_BATCH_SIZE}",
+            "extra": {"imap_commands": server.commands, "imap_bytes": server.bytes_sent}}
+
+
+def stage_parse(n: int, workdir: str) -> Dict[str, Any]:
+    """GmailIMAPReader.parse_raw sobre RawEmail do FETCH em lote"""
+    server, reader = _reader(n, workdir)
+    raws = reader.fetch_raw_batch(list(range(1, n + 1)))
+    reader.disconnect()
+    server.stop()
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(reader.parse_raw, raws)
+        seconds = time.perf_counter() - start
+    return {"items": len(raws), "seconds": seconds, "samples_ms": samples, "rss": rss}
+
+
+def stage_parse_rfc822(n: int, workdir: str) -> Dict[str, Any]:
+    """GmailIMAPReader.parse_raw sobre mensagens completas (modo unseen, com anexos)"""
+    _isolate_env(workdir)
+    from benchmarks.corpus import generate_messages
+    from app.services.gmail_imap import GmailIMAPReader
+    raws = [{"id": str(i), "account": "", "rfc822": data}
+            for i, data in enumerate(generate_messages(n), start=1)]
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(GmailIMAPReader.parse_raw, raws)
+        seconds = time.perf_counter() - start
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss}
+
+
+def _corpus(n: int, workdir: str):
+    _isolate_env(workdir)
+    from benchmarks.corpus import generate_emails
+    return generate_emails(n)
+
+
+def stage_normalize_text(n: int, workdir: str) -> Dict[str, Any]:
+    """EmailClassifier.normalize_text (assunto e corpo), cache vazio"""
+    emails = _corpus(n, workdir)
+    from app.services.EmailClassifer import EmailClassifier, normalize_cache
+    classifier = EmailClassifier()
+    normalize_cache.clear()
+
+    def normalize(email):
+        classifier.normalize_text(email["subject"])
+        classifier.normalize_text(email["snippet"])
+
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(normalize, emails)
+        seconds = time.perf_counter() - start
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss}
+
+
+def stage_classify_email(n: int, workdir: str) -> Dict[str, Any]:
+    """EmailClassifier.classify_email por email (normalização incluída, cache vazio)"""
+    emails = _corpus(n, workdir)
+    from app.services.EmailClassifer import EmailClassifier, normalize_cache
+    classifier = EmailClassifier()
+    normalize_cache.clear()
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(classifier.classify_email, emails)
+        seconds = time.perf_counter() - start
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss}
+
+
+def stage_build_payload(n: int, workdir: str) -> Dict[str, Any]:
+    """inbox_stream.build_payload (inclui a conversão da data para ISO UTC)"""
+    emails = _corpus(n, workdir)
+    from app.api.inbox_stream import build_payload
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(build_payload, emails)
+        seconds = time.perf_counter() - start
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss}
+
+
+def _stub_and_corpus(n: int, workdir: str):
+    from benchmarks.stub_api import StubAPI
+    stub = StubAPI().start()
+    _isolate_env(workdir, api_url=stub.url)
+    from benchmarks.corpus import generate_emails
+    return stub, generate_emails(n)
+
+
+def stage_send_email_to_api(n: int, workdir: str) -> Dict[str, Any]:
+    """inbox_stream.send_email_to_api: um POST por email (sessão keep-alive)"""
+    stub, emails = _stub_and_corpus(n, workdir)
+    from app.api.inbox_stream import send_email_to_api
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(send_email_to_api, emails)
+        seconds = time.perf_counter() - start
+    stub.stop()
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss,
+            "extra": {"http_requests": stub.requests, "http_connections": stub.connections}}
+
+
+def stage_send_batch_to_api(n: int, workdir: str) -> Dict[str, Any]:
+    """inbox_stream.send_batch_to_api: rota de lote, BATCH_CHUNK_SIZE emails por POST"""
+    stub, emails = _stub_and_corpus(n, workdir)
+    from app.api.inbox_stream import send_batch_to_api, BATCH_CHUNK_SIZE
+    with _RSSSampler() as rss:
+        start = time.perf_counter()
+        samples = _timed(send_batch_to_api, _chunks(emails, BATCH_CHUNK_SIZE))
+        seconds = time.perf_counter() - start
+    stub.stop()
+    return {"items": n, "seconds": seconds, "samples_ms": samples, "rss": rss,
+            "unit": f"lote de {BATCH_CHUNK_SIZE}",
+            "extra": {"http_requests": stub.requests, "http_connections": stub.connections}}
+
+
+def _run_service(n: int, workdir: str, live: int, timeout: float) -> Dict[str, Any]:
+    """
+    Sobe o pipeline completo como em main.py (IngestionPipeline + EmailStore +
+    DedupFilter + FlagSync + Outbox + OutboxWorker) contra o IMAP local e o stub da API
+
+    n mensagens já estão na caixa ao iniciar (backlog); depois chegam `live`
+    mensagens, uma a cada 20 ms. Latência = entrega no stub - chegada na caixa
+    (ou o início do pipeline, para o backlog).
+    """
+    from benchmarks.corpus import generate_messages
+    from benchmarks.fake_imap import FakeIMAPServer
+    from benchmarks.stub_api import StubAPI
+
+    messages = generate_messages(n + live)
+    server = FakeIMAPServer(messages[:n]).start()
+    stub = StubAPI().start()
+    _isolate_env(workdir, imap_address=server.address, api_url=stub.url)
+    from app.services.outbox import Outbox, OutboxWorker
+    from app.services.email_store import EmailStore
+    from app.services.dedup import DedupFilter
+    from app.services.pipeline import IngestionPipeline
+    from app.services.flag_sync import FlagSync, FLAG_SYNC_ENABLED
+
+    flag_sync = FlagSync() if FLAG_SYNC_ENABLED else None
+    outbox = Outbox()
+    worker = OutboxWorker(outbox, on_delivered=lambda e: flag_sync.add([e]) if flag_sync else None)
+    store = EmailStore()
+    dedup = DedupFilter()
+    pipeline = IngestionPipeline(outbox, store=store, dedup=dedup, flag_sync=flag_sync)
+    total = n + live
+
+    async def run() -> float:
+        worker.start()
+        await pipeline.start()
+        started = time.perf_counter()
+        for data in messages[n:]:
+            await asyncio.sleep(0.02)
+            server.append(data)
+        deadline = started + timeout
+        # Com DEDUP_BY_CONTENT=true, reenvios com o mesmo texto no corpus são descartados pelo DedupFilter
+        while len(stub.received_at) + dedup.duplicates_by_content < total \
+                and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        await pipeline.stop()
+        worker.stop()
+        return started
+
+    with _RSSSampler() as rss:
+        started = asyncio.run(run())
+    seconds = max(stub.received_at.values(), default=started) - started
+
+    samples = [
+        (at - max(server.appended_at.get(int(uid), started), started)) * 1000
+        for uid, at in stub.received_at.items()
+        if uid.isdigit()
+    ]
+    stages = pipeline.stats()["stages"]
+    dedup_stats = dedup.stats()
+    store.close()
+    dedup.close()
+    outbox.close()
+    server.stop()
+    stub.stop()
+    return {"items": len(stub.received_at), "seconds": seconds, "samples_ms": samples, "rss": rss,
+            "unit": "email (chegada → entrega)",
+            "extra": {"expected": total, "duplicates": dedup_stats["duplicates"], "imap_commands": server.commands,
+                      "imap_bytes": server.bytes_sent, "http_requests": stub.requests, "pipeline": stages,
+                      "flag_sync": flag_sync.stats() if flag_sync else None}}
+
+
+def stage_end_to_end(n: int, workdir: str) -> Dict[str, Any]:
+    """Backlog de n emails: polling por UID até tudo chegar ao stub"""
+    os.environ.update({
+        "SYNC_MODE": "uid", "WATCH_MODE": "poll",
+        # Mede o processamento, não a espera entre buscas
+        "POLL_MIN_SECONDS": "0.05", "POLL_MAX_SECONDS": "0.05",
+        # A primeira sincronização importa a caixa inteira (padrão: só as 200 mais recentes)
+        "SYNC_RESYNC_LIMIT": str(n),
+    })
+    return _run_service(n, workdir, live=0, timeout=120)
+
+
+def stage_end_to_end_unseen(n: int, workdir: str) -> Dict[str, Any]:
+    """Backlog de n emails no modo unseen: as entregues são marcadas como lidas antes da próxima busca"""
+    os.environ.update({
+        "SYNC_MODE": "unseen", "WATCH_MODE": "poll",
+        "POLL_MIN_SECONDS": "0.05", "POLL_MAX_SECONDS": "0.05",
+    })
+    return _run_service(n, workdir, live=0, timeout=120)
+
+
+def stage_end_to_end_live(n: int, workdir: str) -> Dict[str, Any]:
+    """Chegadas contínuas com IMAP IDLE: latência da caixa até a API"""
+    os.environ.update({"SYNC_MODE": "uid", "WATCH_MODE": "idle"})
+    return _run_service(0, workdir, live=max(20, min(n // 10, 200)), timeout=60)
+
+
+STAGES: Dict[str, Callable[[int, str], Dict[str, Any]]] = {
+    "get_email_details": stage_get_email_details,
+    "fetch_batch": stage_fetch_batch,
+    "parse": stage_parse,
+    "parse_rfc822": stage_parse_rfc822,
+    "normalize_text": stage_normalize_text,
+    "classify_email": stage_classify_email,
+    "build_payload": stage_build_payload,
+    "send_email_to_api": stage_send_email_to_api,
+    "send_batch_to_api": stage_send_batch_to_api,
+    "end_to_end": stage_end_to_end,
+    "end_to_end_unseen": stage_end_to_end_unseen,
+    "end_to_end_live": stage_end_to_end_live,
+}
+
+
+def run_stage(name: str, n: int) -> Dict[str, Any]:
+    """Executa uma etapa neste processo (chamado no subprocesso)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        # Os serviços fazem print; a saída padrão fica só para o JSON
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            raw = STAGES[name](n, workdir)
+
+    samples = raw["samples_ms"]
+    rss: _RSSSampler = raw["rss"]
+    return {
+        "items": raw["items"],
+        "seconds": round(raw["seconds"], 4),
+        "throughput_per_s": round(raw["items"] / raw["seconds"], 1) if raw["seconds"] else None,
+        "unit": raw.get("unit", "email"),
+        "p50_ms": round(_percentile(samples, 0.50), 3),
+        "p99_ms": round(_percentile(samples, 0.99), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+        "rss_start_mib": round(rss.start_rss / 2**20, 1),
+        "peak_rss_mib": round(rss.peak / 2**20, 1),
+        **raw.get("extra", {}),
+    }
+
+
+# --- Orquestração ---
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else "desconhecido"
+    except OSError:
+        return "desconhecido"
+
+
+def _spawn(name: str, n: int) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_all", "--stage", name, "--n", str(n)],
+        capture_output=True, text=True,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        error = (proc.stderr.strip().splitlines() or ["sem saída"])[-1]
+        return {"error": error}
+    return json.loads(lines[-1])
+
+
+def _print_row(name: str, result: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    if "error" in result:
+        print(f"{name:<20} ERRO: {result['error']}")
+        return
+    line = (
+        f"{name:<20} {result['throughput_per_s'] or 0:>10,.0f}/s  "
+        f"p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+        f"RSS {result['peak_rss_mib']:>6.1f} MiB"
+    )
+    if previous and previous.get("throughput_per_s") and result.get("throughput_per_s"):
+        ratio = result["throughput_per_s"] / previous["throughput_per_s"]
+        p99_ratio = result["p99_ms"] / previous["p99_ms"] if previous.get("p99_ms") else 0
+        line += f"   vazão x{ratio:.2f}  p99 x{p99_ratio:.2f}"
+    print(line + f"   [{result['unit']}]")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de notificações")
+    parser.add_argument("--n", type=int, default=2000, help="emails no corpus")
+    parser.add_argument("--stages", default=",".join(STAGES), help="etapas separadas por vírgula")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--out", default=RESULTS_DIR, help="diretório dos resultados")
+    parser.add_argument("--stage", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.n)))
+        return
+
+    names = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in names if s not in STAGES]
+    if unknown:
+        parser.error(f"etapas desconhecidas: {', '.join(unknown)}")
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("stages", {})
+
+    commit = _git_commit()
+    print(f"Benchmarks ({args.n:,} emails, commit {commit})\n")
+    results: Dict[str, Any] = {}
+    for name in names:
+        results[name] = _spawn(name, args.n)
+        _print_row(name, results[name], previous.get(name))
+
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "n": args.n,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "stages": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Servidor HTTP local que imita a API InboxStream (sink de entregas)
+
+POST /api/v1/emails/       -> 201 (um email)
+POST /api/v1/emails/batch  -> 200 com [{"id": ..., "status": 201}, ...]
+                              ou batch_status (404) se batch=False
+"""
+
+# Importações padrão do Python
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+class StubAPI:
+    """
+    Sobe o stub em uma thread, numa porta livre de 127.0.0.1
+
+    Args:
+        batch: se False, a rota de lote responde batch_status
+        batch_status: status da rota de lote desativada (404, 405 ou 501)
+        latency_ms: atraso artificial por requisição
+        fail_every: se > 0, cada N-ésimo email recebe 500 (testes de retry)
+    """
+
+    def __init__(self, batch: bool = True, latency_ms: float = 0, fail_every: int = 0, batch_status: int = 404):
+        self.batch = batch
+        self.batch_status = batch_status
+        self.latency_ms = latency_ms
+        self.fail_every = fail_every
+        self.requests = 0
+        self.received = 0
+        self.connections = 0
+        # Primeira entrega aceita de cada id (perf_counter), para medir latência ponta a ponta
+        self.received_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/emails/"
+
+    def _next_ok(self, item_id=None) -> bool:
+        with self._lock:
+            self.received += 1
+            ok = not (self.fail_every and self.received % self.fail_every == 0)
+            if ok and item_id is not None:
+                self.received_at.setdefault(str(item_id), time.perf_counter())
+            return ok
+
+    def start(self) -> "StubAPI":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            # Cabeçalho e corpo num só write, sem Nagle: evita o atraso de
+            # ACK atrasado (~40 ms) em conexões reaproveitadas
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body=None):
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"null")
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+
+                if self.path.rstrip("/").endswith("/batch"):
+                    if not stub.batch:
+                        return self._reply(stub.batch_status, {"detail": "Not Found"})
+                    results = [
+                        {"id": item.get("id"), "status": 201 if stub._next_ok(item.get("id")) else 500}
+                        for item in payload
+                    ]
+                    return self._reply(200, results)
+
+                self._reply(201 if stub._next_ok(payload.get("id")) else 500, {"id": payload.get("id")})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
@@ -4,8 +4,10 @@ Aplicação principal do sistema de notificações
 """
 # Importações padrão do Python
 import os
-import time
-from typing import List
+import asyncio
+import datetime
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # --- Força o Python a usar a pasta raiz do script como diretório de trabalho ---
@@ -13,30 +15,34 @@ ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 os.chdir(ROOT_DIR)
 # ----------------
 
+# Carrega variáveis de ambiente (antes dos módulos internos, que leem o .env na importação)
+load_dotenv()
+
 # Importações de módulos internos
-from app.services.gmail_imap import fetch_unread_emails
-from app.services.EmailClassifer import EmailClassifier
+from app.config.logging_config import setup_logging
 from app.models.EmailData import EmailData
-from app.api.inbox_stream import send_email_to_api
+from app.services.backfill import MailboxBackfill
+from app.services.outbox import Outbox, OutboxWorker
+from app.services.pipeline import IngestionPipeline
+from app.services.email_store import EmailStore
+from app.services.live_feed import LiveFeed
+from app.services.dedup import DedupFilter
+from app.services.raw_cache import RawMessageCache, RAW_CACHE_ENABLED
+from app.services.reclassifier import RuleReclassifier, RECLASSIFY_ENABLED
+from app.services.flag_sync import FlagSync, FLAG_SYNC_ENABLED
+from app.config.rules import load_rules
+from app.utils.metrics import REGISTRY, CONTENT_TYPE, Gauge, recent_spans
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.gmail_imap import fetch_unread_emails
 from threading import Thread
 import logging
 
-# --- Configuração de Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# --- Configuração de Logging (fila + thread de escrita, ver app/config/logging_config.py) ---
+setup_logging()
 logger = logging.getLogger(__name__)
 
-
 app = FastAPI(
     title="InboxStream API",
     version="v1",
@@ -51,45 +57,217 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Carrega variáveis de ambiente
-load_dotenv()
-
-def get_emails():
-    """Função para obter emails classificados"""
-    emails: List[EmailData] = fetch_unread_emails(max_results=2, unread_only=True)
-    classifier = EmailClassifier()
-    classificados: List[EmailData] = classifier.classify_all(emails)
-    logger.info(f"📂 {len(classificados)} emails classificados")
-    for e in classificados:
-        categoria = e.get("categoria", "Outros")
-        try:
-            send_email_to_api(e)
-            logger.info(f"✅ Email enviado - Categoria: [{categoria}] Assunto: {e['subject']}")
-        except Exception as ex:
-            logger.error(f"❌ Falha ao enviar email ID {e['id']} para API: {ex}")
-            continue
-        # print(f"De: {e['sender']}")
-        # print(f"Prévia: {e['snippet'][:80]}...\n")
-
-def watch_emails(poll_interval_seconds: int = 60):
-    """Polling: busca emails a cada poll_interval_seconds (padrão 300s = 5min)"""
-    logger.info(f"⏱️  Iniciando polling: a cada {poll_interval_seconds} segundos. (Ctrl+C para parar)\n")
+def _notification_latency(email: EmailData) -> Optional[float]:
+    """Segundos entre o header Date do email e agora (latência fim a fim)"""
     try:
-        while True:
-            get_emails()
-            time.sleep(poll_interval_seconds)
-    except KeyboardInterrupt:
-        logger.warning("⛔ Polling interrompido pelo usuário. Saindo...")
+        sent_at = parsedate_to_datetime(email.get("date", ""))
+        if sent_at.tzinfo is None:
+            sent_at = sent_at.replace(tzinfo=datetime.timezone.utc)
+        return (datetime.datetime.now(datetime.timezone.utc) - sent_at).total_seconds()
+    except Exception:
+        return None
+
+def _on_delivered(email: EmailData):
+    """Log de cada entrega confirmada (2xx) pela outbox; a mensagem é marcada no IMAP na próxima busca"""
+    if flag_sync:
+        flag_sync.add([email])
+    categoria = email.get("categoria", "Outros")
+    logger.info(f"✅ Email enviado - Categoria: [{categoria}] Assunto: {email.get('subject', '')}")
+    latency = _notification_latency(email)
+    if latency is not None:
+        logger.info(f"⏱️  Latência ({pipeline.mode}): {latency:.1f}s desde o envio")
+
+# Entregues são marcadas como lidas (ou etiquetadas) em lote, antes da próxima busca
+flag_sync = FlagSync() if FLAG_SYNC_ENABLED else None
+
+# Emails classificados são gravados na outbox antes da entrega; o worker
+# entrega com retry, desacoplando a ingestão IMAP da latência da API
+outbox = Outbox()
+outbox_worker = OutboxWorker(outbox, on_delivered=_on_delivered)
+
+# Cópia local dos emails classificados, para busca e filtro por categoria
+store = EmailStore()
+# Emails recém-classificados são publicados aos clientes conectados em /stream
+live_feed = LiveFeed()
+# Emails já processados (reprocessamento após falhas, reenvios) são descartados antes da classificação
+dedup = DedupFilter()
+# Mensagens brutas em disco: reclassificar o histórico sem baixar do IMAP de novo
+raw_cache = RawMessageCache() if RAW_CACHE_ENABLED else None
+# Ingestão assíncrona: fetch → parse → classify → outbox, com filas limitadas
+pipeline = IngestionPipeline(
+    outbox, store=store, dedup=dedup, on_classified=live_feed.publish, raw_cache=raw_cache,
+    flag_sync=flag_sync,
+)
+# Mudou o arquivo de regras: reclassifica em segundo plano só os emails afetados
+reclassifier = RuleReclassifier(store) if RECLASSIFY_ENABLED else None
+
+# Gauges calculados na hora da coleta (GET /metrics)
+Gauge("outbox_depth", "Entregas pendentes na outbox").set_function(lambda: outbox.stats()["depth"])
+Gauge("live_feed_subscribers", "Clientes conectados em /stream").set_function(
+    lambda: live_feed.stats()["subscribers"]
+)
+
+def _store_and_deliver(email: EmailData) -> bool:
+    """Grava no armazenamento local e enfileira a entrega (usado pelo backfill)"""
+    store.add(email)
+    return outbox.put(email)
 
 @app.on_event("startup")
 async def startup_event():
-    """Inicia o serviço de polling em uma thread separada"""
-    logger.info("🚀 Iniciando o serviço de polling...")
-    thread = Thread(target=watch_emails, args=(60,), daemon=True)
-    thread.start()
+    """Inicia o worker da outbox e o pipeline de ingestão no event loop"""
+    live_feed.bind(asyncio.get_running_loop())
+    outbox_worker.start()
+    if reclassifier:
+        reclassifier.start()
+    await pipeline.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Esvazia o pipeline e encerra o worker da outbox (pendências ficam no disco)"""
+    await pipeline.stop()
+    outbox_worker.stop()
+    outbox.close()
+    if reclassifier:
+        reclassifier.stop()
+    store.close()
+    dedup.close()
+    if raw_cache:
+        raw_cache.close()
 
 @app.get("/", tags=["Health"])
 def health_check():
     return {"status": "ok", "service": "InboxStream API is running!"}
 
+# Backfill em andamento (um por vez)
+backfill: Optional[MailboxBackfill] = None
+
+@app.post("/backfill", tags=["Backfill"], status_code=202)
+def start_backfill(account: Optional[str] = None):
+    """
+    Inicia a importação histórica da caixa em segundo plano
+
+    Com várias contas, informe o nome da conta (?account=...)
+    """
+    global backfill
+    if backfill is not None and backfill.running:
+        raise HTTPException(status_code=409, detail="Backfill já em andamento")
+    if account is None and len(pipeline.accounts) == 1:
+        selected = pipeline.accounts[0]
+    else:
+        selected = next((a for a in pipeline.accounts if a["name"] == account), None)
+    if selected is None:
+        raise HTTPException(status_code=404, detail="Conta não encontrada neste shard")
+    backfill = MailboxBackfill(deliver=_store_and_deliver, dedup=dedup, account=selected, raw_cache=raw_cache)
+    Thread(target=backfill.run, daemon=True).start()
+    return {"status": "started"}
+
+@app.get("/backfill", tags=["Backfill"])
+def backfill_status():
+    """Progresso e vazão (emails/s) do último backfill"""
+    if backfill is None:
+        return {"running": False}
+    return backfill.status()
+
+@app.post("/reprocess", tags=["Backfill"], status_code=202)
+async def start_reprocess(account: Optional[str] = None, since: Optional[float] = None,
+                          limit: Optional[int] = Query(None, ge=1)):
+    """
+    Reclassifica e reenvia as mensagens do cache local, sem acessar o IMAP
+
+    Útil após mudar as palavras-chave ou a extração do corpo. Filtros
+    opcionais: conta, gravadas a partir de since (epoch) e limite.
+    """
+    if raw_cache is None:
+        raise HTTPException(status_code=404, detail="Cache de mensagens desativado (RAW_CACHE_ENABLED)")
+    if pipeline.reprocess_status.get("running"):
+        raise HTTPException(status_code=409, detail="Reprocessamento já em andamento")
+    asyncio.create_task(pipeline.reprocess_from_cache(account=account, since=since, limit=limit))
+    return {"status": "started"}
+
+@app.get("/reprocess", tags=["Backfill"])
+def reprocess_status():
+    """Progresso do último reprocessamento e ocupação do cache"""
+    return {**pipeline.reprocess_status, "cache": raw_cache.stats() if raw_cache else None}
+
+@app.get("/emails", tags=["Emails"])
+def list_emails(
+    category: Optional[str] = None,
+    q: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    Emails classificados, do mais recente ao mais antigo
+
+    Filtra por categoria e/ou texto (assunto, remetente e prévia, sem
+    diferenciar acentos). Para a próxima página, envie o next_before da
+    resposta como before.
+    """
+    try:
+        return store.search(category=category, q=q, before=before, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="before inválido: use o next_before da página anterior ou uma data ISO 8601")
+
+@app.get("/stream", tags=["Emails"])
+async def stream_emails(
+    category: Optional[List[str]] = Query(None),
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Feed ao vivo (Server-Sent Events) dos emails recém-classificados
+
+    Filtra por uma ou mais categorias (?category=A&category=B). Ao reconectar,
+    o navegador envia o Last-Event-ID e os eventos perdidos são reenviados;
+    se o cliente ficar para trás, recebe um evento "lagged"; se o id for de
+    antes de um reinício do servidor, recebe um evento "reset".
+    """
+    if live_feed.is_full():
+        raise HTTPException(status_code=503, detail="Limite de conexões do feed atingido")
+    return StreamingResponse(
+        live_feed.events(category, last_event_id_header or last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stream/stats", tags=["Emails"])
+def stream_stats():
+    """Assinantes conectados e eventos publicados/descartados"""
+    return live_feed.stats()
+
+@app.get("/dedup", tags=["Pipeline"])
+def dedup_status():
+    """Duplicados descartados (classificações e envios economizados)"""
+    return dedup.stats()
+
+@app.get("/rules", tags=["Pipeline"])
+def rules_status():
+    """Versão atual das regras de classificação e última reclassificação"""
+    rules = load_rules()
+    return {
+        "version": rules["version"],
+        "category_order": rules["category_order"],
+        "reclassify": reclassifier.status() if reclassifier else None,
+    }
+
+@app.get("/outbox", tags=["Outbox"])
+def outbox_status():
+    """Profundidade da fila de entregas e contadores de retry"""
+    return outbox.stats()
+
+@app.get("/pipeline", tags=["Pipeline"])
+def pipeline_status():
+    """Profundidade das filas e latência de cada etapa do pipeline"""
+    return pipeline.stats()
+
+@app.get("/metrics", tags=["Pipeline"])
+def metrics():
+    """Métricas no formato de texto do Prometheus"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/trace", tags=["Pipeline"])
+def trace(stage: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """Spans recentes por etapa (requer TRACE_SPANS=true)"""
+    return {"spans": recent_spans(limit, stage)}
+
 # Para rodar: uvicorn app:app --reload
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Checkpoint do backfill (app/services/backfill.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações padrão do Python
+import os
+
+# Importações de arquivos internos
+from app.services.backfill import BackfillCheckpoint
+
+
+def _checkpoint(tmp_path) -> BackfillCheckpoint:
+    checkpoint = BackfillCheckpoint(os.path.join(tmp_path, "checkpoint.json"))
+    checkpoint.reset(1)
+    return checkpoint
+
+
+def test_adjacent_ranges_are_merged(tmp_path):
+    checkpoint = _checkpoint(tmp_path)
+    for first in (21, 1, 11):
+        checkpoint.mark_done(first, first + 9)
+    assert checkpoint.done == [[1, 30]]
+
+
+def test_range_covering_several_ranges(tmp_path):
+    checkpoint = _checkpoint(tmp_path)
+    for first, last in ((5, 6), (10, 11), (20, 21), (40, 41)):
+        checkpoint.mark_done(first, last)
+    checkpoint.mark_done(1, 25)
+    assert checkpoint.done == [[1, 25], [40, 41]]
+
+
+def test_is_done(tmp_path):
+    checkpoint = _checkpoint(tmp_path)
+    checkpoint.mark_done(10, 20)
+    checkpoint.mark_done(30, 40)
+    assert [u for u in range(0, 45) if checkpoint.is_done(u)] == list(range(10, 21)) + list(range(30, 41))
+
+
+def test_legacy_file_is_merged_on_load(tmp_path):
+    path = os.path.join(tmp_path, "checkpoint.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"uidvalidity": 7, "done": [[11, 20], [1, 10], [15, 18], [30, 31]]}')
+    checkpoint = BackfillCheckpoint(path)
+    assert checkpoint.uidvalidity == 7
+    assert checkpoint.done == [[1, 20], [30, 31]]
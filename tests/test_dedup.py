@@ -0,0 +1,77 @@
+"""
+Deduplicação por Message-ID e por conteúdo (app/services/dedup.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações padrão do Python
+import os
+
+# Importações de terceiros
+import pytest
+
+# Importações de arquivos internos
+from app.services import dedup
+from app.services.dedup import DedupFilter, content_key, dedup_keys
+
+
+def _email(message_id: str = "", subject: str = "Aviso de matrícula", snippet: str = "Prazo até sexta"):
+    return {"id": message_id or subject, "message_id": message_id, "subject": subject, "snippet": snippet}
+
+
+@pytest.fixture
+def dedup_filter(tmp_path):
+    dedup_filter = DedupFilter(os.path.join(tmp_path, "dedup.db"))
+    yield dedup_filter
+    dedup_filter.close()
+
+
+def test_keys_prefer_message_id():
+    assert dedup_keys(_email("<abc@ecomp>")) == ["mid:abc@ecomp"]
+    assert dedup_keys(_email()) == [content_key(_email())]
+
+
+def test_content_key_ignores_reply_prefixes_and_spacing():
+    original = _email(subject="Aviso de matrícula", snippet="Prazo  até\nsexta")
+    forwarded = _email(subject="RE: Fwd: Aviso de matrícula", snippet="Prazo até sexta")
+    assert content_key(original) == content_key(forwarded)
+    assert content_key(original) != content_key(_email(snippet="Prazo até segunda"))
+
+
+def test_by_content_also_for_emails_with_message_id(monkeypatch):
+    monkeypatch.setattr(dedup, "DEDUP_BY_CONTENT", True)
+    assert dedup_keys(_email("<abc@ecomp>")) == ["mid:abc@ecomp", content_key(_email())]
+
+
+def test_resent_notice_with_new_message_id(dedup_filter, monkeypatch):
+    first, resent = _email("<a@ecomp>"), _email("<b@ecomp>")
+    dedup_filter.remember(dedup_filter.filter_new([first]))
+    # Por padrão só o Message-ID conta: o reenvio passa
+    assert dedup_filter.filter_new([resent]) == [resent]
+    dedup_filter.release([resent])
+
+    monkeypatch.setattr(dedup, "DEDUP_BY_CONTENT", True)
+    dedup_filter.remember([first])
+    assert dedup_filter.filter_new([resent]) == []
+    assert dedup_filter.duplicates_by_content == 1
+
+
+def test_filter_new_drops_seen_and_repeated_in_batch(dedup_filter):
+    emails = [_email("<a@ecomp>"), _email("<a@ecomp>"), _email(subject="Sem Message-ID")]
+    fresh = dedup_filter.filter_new(emails)
+    assert fresh == [emails[0], emails[2]]
+    dedup_filter.remember(fresh)
+    assert dedup_filter.filter_new(emails) == []
+    assert dedup_filter.duplicates_by_message_id == 1 + 2
+    assert dedup_filter.duplicates_by_content == 1
+
+
+def test_pending_until_remember_or_release(dedup_filter):
+    email = _email("<a@ecomp>")
+    assert dedup_filter.filter_new([email]) == [email]
+    # Em trânsito no pipeline: uma segunda busca não duplica
+    assert dedup_filter.filter_new([email]) == []
+    # Entrega falhou: pode voltar
+    dedup_filter.release([email])
+    assert dedup_filter.filter_new([email]) == [email]
+    assert dedup_filter.stats()["pending"] == 1
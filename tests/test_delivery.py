@@ -0,0 +1,104 @@
+"""
+Entrega HTTP (app/api/inbox_stream.py) contra o stub local da API
+
+Uso: python -m pytest tests
+"""
+
+# Importações de terceiros
+import pytest
+
+# Importações de arquivos internos
+from app.api import inbox_stream
+from app.api.inbox_stream import send_email_to_api, send_batch_to_api
+from benchmarks.stub_api import StubAPI
+
+
+def _emails(n: int):
+    return [
+        {"id": f"m{i}", "subject": f"Assunto {i}", "snippet": "corpo", "categoria": "Geral",
+         "date": "Sun, 16 Nov 2025 13:30:39 +0000"}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def point_to(monkeypatch):
+    """Sobe um StubAPI e aponta o módulo de entrega para ele, com sessão nova"""
+    stubs = []
+
+    def start(**kwargs) -> StubAPI:
+        stub = StubAPI(**kwargs).start()
+        stubs.append(stub)
+        monkeypatch.setattr(inbox_stream, "API_URL", stub.url)
+        monkeypatch.setattr(inbox_stream, "BATCH_API_URL", stub.url + "batch")
+        monkeypatch.setattr(inbox_stream, "_batch_supported", None)
+        monkeypatch.setattr(inbox_stream, "_session", None)
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.stop()
+
+
+def test_keep_alive_reuses_connection(point_to):
+    stub = point_to()
+    assert all(send_email_to_api(e) for e in _emails(20))
+    assert stub.requests == 20
+    assert stub.connections == 1
+
+
+def test_batch_route_sends_chunks(point_to):
+    stub = point_to()
+    emails = _emails(50)
+    results = send_batch_to_api(emails, chunk_size=20)
+    assert results == {e["id"]: True for e in emails}
+    assert stub.requests == 3
+    assert stub.received == 50
+    assert inbox_stream._batch_supported is True
+
+
+@pytest.mark.parametrize("status", [404, 405, 501])
+def test_batch_fallback_to_individual_sends(point_to, status):
+    stub = point_to(batch=False, batch_status=status)
+    emails = _emails(30)
+    results = send_batch_to_api(emails, chunk_size=10)
+    assert results == {e["id"]: True for e in emails}
+    # Uma tentativa na rota de lote; depois só envios individuais
+    assert stub.requests == 1 + 30
+    assert inbox_stream._batch_supported is False
+
+    results = send_batch_to_api(_emails(5))
+    assert all(results.values())
+    assert stub.requests == 1 + 30 + 5
+
+
+def test_batch_route_is_probed_again_after_interval(point_to, monkeypatch):
+    stub = point_to(batch=False)
+    send_batch_to_api(_emails(5))
+    assert inbox_stream._batch_supported is False
+
+    # A rota voltou (ex.: fim de um deploy da API): testada de novo após o intervalo
+    stub.batch = True
+    monkeypatch.setattr(inbox_stream, "BATCH_REPROBE_SECONDS", 0)
+    requests_before = stub.requests
+    results = send_batch_to_api(_emails(5))
+    assert all(results.values())
+    assert stub.requests == requests_before + 1
+    assert inbox_stream._batch_supported is True
+
+
+def test_batch_partial_failures_are_mapped_by_id(point_to):
+    point_to(fail_every=10)
+    emails = _emails(100)
+    results = send_batch_to_api(emails, chunk_size=50)
+    failed = sorted((eid for eid, ok in results.items() if not ok), key=lambda eid: int(eid[1:]))
+    assert failed == [e["id"] for e in emails[9::10]]
+    assert sum(results.values()) == 90
+
+
+def test_fallback_partial_failures_are_mapped_by_id(point_to):
+    point_to(batch=False, fail_every=4)
+    emails = _emails(20)
+    results = send_batch_to_api(emails, chunk_size=20)
+    assert len(results) == 20
+    assert sum(1 for ok in results.values() if not ok) == 5
@@ -0,0 +1,62 @@
+"""
+Paginação por cursor e busca por texto (app/services/email_store.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações padrão do Python
+import os
+
+# Importações de terceiros
+import pytest
+
+# Importações de arquivos internos
+from app.services.email_store import EmailStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmailStore(os.path.join(tmp_path, "emails.db"))
+    yield store
+    store.close()
+
+
+def _email(i, second, categoria="Outros", subject=None):
+    return {"id": f"m{i}", "subject": subject or f"Assunto {i}", "sender": "colegiado@ecomp",
+            "categoria": categoria, "date": f"Sun, 16 Nov 2025 13:30:{second:02d} +0000", "snippet": "corpo"}
+
+
+def _pages(store, **kwargs):
+    ids, before = [], None
+    while True:
+        page = store.search(before=before, limit=2, **kwargs)
+        ids += [item["id"] for item in page["items"]]
+        before = page["next_before"]
+        if before is None:
+            return ids
+
+
+def test_pages_cover_everything_once_newest_first(store):
+    # m1 e m2 no mesmo segundo: o desempate da sort_key mantém os dois
+    store.add_many([_email(0, 10), _email(1, 20), _email(2, 20), _email(3, 30), _email(4, 40)])
+    assert _pages(store) == ["m4", "m3", "m2", "m1", "m0"]
+
+
+def test_pages_with_category_and_text(store):
+    store.add_many([
+        _email(0, 10, "Eventos", "Palestra de abertura"),
+        _email(1, 20, "Outros", "Palestra cancelada"),
+        _email(2, 30, "Eventos", "Palestra de IA"),
+        _email(3, 40, "Eventos", "Semana acadêmica"),
+        _email(4, 50, "Eventos", "Palestra de encerramento"),
+    ])
+    assert _pages(store, category="Eventos") == ["m4", "m3", "m2", "m0"]
+    assert _pages(store, category="Eventos", q="palest") == ["m4", "m2", "m0"]
+
+
+def test_before_accepts_iso_date(store):
+    store.add_many([_email(0, 10), _email(1, 20), _email(2, 30)])
+    page = store.search(before="2025-11-16T13:30:30+00:00")
+    assert [item["id"] for item in page["items"]] == ["m1", "m0"]
+    with pytest.raises(ValueError):
+        store.search(before="ontem")
@@ -0,0 +1,46 @@
+"""
+Utilitários do protocolo IMAP (app/utils/imap.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações de terceiros
+import pytest
+
+# Importações de arquivos internos
+from app.utils.imap import find_text_part, parse_fetch_response, uid_set
+
+
+@pytest.mark.parametrize("uids, expected", [
+    ([1, 2, 3, 5, 7, 8], "1:3,5,7:8"),
+    ([8, 7, 1, 3, 2, 5, 5], "1:3,5,7:8"),
+    ([42], "42"),
+    ([], ""),
+])
+def test_uid_set(uids, expected):
+    assert uid_set(uids) == expected
+
+
+def test_parse_fetch_response_with_literals():
+    # Formato entregue por imaplib: literais como (prefixo, bytes), o resto como bytes
+    data = [
+        (b'1 (UID 5 BODY[1]<0> {5}', b'hello'),
+        b' BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "QUOTED-PRINTABLE" 5 1))',
+        (b'2 (UID 7 FLAGS (\\Seen) BODY[1]<0> {3}', b'abc'),
+        b')',
+        b'3 (UID 9 X-GM-LABELS NIL)',
+    ]
+    first, second, third = parse_fetch_response(data)
+
+    assert first["SEQ"] == "1" and first["UID"] == "5"
+    assert first["BODY[1]<0>"] == b"hello"
+    assert find_text_part(first["BODYSTRUCTURE"]) == {
+        "part": "1", "subtype": "plain", "charset": "utf-8", "encoding": "quoted-printable", "size": 5,
+    }
+    assert second == {"SEQ": "2", "UID": "7", "FLAGS": ["\\Seen"], "BODY[1]<0>": b"abc"}
+    assert third == {"SEQ": "3", "UID": "9", "X-GM-LABELS": None}
+
+
+def test_parse_fetch_response_skips_none():
+    data = [None, b'1 (UID 10 FLAGS ())']
+    assert parse_fetch_response(data) == [{"SEQ": "1", "UID": "10", "FLAGS": []}]
@@ -0,0 +1,109 @@
+"""
+Outbox durável e worker de entrega (app/services/outbox.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações padrão do Python
+import os
+
+# Importações de terceiros
+import pytest
+
+# Importações de arquivos internos
+from app.services import outbox as outbox_module
+from app.services.outbox import Outbox, OutboxWorker
+
+
+def _emails(n: int):
+    return [{"id": f"m{i}", "subject": f"Assunto {i}", "snippet": "corpo", "categoria": "Geral"} for i in range(n)]
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(os.path.join(tmp_path, "outbox.db"), max_entries=10)
+    yield box
+    box.close()
+
+
+def test_enqueue_and_ack(outbox):
+    assert outbox.enqueue(_emails(3))
+    rows = outbox.due()
+    assert [email["id"] for _, _, email in rows] == ["m0", "m1", "m2"]
+    assert all(attempts == 0 for _, attempts, _ in rows)
+
+    outbox.ack([seq for seq, _, _ in rows])
+    assert outbox.due() == []
+    assert outbox.stats()["depth"] == 0
+
+
+def test_enqueue_rejects_when_full(outbox):
+    assert outbox.enqueue(_emails(8))
+    assert not outbox.enqueue(_emails(3))
+    stats = outbox.stats()
+    assert stats["depth"] == 8
+    assert stats["rejected"] == 3
+
+
+def test_retry_backs_off(outbox, monkeypatch):
+    monkeypatch.setattr(outbox_module, "OUTBOX_RETRY_BASE_SECONDS", 100)
+    outbox.enqueue(_emails(1))
+    [(seq, attempts, _)] = outbox.due()
+    outbox.retry([(seq, attempts)], "HTTP 500")
+    # Reagendada para o futuro: não está pronta agora
+    assert outbox.due() == []
+    stats = outbox.stats()
+    assert stats["depth"] == 1 and stats["due"] == 0 and stats["dead"] == 0
+
+    monkeypatch.setattr(outbox_module.time, "time", lambda: 10 ** 10)
+    [(_, attempts, _)] = outbox.due()
+    assert attempts == 1
+
+
+def test_dead_after_max_attempts(outbox, monkeypatch):
+    monkeypatch.setattr(outbox_module, "OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(outbox_module, "OUTBOX_RETRY_BASE_SECONDS", 0)
+    outbox.enqueue(_emails(1))
+    for _ in range(2):
+        [(seq, attempts, _)] = outbox.due()
+        outbox.retry([(seq, attempts)], "HTTP 500")
+    # Fica na tabela para inspeção, mas não volta a ser enviada
+    assert outbox.due() == []
+    assert outbox.stats()["dead"] == 1
+
+
+def test_worker_acks_delivered_and_retries_failed(outbox):
+    outbox.enqueue(_emails(4))
+    worker = OutboxWorker(outbox, send_batch=lambda emails: {e["id"]: e["id"] != "m2" for e in emails})
+    assert worker.drain_once() == 4
+    stats = outbox.stats()
+    assert stats["delivered"] == 3
+    assert stats["depth"] == 1 and stats["retries"] == 1
+
+
+def test_worker_failing_callback_still_acks(outbox):
+    outbox.enqueue(_emails(3))
+    called = []
+
+    def on_delivered(email):
+        called.append(email["id"])
+        raise RuntimeError("callback quebrado")
+
+    worker = OutboxWorker(outbox, send_batch=lambda emails: {e["id"]: True for e in emails},
+                          on_delivered=on_delivered)
+    worker.drain_once()
+    # Cada callback roda isolado, e nada é reenviado por causa deles
+    assert called == ["m0", "m1", "m2"]
+    assert outbox.stats()["depth"] == 0
+    assert worker.drain_once() == 0
+
+
+def test_worker_send_exception_reschedules(outbox):
+    outbox.enqueue(_emails(2))
+
+    def send_batch(emails):
+        raise ConnectionError("API fora do ar")
+
+    OutboxWorker(outbox, send_batch=send_batch).drain_once()
+    stats = outbox.stats()
+    assert stats["depth"] == 2 and stats["delivered"] == 0 and stats["retries"] == 2
@@ -0,0 +1,83 @@
+"""
+Reclassificação incremental: palavras-chave alteradas e candidatos no
+índice FTS (app/config/rules.py, app/services/email_store.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações padrão do Python
+import os
+import time
+
+# Importações de terceiros
+import pytest
+
+# Importações de arquivos internos
+from app.config.rules import changed_keywords
+from app.services.email_store import EmailStore, STORE_SNIPPET_MAX_CHARS
+
+
+def _rules(version, categories, order=None):
+    return {"version": version, "categories": categories, "category_order": order or list(categories)}
+
+
+def test_changed_keywords_added_removed_and_moved():
+    old = _rules("1", {"Monitoria": ["monitoria", "tutoria"], "Eventos": ["palestra"]})
+    new = _rules("2", {"Monitoria": ["monitoria", "bolsa"], "Eventos": ["palestra", "tutoria"]})
+    # bolsa: adicionada; tutoria: mudou de categoria; monitoria e palestra: iguais
+    assert changed_keywords(old, new) == {"bolsa", "tutoria"}
+
+
+def test_changed_keywords_priority_change():
+    old = _rules("1", {"Monitoria": ["monitoria"], "Eventos": ["palestra"], "Outros": ["aviso"]})
+    new = _rules("2", old["categories"], order=["Eventos", "Monitoria", "Outros"])
+    # O desempate entre as duas categorias mudou; Outros continua na mesma posição
+    assert changed_keywords(old, new) == {"monitoria", "palestra"}
+
+
+def test_changed_keywords_same_rules():
+    rules = _rules("1", {"Monitoria": ["monitoria"]})
+    assert changed_keywords(rules, _rules("2", rules["categories"])) == set()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmailStore(os.path.join(tmp_path, "emails.db"))
+    yield store
+    store.close()
+
+
+def _email(i, subject, snippet="corpo", version="1"):
+    return {"id": f"m{i}", "subject": subject, "sender": "colegiado@ecomp", "categoria": "Outros",
+            "date": f"Sun, 16 Nov 2025 13:30:{i:02d} +0000", "snippet": snippet, "rule_version": version}
+
+
+def test_candidates_match_subject_and_full_body(store):
+    long_body = "texto " * (STORE_SNIPPET_MAX_CHARS // 6 + 50) + "inscrições para monitória"
+    store.add_many([
+        _email(1, "Seleção de Monitoria"),
+        _email(2, "Aviso geral", snippet=long_body),
+        _email(3, "Palestra na sexta"),
+        _email(4, "Monitoria 2026", version="2"),
+    ])
+    rows = store.candidates_for_reclassify("1", ["monitoria"])
+    # m2: a palavra está depois do corte da prévia (só no full_text, sem acento)
+    assert [row["id"] for row in rows] == ["m1", "m2"]
+    assert rows[1]["full_text"].endswith("monitoria")
+    assert store.candidates_for_reclassify("1", []) == []
+    assert [row["id"] for row in store.candidates_for_reclassify("1", None)] == ["m1", "m2", "m3"]
+
+
+def test_candidates_paginate_by_sort_key(store):
+    store.add_many([_email(i, f"Monitoria {i}") for i in range(5)])
+    first = store.candidates_for_reclassify("1", ["monitoria"], limit=3)
+    rest = store.candidates_for_reclassify("1", ["monitoria"], after=first[-1]["sort_key"], limit=3)
+    assert [row["id"] for row in first + rest] == [f"m{i}" for i in range(5)]
+
+
+def test_restamp_skips_truncated_without_full_text(store):
+    store.add_many([_email(1, "Aviso"), _email(2, "Aviso longo", snippet="x" * (STORE_SNIPPET_MAX_CHARS + 10))])
+    # Email antigo: prévia cortada e sem o corpo inteiro (anterior à coluna full_text)
+    store._db.execute("UPDATE emails SET full_text = '' WHERE id = 'm2'")
+    assert store.restamp("1", "2", time.time() + 1) == 1
+    assert [row["id"] for row in store.candidates_for_reclassify("2", None)] == ["m1"]
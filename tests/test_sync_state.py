@@ -0,0 +1,55 @@
+"""
+Marca d'água da sincronização por UID (app/services/sync_state.py)
+
+Uso: python -m pytest tests
+"""
+
+# Importações padrão do Python
+import os
+
+# Importações de arquivos internos
+from app.services.sync_state import SyncStateStore
+
+KEY = "conta@gmail.com/INBOX"
+
+
+def _store(tmp_path) -> SyncStateStore:
+    return SyncStateStore(os.path.join(tmp_path, "sync_state.json"))
+
+
+def test_watermark_waits_for_inflight_uids(tmp_path):
+    store = _store(tmp_path)
+    store.begin(KEY, 7, 30, [10, 20, 30])
+    # A próxima busca parte do cursor; a marca persistida para antes do menor UID pendente
+    assert store.position(KEY)["last_uid"] == 30
+    assert _store(tmp_path).get(KEY) == {"uidvalidity": 7, "last_uid": 9}
+
+    store.complete(KEY, 7, [20, 30])
+    assert _store(tmp_path).get(KEY)["last_uid"] == 9
+    store.complete(KEY, 7, [10])
+    assert _store(tmp_path).get(KEY)["last_uid"] == 30
+
+
+def test_release_rewinds_the_cursor(tmp_path):
+    store = _store(tmp_path)
+    store.begin(KEY, 7, 30, [10, 20, 30])
+    store.complete(KEY, 7, [10])
+    store.release(KEY, 7, [20, 30])
+    # Rejeitados (ex.: outbox cheia) voltam na próxima busca
+    assert store.position(KEY)["last_uid"] == 19
+    assert _store(tmp_path).get(KEY)["last_uid"] == 19
+
+
+def test_crash_restarts_from_persisted_watermark(tmp_path):
+    store = _store(tmp_path)
+    store.begin(KEY, 7, 30, [25, 30])
+    restarted = _store(tmp_path)
+    assert restarted.position(KEY) == {"uidvalidity": 7, "last_uid": 24}
+
+
+def test_new_uidvalidity_drops_old_inflight(tmp_path):
+    store = _store(tmp_path)
+    store.begin(KEY, 7, 30, [10])
+    store.begin(KEY, 8, 5, [])
+    store.complete(KEY, 7, [10])
+    assert _store(tmp_path).get(KEY) == {"uidvalidity": 8, "last_uid": 5}